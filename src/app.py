@@ -1,15 +1,50 @@
-import os
-from flask import Flask, render_template, request, redirect, url_for, session, flash, g
+import time
+
+IMPORT_STARTED = time.perf_counter()  # Start of the cold-start clock for --measure-startup
 
-from biobuddy.db import get_db
-from biobuddy.user import create_user, authenticate_user
-from biobuddy.papers import get_papers, get_unique_years
-from biobuddy.favorites import toggle_favorite, get_user_favorites, get_favorite_ids
+import argparse
+import hashlib
+import hmac
+import io
+import json
+import os
+import sqlite3
+import stat
+import threading
+from datetime import datetime
+from urllib.parse import quote
+
+from flask import (
+    Flask, render_template, request, redirect, url_for, session, flash, g, abort, send_file,
+    Response, stream_with_context
+)
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.security import safe_join
+
+from biobuddy import metrics
+from biobuddy.db import get_db, get_pool, add_query_observer
+from biobuddy.user import create_user, authenticate_user, HashingBusyError, get_hashing_stats
+from biobuddy.papers import get_papers, get_facets, get_paper, get_catalog, get_popular_papers, POPULAR_LIMIT
+from biobuddy.fragments import Fragment, LRUCache, slot
+from biobuddy.favorites import get_favorite_ids, toggle_favorite, set_favorites
+from biobuddy.profiles import get_profile
 from biobuddy.flashcards import (
-    get_user_flashcards, create_flashcard, delete_flashcard,
-    get_subjects, get_card_by_id, update_flashcard
+    get_user_flashcards, count_user_flashcards, create_flashcard, delete_flashcard,
+    get_subjects, get_card_by_id, update_flashcard, search_flashcards, DECK_PAGE_SIZE
+)
+from biobuddy.deck_io import (
+    import_deck, export_deck, guess_format, DeckFormatError, DECK_FORMATS,
+    CONTENT_TYPES as DECK_CONTENT_TYPES
+)
+from biobuddy.study import (
+    get_study_queue, get_next_due_cards, count_due_cards, process_review, process_reviews,
+    DUE_COUNT_LIMIT, RATINGS
 )
-from biobuddy.study import get_due_cards, process_review
+from biobuddy.review_log import get_review_log
+from biobuddy.migrations import migrate
+from biobuddy.stats import get_user_stats
+from biobuddy.schedulers import FSRSScheduler
+from biobuddy.reschedule import get_user_scheduler, set_user_scheduler
 
 app = Flask(__name__)
 
@@ -17,6 +52,78 @@ app = Flask(__name__)
 # In production, this should be a complex random string from ENV.
 app.secret_key = os.environ.get("SECRET_KEY", "dev_secret_key_123")
 DB_PATH = os.environ.get("BIOBUDDY_DB_PATH", "biobuddy.db")
+# Paper PDFs are served by /papers/file/<id>.
+# BIOBUDDY_X_SENDFILE=1 hands the file to Apache/lighttpd (X-Sendfile);
+# BIOBUDDY_X_ACCEL_PREFIX=/internal/papers/ hands it to an nginx internal location.
+PAPERS_PATH = os.environ.get("BIOBUDDY_PAPERS_PATH", os.path.join(app.static_folder, "papers"))
+app.config["USE_X_SENDFILE"] = os.environ.get("BIOBUDDY_X_SENDFILE") == "1"
+X_ACCEL_PREFIX = os.environ.get("BIOBUDDY_X_ACCEL_PREFIX")
+PAPER_CACHE_MAX_AGE = 365 * 24 * 3600  # For URLs carrying the file checksum
+PAPER_VERSION_LENGTH = 16  # Checksum characters used in ?v=
+
+# Upper bounds for the JSON study API
+STUDY_PREFETCH_MAX = 100
+STUDY_BATCH_MAX = 500
+DECK_PAGE_SIZE_MAX = 200  # Largest ?limit= for /api/flashcards
+IMPORT_ERRORS_SHOWN = 5  # Row errors listed in the flash message after an import
+RESPONSE_MS_MAX = 3_600_000  # Longer answer times (card left open) are not logged
+FAVORITES_BATCH_MAX = 500  # Paper ids per /api/favorites request
+POPULAR_LIMIT_MAX = 50
+
+# Reuse tuned connections across requests and threads (set to "0" to connect per request).
+DB_POOL_ENABLED = os.environ.get("BIOBUDDY_DB_POOL", "1") != "0"
+
+# Request and SQL metrics, served at /metrics. Off unless BIOBUDDY_METRICS=1, and then
+# scrapers must send "Authorization: Bearer <BIOBUDDY_METRICS_TOKEN>" (only debug mode
+# serves them without a token), since they expose traffic per route and every query.
+METRICS_ENABLED = os.environ.get("BIOBUDDY_METRICS", "0") == "1"
+METRICS_TOKEN = os.environ.get("BIOBUDDY_METRICS_TOKEN")
+if METRICS_ENABLED:
+    add_query_observer(metrics.observe_query)
+
+# Rendered catalog grids, shared by all visitors (see biobuddy.fragments)
+_catalog_fragments = LRUCache()
+app.add_template_global(slot)
+
+
+def _templates_version():
+    """Changes whenever a template file does, so ETags from an older deploy stop matching."""
+    digest = hashlib.sha1()
+    for name in sorted(os.listdir(app.template_folder)):
+        digest.update(f"{name}:{os.stat(os.path.join(app.template_folder, name)).st_mtime_ns};".encode())
+    return digest.hexdigest()[:12]
+
+
+TEMPLATES_VERSION = _templates_version()
+
+# Compiled templates are kept on disk so a recycled worker does not compile them again.
+# BIOBUDDY_WARMUP=1 makes create_app() do the first request's work before serving.
+# The directory must belong to this user and be writable by no one else, since the
+# cached bytecode is executed; Jinja's own per-user temp directory is used otherwise.
+TEMPLATE_CACHE_DIR = os.environ.get(
+    "BIOBUDDY_TEMPLATE_CACHE_DIR", os.path.join(app.instance_path, "template-cache")
+)
+WARMUP = os.environ.get("BIOBUDDY_WARMUP") == "1"
+
+SCHEDULER_CHOICES = [
+    ("leitner", "Leitner boxes (fixed intervals)"),
+    ("sm2", "SM-2 (intervals grow with each card's ease)"),
+    ("fsrs", "FSRS (memory model, adapts to each card)"),
+]
+RETENTION_RANGE = (0.7, 0.97)
+
+# Databases from an older create_db.py get their new columns on the first request
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+
+def _upgrade_schema(db):
+    global _schema_ready
+    with _schema_lock:
+        if not _schema_ready:
+            migrate(db)
+            _schema_ready = True
+
 
 def get_db_connection():
     """
@@ -24,16 +131,41 @@ def get_db_connection():
     Uses Flask's `g` object to store the connection.
     """
     if 'db' not in g:
-        g.db = get_db(DB_PATH)
+        if DB_POOL_ENABLED:
+            g.db = get_pool(DB_PATH).acquire()
+        else:
+            g.db = get_db(DB_PATH)
+        if not _schema_ready:
+            _upgrade_schema(g.db)
     return g.db
 
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Also runs for error responses, so 500s are counted."""
+    started = g.pop("request_started", None)
+    if METRICS_ENABLED and started is not None:
+        metrics.observe_request(
+            request.endpoint or "unmatched", request.method, response.status_code,
+            time.perf_counter() - started,
+        )
+    return response
+
+
 @app.teardown_appcontext
 def close_db(error):
-    """Automatically close the database connection at the end of the request."""
+    """Return the connection to the pool (or close it) at the end of the request."""
     db = g.pop('db', None)
     if db is not None:
-        db.close()
+        if DB_POOL_ENABLED:
+            get_pool(DB_PATH).release(db)
+        else:
+            db.close()
 
 
 # --- Routes ---
@@ -44,11 +176,11 @@ def index():
     favorites = []
 
     if user_id:
-        db = get_db_connection()
-        user = db.select_one("SELECT username FROM Users WHERE id = ?", (user_id,))
-        if user:
-            username = user["username"]
-            favorites = get_user_favorites(db, user_id)
+        # Usually served from the profile cache without touching the database
+        profile = get_profile(get_db_connection(), user_id)
+        if profile:
+            username = profile.username
+            favorites = profile.favorites
 
     return render_template("index.html", user_id=user_id, username=username, favorites=favorites)
 
@@ -61,7 +193,13 @@ def register():
         password = request.form["password"]
 
         db = get_db_connection()
-        if create_user(db, username, password):
+        try:
+            created = create_user(db, username, password)
+        except HashingBusyError:
+            flash("The server is busy, please try again in a moment.", "error")
+            return render_template("register.html"), 503
+
+        if created:
             flash("Registration successful! Please log in.", "success")
             return redirect(url_for("login"))
         else:
@@ -77,7 +215,11 @@ def login():
         password = request.form["password"]
 
         db = get_db_connection()
-        user_id = authenticate_user(db, username, password)
+        try:
+            user_id = authenticate_user(db, username, password)
+        except HashingBusyError:
+            flash("The server is busy, please try again in a moment.", "error")
+            return render_template("login.html"), 503
 
         if user_id is not None:
             session["user_id"] = user_id  # Save to session cookie
@@ -97,32 +239,166 @@ def logout():
 
 
 # -- Paper Routes ---
-@app.route("/papers/<subject>")
-def resources(subject):
-    db = get_db_connection()
-
-    filters = {
+def _paper_filters_from_args():
+    return {
         "year": request.args.get("year"),
         "level": request.args.get("level"),
         "type": request.args.get("type"),
         "paper_number": request.args.get("number"),
     }
 
-    papers = get_papers(db, subject, filters)
-    years = get_unique_years(db, subject)
 
-    fav_ids = set()
-    if "user_id" in session:
-        fav_ids = get_favorite_ids(db, session["user_id"])
+def _catalog_fragment(db, subject, filters, logged_in):
+    """
+    The subject's filters and paper grid as a Fragment, rendered once per
+    catalog version and cached. Returns (cache key, fragment, ids of the papers shown).
+    """
+    key = (get_catalog(db).version, subject.lower(), tuple(sorted(filters.items())), logged_in)
+    cached = _catalog_fragments.get(key)
+    if cached is None:
+        papers = get_papers(db, subject, filters)
+        html = render_template(
+            "_papers_catalog.html",
+            subject=subject.capitalize(),
+            papers=papers,
+            facets=get_facets(db, subject, filters),
+            current_filters=filters,
+            logged_in=logged_in,
+        )
+        cached = (Fragment(html), frozenset(paper["id"] for paper in papers))
+        _catalog_fragments.put(key, cached)
+    return (key,) + cached
 
-    return render_template(
-        "papers.html",
-        subject=subject.capitalize(),
-        papers=papers,
-        available_years=years,
-        current_filters=filters,
-        fav_ids=fav_ids,
+
+@app.route("/papers/<subject>")
+def resources(subject):
+    """
+    The shared grid comes from the fragment cache; only the user's stars are filled in.
+    The ETag covers both, so revisits are answered with 304 Not Modified.
+    """
+    db = get_db_connection()
+
+    filters = _paper_filters_from_args()
+    logged_in = "user_id" in session
+    key, fragment, paper_ids = _catalog_fragment(db, subject, filters, logged_in)
+
+    fav_ids = set()
+    if logged_in:
+        # Read fresh (one indexed query), not from the per-process profile cache: the
+        # ETag is built from these ids, and a star toggled through another worker
+        # must not be answered with a 304 that keeps the old stars
+        fav_ids = get_favorite_ids(db, session["user_id"]) & paper_ids
+
+    etag = hashlib.sha1(repr((TEMPLATES_VERSION, key, sorted(fav_ids))).encode()).hexdigest()
+    # A pending flash message is shown (and consumed) by the next page render
+    if etag in request.if_none_match and "_flashes" not in session:
+        response = app.response_class(status=304)
+    else:
+        def star(name, paper_id):
+            is_fav = int(paper_id) in fav_ids
+            if name == "fav_star":
+                return "★" if is_fav else "☆"
+            return "" if is_fav else "outline"
+
+        response = app.make_response(
+            render_template("papers.html", catalog_html=fragment.fill(star))
+        )
+
+    response.set_etag(etag)
+    response.cache_control.no_cache = True  # Always revalidate: favorites and the catalog change
+    if logged_in:
+        response.cache_control.private = True
+    return response
+
+
+@app.template_global()
+def paper_file_url(paper):
+    """Link to a paper PDF; the checksum in ?v= lets browsers cache it for a year."""
+    if paper["sha256"]:
+        return url_for("paper_file", paper_id=paper["id"], v=paper["sha256"][:PAPER_VERSION_LENGTH])
+    return url_for("paper_file", paper_id=paper["id"])
+
+
+@app.route("/papers/file/<int:paper_id>")
+def paper_file(paper_id):
+    """
+    Serves a paper PDF with strong ETags (the stored SHA-256), Last-Modified,
+    304 answers for If-None-Match/If-Modified-Since and HTTP Range requests.
+    """
+    db = get_db_connection()
+    paper = get_paper(db, paper_id)
+    if paper is None:
+        abort(404)
+
+    path = safe_join(PAPERS_PATH, paper["filename"])
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    # A URL with the current checksum always has the same content
+    versioned = bool(paper["sha256"]) and request.args.get("v") == paper["sha256"][:PAPER_VERSION_LENGTH]
+    max_age = PAPER_CACHE_MAX_AGE if versioned else None  # None: revalidate with the ETag every time
+    etag = paper["sha256"] or True  # Fall back to mtime/size for papers synced before checksums
+
+    if X_ACCEL_PREFIX:
+        # nginx streams the file (and handles Range) from its internal location
+        response = app.response_class(mimetype="application/pdf")
+        response.headers["X-Accel-Redirect"] = X_ACCEL_PREFIX + quote(paper["filename"])
+        if paper["sha256"]:
+            response.set_etag(paper["sha256"])
+        response.last_modified = os.path.getmtime(path)
+        response.cache_control.no_cache = True
+        if versioned:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+            response.cache_control.immutable = True
+        return response.make_conditional(request)
+
+    response = send_file(
+        path,
+        mimetype="application/pdf",
+        download_name=paper["filename"],
+        conditional=True,
+        etag=etag,
+        max_age=max_age,
     )
+    if versioned:
+        response.cache_control.immutable = True
+    return response
+
+
+@app.route("/api/papers/<subject>/facets")
+def api_paper_facets(subject):
+    """Per-option counts for the paper filters (same query args as /papers/<subject>)."""
+    db = get_db_connection()
+    facets = get_facets(db, subject, _paper_filters_from_args())
+    if facets is None:
+        return {"error": "Unknown subject"}, 404
+
+    return {"subject": subject.capitalize(), "facets": facets}
+
+
+@app.route("/api/papers/<subject>/popular")
+def api_popular_papers(subject):
+    """The subject's most starred papers (?limit=, default POPULAR_LIMIT)."""
+    limit = min(request.args.get("limit", POPULAR_LIMIT, type=int), POPULAR_LIMIT_MAX)
+    db = get_db_connection()
+    papers = get_popular_papers(db, subject, max(limit, 1))
+    return {
+        "subject": subject.capitalize(),
+        "papers": [
+            {
+                "id": paper["id"],
+                "year": paper["year"],
+                "level": paper["level"],
+                "type": paper["type"],
+                "paper_number": paper["paper_number"],
+                "favorite_count": paper["favorite_count"],
+                "url": paper_file_url(paper),
+            }
+            for paper in papers
+        ],
+    }
 
 
 @app.route("/api/toggle_favorite", methods=["POST"])
@@ -132,6 +408,8 @@ def api_toggle_favorite():
 
     data = request.json
     paper_id = data.get("paper_id")
+    if not isinstance(paper_id, int):
+        return {"error": "paper_id must be an integer"}, 400
 
     db = get_db_connection()
     is_active = toggle_favorite(db, session["user_id"], paper_id)
@@ -139,6 +417,32 @@ def api_toggle_favorite():
     return {"success": True, "is_active": is_active}
 
 
+@app.route("/api/favorites", methods=["POST"])
+def api_favorites():
+    """
+    Stars and unstars several papers in one transaction.
+    Body: {"add": [paper_id, ...], "remove": [paper_id, ...]}
+    Returns the ids whose state actually changed.
+    """
+    if "user_id" not in session:
+        return {"error": "Unauthorized"}, 401
+
+    data = request.get_json(silent=True) or {}
+    add = data.get("add", [])
+    remove = data.get("remove", [])
+    for ids in (add, remove):
+        if not isinstance(ids, list) or not all(isinstance(paper_id, int) for paper_id in ids):
+            return {"error": "add and remove must be lists of paper ids"}, 400
+    if len(add) + len(remove) > FAVORITES_BATCH_MAX:
+        return {"error": f"At most {FAVORITES_BATCH_MAX} papers per request"}, 400
+    if set(add) & set(remove):
+        return {"error": "A paper cannot be both added and removed"}, 400
+
+    db = get_db_connection()
+    added, removed = set_favorites(db, session["user_id"], add, remove)
+    return {"success": True, "added": added, "removed": removed}
+
+
 # -- Flashcard Routes ---
 @app.route("/flashcards", methods=["GET", "POST"])
 def flashcards():
@@ -158,11 +462,186 @@ def flashcards():
         flash("Card added!", "success")
         return redirect(url_for("flashcards"))
 
-    # Load data for the list view
-    my_cards = get_user_flashcards(db, user_id)
+    # Load the first page of the deck (the rest is fetched from /api/flashcards)
+    before_id = request.args.get("before", type=int)
+    subject_id = request.args.get("subject", type=int)
+
+    query = request.args.get("q", "").strip()
+
+    my_cards = get_user_flashcards(db, user_id, before_id, DECK_PAGE_SIZE, subject_id)
+    total = count_user_flashcards(db, user_id, subject_id)
     subjects = get_subjects(db)
+    results = search_flashcards(db, user_id, query, subject_id=subject_id) if query else None
+
+    return render_template(
+        "flashcards.html",
+        cards=my_cards,
+        total=total,
+        subjects=subjects,
+        current_subject=subject_id,
+        next_before=_next_page_key(my_cards, DECK_PAGE_SIZE),
+        query=query,
+        results=results,
+    )
+
+
+def _next_page_key(cards, page_size):
+    """Id to continue after, or None when this was the last page."""
+    if len(cards) < page_size:
+        return None
+    return cards[-1]["id"]
+
+
+def _card_json(card):
+    return {"id": card["id"], "html": render_template("_flashcard.html", card=card)}
 
-    return render_template("flashcards.html", cards=my_cards, subjects=subjects)
+
+def _card_form_json():
+    """Validated (subject_id, question, answer) from a JSON body, or None."""
+    data = request.get_json(silent=True) or {}
+    try:
+        subject_id = int(data.get("subject_id"))
+    except (TypeError, ValueError):
+        return None
+    question = (data.get("question") or "").strip()
+    answer = (data.get("answer") or "").strip()
+    if not question or not answer:
+        return None
+    return subject_id, question, answer
+
+
+@app.route("/api/flashcards", methods=["GET", "POST"])
+def api_flashcards():
+    """
+    GET: one page of the deck, ?before=<id>&subject=<id>&limit=<n>.
+    POST: creates a card from {"subject_id", "question", "answer"}.
+    Cards come back as rendered HTML so the page can insert them as-is.
+    """
+    if "user_id" not in session:
+        return {"error": "Unauthorized"}, 401
+
+    db = get_db_connection()
+    user_id = session["user_id"]
+
+    if request.method == "POST":
+        form = _card_form_json()
+        if form is None:
+            return {"error": "Subject, question and answer are required"}, 400
+        try:
+            card_id = create_flashcard(db, user_id, *form)
+        except sqlite3.IntegrityError:
+            return {"error": "Unknown subject"}, 400
+        return {"success": True, "card": _card_json(get_card_by_id(db, card_id, user_id))}, 201
+
+    limit = max(1, min(request.args.get("limit", DECK_PAGE_SIZE, type=int), DECK_PAGE_SIZE_MAX))
+    cards = get_user_flashcards(
+        db, user_id,
+        before_id=request.args.get("before", type=int),
+        limit=limit,
+        subject_id=request.args.get("subject", type=int),
+    )
+    return {
+        "cards": [_card_json(card) for card in cards],
+        "next_before": _next_page_key(cards, limit),
+    }
+
+
+@app.route("/api/flashcards/search")
+def api_search_flashcards():
+    """Search-as-you-type: ?q=<text>&subject=<id>, results as a rendered HTML fragment."""
+    if "user_id" not in session:
+        return {"error": "Unauthorized"}, 401
+
+    query = request.args.get("q", "").strip()
+    results = search_flashcards(
+        get_db_connection(), session["user_id"], query,
+        subject_id=request.args.get("subject", type=int),
+    )
+    return {
+        "count": len(results),
+        "html": render_template("_search_results.html", results=results, query=query),
+    }
+
+
+@app.route("/api/flashcards/<int:card_id>", methods=["PUT", "DELETE"])
+def api_flashcard(card_id):
+    if "user_id" not in session:
+        return {"error": "Unauthorized"}, 401
+
+    db = get_db_connection()
+    user_id = session["user_id"]
+
+    if request.method == "DELETE":
+        if not delete_flashcard(db, user_id, card_id):
+            return {"error": "Card not found"}, 404
+        return {"success": True}
+
+    form = _card_form_json()
+    if form is None:
+        return {"error": "Subject, question and answer are required"}, 400
+    try:
+        found = update_flashcard(db, user_id, card_id, *form)
+    except sqlite3.IntegrityError:
+        return {"error": "Unknown subject"}, 400
+    if not found:
+        return {"error": "Card not found"}, 404
+    return {"success": True, "card": _card_json(get_card_by_id(db, card_id, user_id))}
+
+
+@app.route("/flashcards/import", methods=["POST"])
+def import_flashcards():
+    """Imports an uploaded CSV/JSONL/TSV deck; rows are read straight from the upload."""
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+
+    upload = request.files.get("deck")
+    if upload is None or not upload.filename:
+        flash("Choose a deck file to import.", "error")
+        return redirect(url_for("flashcards"))
+
+    fmt = request.form.get("format") or guess_format(upload.filename)
+    if fmt not in DECK_FORMATS:
+        flash("Unknown deck format. Use a .csv, .jsonl or .tsv file.", "error")
+        return redirect(url_for("flashcards"))
+
+    # utf-8-sig drops the byte order mark Excel puts in front of CSV exports
+    stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+    try:
+        summary = import_deck(
+            get_db_connection(), session["user_id"], stream, fmt,
+            default_subject_id=request.form.get("subject_id", type=int),
+        )
+    except DeckFormatError as e:
+        flash(str(e), "error")
+        return redirect(url_for("flashcards"))
+    except UnicodeDecodeError:
+        flash("The file is not UTF-8 text; cards up to the invalid line were imported.", "error")
+        return redirect(url_for("flashcards"))
+
+    flash(f"Imported {summary['imported']} cards.", "success")
+    if summary["failed"]:
+        shown = "; ".join(f"line {line}: {message}" for line, message in summary["errors"][:IMPORT_ERRORS_SHOWN])
+        more = summary["failed"] - min(len(summary["errors"]), IMPORT_ERRORS_SHOWN)
+        flash(f"Skipped {summary['failed']} rows ({shown}{f' and {more} more' if more else ''}).", "error")
+    return redirect(url_for("flashcards"))
+
+
+@app.route("/flashcards/export.<fmt>")
+def export_flashcards(fmt):
+    """Streams the deck (optionally one ?subject=) as a download."""
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+    if fmt not in DECK_FORMATS:
+        abort(404)
+
+    chunks = export_deck(
+        get_db_connection(), session["user_id"], fmt,
+        subject_id=request.args.get("subject", type=int),
+    )
+    # stream_with_context keeps the request (and its pooled connection) alive until the last chunk
+    response = Response(stream_with_context(chunks), mimetype=DECK_CONTENT_TYPES[fmt])
+    response.headers["Content-Disposition"] = f"attachment; filename=biobuddy-deck.{fmt}"
+    return response
 
 
 @app.route("/flashcards/edit/<int:card_id>", methods=["GET", "POST"])
@@ -215,18 +694,17 @@ def study_session():
     db = get_db_connection()
     user_id = session["user_id"]
 
-    # Get all due cards
-    due_cards = get_due_cards(db, user_id)
+    # Only the first card in the queue and the number of due cards are needed
+    current_card, remaining_count = get_study_queue(db, user_id)
 
-    if not due_cards:
+    if current_card is None:
         # If no cards are due, show a "Good Job" page
         return render_template("study_complete.html")
 
-    # Pick the first card in the queue
-    current_card = due_cards[0]
-    remaining_count = len(due_cards)
-
-    return render_template("study.html", card=current_card, count=remaining_count)
+    return render_template(
+        "study.html", card=current_card, count=remaining_count, count_limit=DUE_COUNT_LIMIT,
+        user_id=user_id, batch_max=STUDY_BATCH_MAX,
+    )
 
 
 @app.route("/study/submit/<int:card_id>/<rating>")
@@ -238,14 +716,282 @@ def study_submit(card_id, rating):
     if "user_id" not in session:
         return redirect(url_for("login"))
 
-    if rating not in ["hard", "medium", "easy"]:
+    if rating not in RATINGS:
         return redirect(url_for("study_session"))
 
     db = get_db_connection()
-    process_review(db, session["user_id"], card_id, rating)
+    process_review(db, session["user_id"], card_id, rating, review_log=get_review_log(DB_PATH))
 
     return redirect(url_for("study_session"))
 
 
+@app.route("/study/scheduler", methods=["GET", "POST"])
+def study_scheduler():
+    """Lets the user pick the spaced-repetition algorithm; their cards are rescheduled at once."""
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+
+    db = get_db_connection()
+    user_id = session["user_id"]
+    current, params = get_user_scheduler(db, user_id)
+
+    if request.method == "POST":
+        name = request.form.get("scheduler")
+        new_params = {}
+        if name == "fsrs":
+            retention = request.form.get("desired_retention", type=float)
+            if retention is None or not RETENTION_RANGE[0] <= retention <= RETENTION_RANGE[1]:
+                flash("Target recall must be between 0.70 and 0.97.", "error")
+                return redirect(url_for("study_scheduler"))
+            new_params["desired_retention"] = retention
+
+        try:
+            count = set_user_scheduler(db, user_id, name, new_params)
+        except ValueError:
+            flash("Unknown scheduler.", "error")
+            return redirect(url_for("study_scheduler"))
+
+        flash(f"Scheduler saved. {count} cards were rescheduled.", "success")
+        return redirect(url_for("flashcards"))
+
+    return render_template(
+        "scheduler.html",
+        choices=SCHEDULER_CHOICES,
+        current=current,
+        params=params,
+        default_retention=FSRSScheduler.DEFAULTS["desired_retention"],
+    )
+
+
+@app.route("/stats")
+def stats():
+    """Dashboard: cards per box, due-per-day forecast and retention."""
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+
+    db = get_db_connection()
+    return render_template("stats.html", stats=get_user_stats(db, session["user_id"]))
+
+
+@app.route("/api/stats")
+def api_stats():
+    """The dashboard's numbers as JSON (cached until the user's cards or reviews change)."""
+    if "user_id" not in session:
+        return {"error": "Unauthorized"}, 401
+
+    db = get_db_connection()
+    return get_user_stats(db, session["user_id"])
+
+
+@app.route("/api/study/cards")
+def api_study_cards():
+    """
+    Prefetch for the client-side study loop: the next `limit` due cards
+    plus the (capped) number of cards still due.
+    """
+    if "user_id" not in session:
+        return {"error": "Unauthorized"}, 401
+
+    limit = min(request.args.get("limit", 20, type=int), STUDY_PREFETCH_MAX)
+    db = get_db_connection()
+    user_id = session["user_id"]
+
+    cards = get_next_due_cards(db, user_id, max(limit, 1))
+    return {
+        "cards": [dict(card) for card in cards],
+        "due_count": count_due_cards(db, user_id, DUE_COUNT_LIMIT) if cards else 0,
+        "count_limit": DUE_COUNT_LIMIT,
+    }
+
+
+def _parse_response_ms(value):
+    """Answer time reported by the client, or None when missing or implausible."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    if not 0 <= value <= RESPONSE_MS_MAX:
+        return None
+    return int(value)
+
+
+def _parse_reviewed_at(value):
+    """Client timestamps are epoch milliseconds; missing or future values mean 'now'."""
+    now = datetime.now()
+    try:
+        reviewed_at = datetime.fromtimestamp(float(value) / 1000)
+    except (TypeError, ValueError, OverflowError, OSError):
+        return now
+    return min(reviewed_at, now)
+
+
+@app.route("/api/study/reviews", methods=["POST"])
+def api_study_reviews():
+    """
+    Accepts a batch of reviews made offline by the browser:
+    {"reviews": [{"card_id": 1, "rating": "easy", "reviewed_at": 1700000000000, "response_ms": 4200}, ...]}
+    All of them are applied in one transaction; the review log is written behind it.
+    """
+    if "user_id" not in session:
+        return {"error": "Unauthorized"}, 401
+
+    data = request.get_json(silent=True) or {}
+    items = data.get("reviews")
+    if not isinstance(items, list) or len(items) > STUDY_BATCH_MAX:
+        return {"error": "Invalid reviews batch"}, 400
+
+    reviews = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            card_id = int(item.get("card_id"))
+        except (TypeError, ValueError):
+            continue
+        reviews.append((
+            card_id,
+            item.get("rating"),
+            _parse_reviewed_at(item.get("reviewed_at")),
+            _parse_response_ms(item.get("response_ms")),
+        ))
+
+    db = get_db_connection()
+    applied = process_reviews(db, session["user_id"], reviews, review_log=get_review_log(DB_PATH))
+
+    return {"success": True, "applied": applied}
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus scrape target."""
+    if not METRICS_ENABLED:
+        abort(404)
+    if METRICS_TOKEN:
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {METRICS_TOKEN}"):
+            abort(401)
+    elif not app.debug:
+        abort(401)
+
+    hashing = get_hashing_stats()
+    review_log = get_review_log(DB_PATH)
+    extra = [
+        ("biobuddy_password_hashes_total", "counter", "Password hashes computed.", hashing["completed"]),
+        ("biobuddy_password_hashes_rejected_total", "counter", "Logins turned away because the hashing pool was full.",
+         hashing["rejected"]),
+        ("biobuddy_password_hash_queue_seconds_max", "gauge", "Longest wait for a hashing slot.",
+         hashing["queue_seconds_max"]),
+        ("biobuddy_review_log_pending", "gauge", "Reviews waiting to be written to the log.", review_log.pending()),
+        ("biobuddy_review_log_written_total", "counter", "Reviews written to the log.", review_log.flushed),
+        ("biobuddy_review_log_dropped_total", "counter", "Reviews dropped after repeated write failures.",
+         review_log.dropped),
+        ("biobuddy_catalog_fragment_hits_total", "counter", "Papers pages served from the fragment cache.",
+         _catalog_fragments.hits),
+        ("biobuddy_catalog_fragment_misses_total", "counter", "Papers pages whose grid had to be rendered.",
+         _catalog_fragments.misses),
+    ]
+    return Response(metrics.render(extra), content_type=metrics.CONTENT_TYPE)
+
+
+def warm_up():
+    """
+    Does what the first requests would otherwise do: compiles every template
+    (into the bytecode cache), opens the database and applies migrations,
+    loads the paper catalog and renders each subject's unfiltered grid.
+    Returns the time spent per step in ms.
+    """
+    timings = {}
+    started = time.perf_counter()
+    names = app.jinja_env.list_templates(filter_func=lambda name: name.endswith(".html"))
+    for name in names:
+        app.jinja_env.get_template(name)
+    timings["templates_ms"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with app.test_request_context():
+        db = get_db_connection()
+        catalog = get_catalog(db)
+        timings["database_ms"] = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        for row in get_subjects(db):
+            if catalog.subject(row["name"]) is not None:
+                for logged_in in (False, True):
+                    _catalog_fragment(db, row["name"], _paper_filters_from_args(), logged_in)
+    timings["catalog_pages_ms"] = (time.perf_counter() - started) * 1000
+
+    app.logger.info(
+        "Warm-up: %d templates in %.0f ms, database in %.0f ms, catalog pages in %.0f ms",
+        len(names), timings["templates_ms"], timings["database_ms"], timings["catalog_pages_ms"],
+    )
+    return timings
+
+
+def _template_bytecode_cache(directory):
+    """
+    FileSystemBytecodeCache in `directory`, created with mode 0700. Falls back to
+    Jinja's default directory (which runs the same checks) if another user owns
+    it or can write to it: they could plant bytecode for us to execute.
+    """
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        info = os.lstat(directory)
+    except OSError as e:
+        app.logger.warning("Template cache %s unusable (%s); using Jinja's default", directory, e)
+        return FileSystemBytecodeCache()
+    owned = not hasattr(os, "getuid") or info.st_uid == os.getuid()
+    if not stat.S_ISDIR(info.st_mode) or not owned or info.st_mode & 0o022:
+        app.logger.warning(
+            "Template cache %s is not a private directory of this user; using Jinja's default", directory
+        )
+        return FileSystemBytecodeCache()
+    return FileSystemBytecodeCache(directory)
+
+
+def create_app(warmup=WARMUP):
+    """
+    Finishes configuring the application and returns it (WSGI entry point:
+    `application = create_app()`). The routes are registered when this module
+    is imported, so this sets up the module-level app rather than building a new
+    one; calling it again is harmless.
+    """
+    if TEMPLATE_CACHE_DIR and app.jinja_env.bytecode_cache is None:
+        app.jinja_env.bytecode_cache = _template_bytecode_cache(TEMPLATE_CACHE_DIR)
+    if warmup:
+        warm_up()
+    return app
+
+
+def measure_startup(warmup, path):
+    """Milliseconds from the start of this module's import to being ready and to the first responses."""
+    imported = time.perf_counter()
+    create_app(warmup=warmup)
+    ready = time.perf_counter()
+    client = app.test_client()
+    status = client.get(path).status_code
+    first = time.perf_counter()
+    client.get(path)
+    second = time.perf_counter()
+    return {
+        "path": path,
+        "status": status,
+        "warmup": warmup,
+        "import_ms": round((imported - IMPORT_STARTED) * 1000, 1),
+        "ready_ms": round((ready - IMPORT_STARTED) * 1000, 1),
+        "first_response_ms": round((first - IMPORT_STARTED) * 1000, 1),
+        "second_request_ms": round((second - first) * 1000, 1),
+    }
+
+
 if __name__ == "__main__":
-    app.run(debug=True, port=25001)
+    parser = argparse.ArgumentParser(description="Run the BioBuddy development server.")
+    parser.add_argument("--port", type=int, default=25001)
+    parser.add_argument("--warmup", action="store_true", default=WARMUP,
+                        help="Compile templates and load the catalog before serving")
+    parser.add_argument("--measure-startup", action="store_true",
+                        help="Print import-to-first-response latency as JSON and exit")
+    parser.add_argument("--path", default="/papers/biology", help="Page requested by --measure-startup")
+    args = parser.parse_args()
+
+    if args.measure_startup:
+        print(json.dumps(measure_startup(args.warmup, args.path), indent=2))
+    else:
+        create_app(warmup=args.warmup)
+        app.run(debug=True, port=args.port)
@@ -0,0 +1,77 @@
+"""
+Per-review latency of the study loop as the due backlog grows.
+
+Compares the old path (load every due card, take the first) with
+study.get_study_queue (LIMIT 1 + covering-index count).
+
+Usage (from src/):
+    python bench/bench_study_queue.py
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.getcwd())
+from biobuddy.db import Database
+from biobuddy.study import get_due_cards, get_study_queue, process_review
+from create_db import SCHEMA_SQL
+
+
+BACKLOG_SIZES = [100, 1_000, 10_000, 50_000]
+REVIEWS_PER_RUN = 50  # Less than the smallest backlog, so the queue never runs dry
+
+
+def build_db(path, backlog):
+    db = Database(path, tuned=True)
+    db.execute_script(SCHEMA_SQL)
+    with db.transaction():
+        db.execute("INSERT INTO Users (username, password_hash) VALUES ('bench', 'x')")
+        db.execute("INSERT INTO Subjects (name) VALUES ('Biology')")
+        start = datetime.now() - timedelta(days=365)
+        db.executemany(
+            """
+            INSERT INTO Flashcards (user_id, subject_id, question, answer, leitner_box, next_review_date)
+            VALUES (1, 1, ?, ?, 1, ?)
+            """,
+            (
+                (f"Question {i} " + "x" * 200, f"Answer {i} " + "y" * 400, start + timedelta(minutes=i))
+                for i in range(backlog)
+            ),
+        )
+    return db
+
+
+def old_path(db):
+    due_cards = get_due_cards(db, 1)
+    return due_cards[0], len(due_cards)
+
+
+def new_path(db):
+    return get_study_queue(db, 1)
+
+
+def measure(db, load_queue):
+    """Average milliseconds for one 'rate card -> show next card' cycle."""
+    started = time.perf_counter()
+    for _ in range(REVIEWS_PER_RUN):
+        card, _count = load_queue(db)
+        process_review(db, 1, card["id"], "easy")
+    return (time.perf_counter() - started) * 1000 / REVIEWS_PER_RUN
+
+
+def main():
+    print(f"{'backlog':>8} | {'all due cards (ms)':>18} | {'queue API (ms)':>14}")
+    for backlog in BACKLOG_SIZES:
+        results = []
+        for load_queue in (old_path, new_path):
+            with tempfile.TemporaryDirectory() as tmp:
+                db = build_db(os.path.join(tmp, "bench.db"), backlog)
+                results.append(measure(db, load_queue))
+                db.close()
+        print(f"{backlog:>8} | {results[0]:>18.3f} | {results[1]:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
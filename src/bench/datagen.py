@@ -0,0 +1,182 @@
+"""
+Deterministic synthetic dataset for benchmarks and load tests.
+
+Builds a database from create_db.SCHEMA_SQL with N users, M flashcards per
+user spread over the Leitner boxes (with due dates around "now": some
+overdue, some due today, most in the future), thousands of paper rows and
+favorites. The same seed always produces the same rows; only the due dates
+move with the clock, relative to the time of generation.
+
+Every user's password is BENCH_PASSWORD; usernames are user0001, user0002, ...
+
+Usage (from src/):
+    python bench/datagen.py bench.db --users 50 --cards 2000 --papers 5000
+"""
+import argparse
+import binascii
+import hashlib
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.append(os.getcwd())
+from biobuddy.db import Database
+from biobuddy.migrations import migrate
+from biobuddy.paper_files import PAPER_LEVELS, PAPER_TYPES
+from biobuddy.schedulers import INTERVALS
+from biobuddy.user import HASH_ALGORITHM, PBKDF2_ITERATIONS
+from create_db import SCHEMA_SQL
+
+
+BENCH_PASSWORD = "bench-password"
+SUBJECTS = ("Biology", "Chemistry")
+YEARS = range(1999, 2026)
+
+# Share of reviewed cards per Leitner box (most cards sit in the lower boxes)
+BOX_WEIGHTS = (0.35, 0.25, 0.18, 0.12, 0.10)
+NEW_CARD_SHARE = 0.15  # Never reviewed: due since they were created
+CREATED_WITHIN_DAYS = 365
+
+WORDS = (
+    "cell membrane osmosis diffusion enzyme substrate protein lipid nucleus mitochondria "
+    "ribosome photosynthesis respiration glucose ATP DNA RNA transcription translation "
+    "mutation allele gene chromosome meiosis mitosis ecosystem population evolution "
+    "atom electron orbital bond ionic covalent molecule acid base equilibrium enthalpy "
+    "entropy oxidation reduction catalyst isomer polymer alkane alkene ester titration"
+).split()
+
+
+def username(index):
+    """Name of the index-th generated user (1-based)."""
+    return f"user{index:04d}"
+
+
+def _password_hash(rng):
+    # Same format as biobuddy.user.hash_password, with a seeded salt so reruns match
+    salt = rng.randbytes(16)
+    digest = hashlib.pbkdf2_hmac('sha256', BENCH_PASSWORD.encode('utf-8'), salt, PBKDF2_ITERATIONS)
+    return '$'.join((
+        HASH_ALGORITHM,
+        str(PBKDF2_ITERATIONS),
+        binascii.hexlify(salt).decode('ascii'),
+        binascii.hexlify(digest).decode('ascii'),
+    ))
+
+
+def _sentence(rng, low, high):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high))).capitalize()
+
+
+def _cards(rng, user_id, count, now):
+    boxes = list(INTERVALS)
+    for _ in range(count):
+        subject_id = rng.randint(1, len(SUBJECTS))
+        question = _sentence(rng, 4, 12) + "?"
+        answer = _sentence(rng, 8, 40) + "."
+        created = now - timedelta(days=rng.uniform(0, CREATED_WITHIN_DAYS))
+
+        if rng.random() < NEW_CARD_SHARE:
+            yield (user_id, subject_id, question, answer, 1, created, None, None, 0)
+            continue
+
+        box = rng.choices(boxes, weights=BOX_WEIGHTS)[0]
+        interval = INTERVALS[box]
+        # Last review somewhere up to 1.5 intervals ago: about a third of the cards are overdue
+        last_reviewed = now - timedelta(days=rng.uniform(0, interval * 1.5))
+        next_review = last_reviewed + timedelta(days=interval)
+        yield (user_id, subject_id, question, answer, box, next_review, last_reviewed, interval, box - 1)
+
+
+def _papers(rng, count):
+    """Papers with unique filenames; past the real combinations a variant number keeps them apart."""
+    for index in range(count):
+        subject_id = rng.randint(1, len(SUBJECTS))
+        year = rng.choice(YEARS)
+        level = rng.choice(PAPER_LEVELS)
+        paper_type = rng.choice(PAPER_TYPES)
+        number = rng.randint(1, 3)
+        timezone = rng.choice((None, "TZ1", "TZ2"))
+        filename = f"{SUBJECTS[subject_id - 1]}_{year}_{level}_{paper_type}_{number}_{timezone or 'TZ0'}_{index}.pdf"
+        yield (
+            subject_id, year, level, paper_type, number, timezone, filename,
+            rng.randint(200_000, 5_000_000), rng.randint(8, 40),
+        )
+
+
+def generate(db: Database, users=20, cards_per_user=500, papers=3000, favorites_per_user=20, seed=0):
+    """
+    Creates the schema in an empty database and fills it.
+    Returns {'users', 'cards', 'papers', 'favorites'} row counts.
+    """
+    rng = random.Random(seed)
+    now = datetime.now()
+    db.execute_script(SCHEMA_SQL)
+    password_hash = _password_hash(rng)
+
+    with db.transaction():
+        db.executemany("INSERT INTO Subjects (name) VALUES (?)", [(name,) for name in SUBJECTS])
+        db.executemany(
+            "INSERT INTO Users (username, password_hash) VALUES (?, ?)",
+            # One hash for everyone: PBKDF2 is deliberately slow, and verifying costs the same
+            [(username(index), password_hash) for index in range(1, users + 1)],
+        )
+        db.executemany(
+            """
+            INSERT INTO Papers (subject_id, year, level, type, paper_number, timezone, filename,
+                                file_size, page_count)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            _papers(rng, papers),
+        )
+
+        favorites = 0
+        for user_id in range(1, users + 1):
+            chosen = rng.sample(range(1, papers + 1), min(favorites_per_user, papers))
+            db.executemany(
+                "INSERT INTO Favorites (user_id, paper_id) VALUES (?, ?)",
+                [(user_id, paper_id) for paper_id in chosen],
+            )
+            favorites += len(chosen)
+
+    # Cards go in per user so a large dataset never sits in memory at once
+    for user_id in range(1, users + 1):
+        with db.transaction():
+            db.executemany(
+                """
+                INSERT INTO Flashcards (user_id, subject_id, question, answer, leitner_box,
+                                        next_review_date, last_reviewed, interval_days, repetitions)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                _cards(rng, user_id, cards_per_user, now),
+            )
+
+    # Indexes are built after the bulk load, as they would be on a production database
+    migrate(db)
+    db.execute("ANALYZE")
+    return {
+        'users': users,
+        'cards': users * cards_per_user,
+        'papers': papers,
+        'favorites': favorites,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create a synthetic BioBuddy database for benchmarks.")
+    parser.add_argument("db", help="Database file to create (must not exist)")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--cards", type=int, default=500, help="Flashcards per user")
+    parser.add_argument("--papers", type=int, default=3000)
+    parser.add_argument("--favorites", type=int, default=20, help="Favorite papers per user")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        print(f"Error: {args.db} already exists.")
+        sys.exit(1)
+
+    db = Database(args.db, tuned=True)
+    counts = generate(db, args.users, args.cards, args.papers, args.favorites, args.seed)
+    db.close()
+    print(f"Created {args.db}: " + ", ".join(f"{count} {name}" for name, count in counts.items()))
@@ -0,0 +1,406 @@
+"""
+Concurrent load test: simulated students driving the Flask app end to end.
+
+Every student logs in, then performs a random mix of actions: browsing
+papers with filters, toggling favorites, creating/editing/deleting cards and
+studying (prefetch + batched reviews, or the plain /study pages). Students
+run on a thread pool, either
+
+    inprocess  through app.test_client() in this process (default), or
+    server     over HTTP against a threaded server this script starts in a
+               separate process,
+
+against a database generated by bench/datagen.py. The report gives per-route
+throughput, p50/p95/p99 latency, server errors, and how many requests failed
+with SQLite's "database is locked".
+
+Usage (from src/):
+    python bench/loadtest.py --students 200 --concurrency 16
+    python bench/loadtest.py --mode server --output load.json
+"""
+import argparse
+import http.cookiejar
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+from biobuddy.db import Database
+from bench.datagen import generate, username, BENCH_PASSWORD, SUBJECTS, YEARS
+
+
+DEFAULT_STUDENTS = 100
+DEFAULT_CONCURRENCY = 8
+ACTIONS_PER_STUDENT = 20
+REVIEWS_PER_BATCH = (3, 10)  # Ratings a study action uploads at once (min, max)
+SERVER_START_TIMEOUT = 15.0  # Seconds
+
+# Relative weight of each student action
+ACTION_WEIGHTS = {
+    "browse": 35,
+    "favorite": 10,
+    "deck": 20,
+    "study": 35,
+}
+
+
+def _error_kind(exception):
+    if isinstance(exception, sqlite3.OperationalError) and "locked" in str(exception):
+        return "locked"
+    return type(exception).__name__
+
+
+class Recorder:
+    """Latencies and statuses per route, plus server-side exceptions per endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.statuses = {}
+        self.exceptions = {}  # {endpoint: {kind: count}}
+
+    def record(self, route, status, seconds):
+        with self._lock:
+            self.latencies.setdefault(route, []).append(seconds)
+            counts = self.statuses.setdefault(route, {})
+            counts[status] = counts.get(status, 0) + 1
+
+    def record_exception(self, endpoint, kind):
+        with self._lock:
+            counts = self.exceptions.setdefault(endpoint or "?", {})
+            counts[kind] = counts.get(kind, 0) + 1
+
+    def report(self, wall_seconds):
+        routes = {}
+        for route in sorted(self.latencies):
+            latencies = np.array(self.latencies[route]) * 1000
+            p50, p95, p99 = np.percentile(latencies, (50, 95, 99))
+            statuses = self.statuses[route]
+            routes[route] = {
+                "requests": len(latencies),
+                "rps": round(len(latencies) / wall_seconds, 1),
+                "p50_ms": round(float(p50), 3),
+                "p95_ms": round(float(p95), 3),
+                "p99_ms": round(float(p99), 3),
+                "max_ms": round(float(latencies.max()), 3),
+                "server_errors": sum(count for status, count in statuses.items() if status >= 500),
+                "statuses": {str(status): count for status, count in sorted(statuses.items())},
+            }
+        total = sum(route["requests"] for route in routes.values())
+        return {
+            "requests": total,
+            "rps": round(total / wall_seconds, 1),
+            "wall_seconds": round(wall_seconds, 3),
+            "database_locked": sum(counts.get("locked", 0) for counts in self.exceptions.values()),
+            "exceptions": self.exceptions,
+            "routes": routes,
+        }
+
+
+class TestClientSession:
+    """One student's cookie session through the Flask test client."""
+
+    def __init__(self, flask_app, recorder):
+        self.client = flask_app.test_client()
+        self.recorder = recorder
+
+    def request(self, method, path, route, data=None, json_body=None):
+        started = time.perf_counter()
+        response = self.client.open(path, method=method, data=data, json=json_body)
+        body = response.get_data()
+        self.recorder.record(route, response.status_code, time.perf_counter() - started)
+        return response.status_code, body
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None  # Report the 302 itself, like the test client
+
+
+class HTTPSession:
+    """One student's cookie session over real HTTP."""
+
+    def __init__(self, base_url, recorder):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect
+        )
+
+    def request(self, method, path, route, data=None, json_body=None):
+        headers = {}
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            headers["Content-Type"] = "application/json"
+        elif data is not None:
+            body = urllib.parse.urlencode(data).encode()
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        started = time.perf_counter()
+        try:
+            with self.opener.open(request) as response:
+                status, content = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, content = e.code, e.read()
+        self.recorder.record(route, status, time.perf_counter() - started)
+        return status, content
+
+
+# --- Student actions ---
+def browse(session, rng, state):
+    subject = rng.choice(SUBJECTS).lower()
+    params = {}
+    if rng.random() < 0.7:
+        params["year"] = rng.choice(YEARS)
+    if rng.random() < 0.4:
+        params["level"] = rng.choice(("HL", "SL"))
+    if rng.random() < 0.2:
+        params["type"] = rng.choice(("QP", "MS"))
+    query = "?" + urllib.parse.urlencode(params) if params else ""
+    session.request("GET", f"/papers/{subject}{query}", "GET /papers/<subject>")
+    if rng.random() < 0.3:
+        session.request("GET", f"/api/papers/{subject}/facets{query}", "GET /api/papers/<subject>/facets")
+    if rng.random() < 0.2:
+        session.request("GET", "/", "GET /")
+
+
+def favorite(session, rng, state):
+    session.request(
+        "POST", "/api/toggle_favorite", "POST /api/toggle_favorite",
+        json_body={"paper_id": rng.randint(1, state["papers"])},
+    )
+
+
+def deck(session, rng, state):
+    session.request("GET", "/api/flashcards?limit=50", "GET /api/flashcards")
+    roll = rng.random()
+    if roll < 0.5 or not state["created"]:
+        status, body = session.request(
+            "POST", "/api/flashcards", "POST /api/flashcards",
+            json_body={"subject_id": rng.randint(1, len(SUBJECTS)), "question": "Load test?", "answer": "Yes."},
+        )
+        if status == 201:
+            state["created"].append(json.loads(body)["card"]["id"])
+    elif roll < 0.8:
+        card_id = rng.choice(state["created"])
+        session.request(
+            "PUT", f"/api/flashcards/{card_id}", "PUT /api/flashcards/<id>",
+            json_body={"subject_id": rng.randint(1, len(SUBJECTS)), "question": "Edited?", "answer": "Edited."},
+        )
+    else:
+        card_id = state["created"].pop(rng.randrange(len(state["created"])))
+        session.request("DELETE", f"/api/flashcards/{card_id}", "DELETE /api/flashcards/<id>")
+
+
+def study(session, rng, state):
+    if rng.random() < 0.3:
+        # Server-rendered study loop: one page per card
+        session.request("GET", "/study", "GET /study")
+        status, body = session.request("GET", "/api/study/cards?limit=1", "GET /api/study/cards")
+        cards = json.loads(body)["cards"] if status == 200 else []
+        if cards:
+            rating = rng.choice(("hard", "medium", "easy"))
+            session.request("GET", f"/study/submit/{cards[0]['id']}/{rating}", "GET /study/submit/<id>/<rating>")
+        return
+
+    status, body = session.request("GET", "/api/study/cards?limit=20", "GET /api/study/cards")
+    cards = json.loads(body)["cards"] if status == 200 else []
+    if not cards:
+        return
+    now_ms = int(time.time() * 1000)
+    reviews = [
+        {
+            "card_id": card["id"],
+            "rating": rng.choice(("hard", "medium", "easy")),
+            "reviewed_at": now_ms,
+            "response_ms": rng.randint(1500, 15000),
+        }
+        for card in cards[:rng.randint(*REVIEWS_PER_BATCH)]
+    ]
+    session.request("POST", "/api/study/reviews", "POST /api/study/reviews", json_body={"reviews": reviews})
+
+
+ACTIONS = {"browse": browse, "favorite": favorite, "deck": deck, "study": study}
+
+
+def run_student(make_session, index, users, papers, actions, seed):
+    rng = random.Random(seed * 1_000_003 + index)
+    session = make_session()
+    status, _ = session.request(
+        "POST", "/login", "POST /login",
+        data={"username": username(index % users + 1), "password": BENCH_PASSWORD},
+    )
+    if status != 302:
+        return
+    state = {"papers": papers, "created": []}
+    names = list(ACTION_WEIGHTS)
+    weights = list(ACTION_WEIGHTS.values())
+    for _ in range(actions):
+        ACTIONS[rng.choices(names, weights=weights)[0]](session, rng, state)
+
+
+def run_load(make_session, students, concurrency, users, papers, actions, seed):
+    """Runs every student on a pool of `concurrency` threads. Returns the wall time in seconds."""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [
+            pool.submit(run_student, make_session, index, users, papers, actions, seed)
+            for index in range(students)
+        ]
+        for future in futures:
+            future.result()
+    return time.perf_counter() - started
+
+
+def _watch_exceptions(flask_app, record):
+    """Calls record(endpoint, kind) for every exception a request raises."""
+    from flask import got_request_exception, request
+
+    def on_exception(sender, exception, **extra):
+        record(request.endpoint, _error_kind(exception))
+
+    got_request_exception.connect(on_exception, flask_app, weak=False)
+    # Failures are counted in the report; the tracebacks would drown the output
+    flask_app.logger.setLevel(logging.CRITICAL)
+
+
+def _import_app(db_path):
+    os.environ["BIOBUDDY_DB_PATH"] = db_path
+    import app
+    app.DB_PATH = db_path  # In case it was imported before
+    return app
+
+
+def _serve(db_path, events):
+    """Server process: runs the app on a threaded WSGI server, reports exceptions through `events`."""
+    from werkzeug.serving import make_server
+
+    flask_app = _import_app(db_path).app
+    _watch_exceptions(flask_app, lambda endpoint, kind: events.put(("exception", endpoint, kind)))
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, flask_app, threaded=True)
+    events.put(("ready", server.server_port))
+    server.serve_forever()
+
+
+def run_server_mode(db_path, recorder, **load):
+    context = multiprocessing.get_context("spawn")
+    events = context.Queue()
+    process = context.Process(target=_serve, args=(db_path, events), daemon=True)
+    process.start()
+    try:
+        kind, port = events.get(timeout=SERVER_START_TIMEOUT)
+        base_url = f"http://127.0.0.1:{port}"
+        wall = run_load(lambda: HTTPSession(base_url, recorder), **load)
+        # Exceptions are queued by the server as they happen; collect what arrived
+        while True:
+            try:
+                _, endpoint, kind = events.get(timeout=0.5)
+            except queue.Empty:
+                break
+            recorder.record_exception(endpoint, kind)
+    finally:
+        process.terminate()
+        process.join()
+    return wall
+
+
+def run_inprocess_mode(db_path, recorder, **load):
+    app = _import_app(db_path)
+    _watch_exceptions(app.app, recorder.record_exception)
+    wall = run_load(lambda: TestClientSession(app.app, recorder), **load)
+    # Write the buffered review log now, while the database still exists
+    app.get_review_log(db_path).flush()
+    return wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the Flask app with concurrent simulated students.")
+    parser.add_argument("--mode", choices=("inprocess", "server"), default="inprocess")
+    parser.add_argument("--db", help="Database generated by bench/datagen.py (default: a fresh one)")
+    parser.add_argument("--students", type=int, default=DEFAULT_STUDENTS)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--actions", type=int, default=ACTIONS_PER_STUDENT, help="Actions per student after login")
+    parser.add_argument("--users", type=int, default=20, help="Users in a generated database")
+    parser.add_argument("--cards", type=int, default=500, help="Flashcards per generated user")
+    parser.add_argument("--papers", type=int, default=3000, help="Papers in a generated database")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "load.db")
+        db = Database(db_path, tuned=True)
+        if args.db:
+            dataset = {"db": args.db}
+        else:
+            print("Generating dataset...", file=sys.stderr)
+            dataset = generate(db, args.users, args.cards, args.papers, seed=args.seed)
+        users = db.select_one("SELECT COUNT(*) AS n FROM Users")["n"]
+        papers = db.select_one("SELECT COUNT(*) AS n FROM Papers")["n"]
+        db.close()
+
+        recorder = Recorder()
+        load = dict(
+            students=args.students, concurrency=args.concurrency, users=users,
+            papers=papers, actions=args.actions, seed=args.seed,
+        )
+        print(f"Running {args.students} students, {args.concurrency} at a time ({args.mode})...", file=sys.stderr)
+        if args.mode == "server":
+            wall = run_server_mode(db_path, recorder, **load)
+        else:
+            wall = run_inprocess_mode(db_path, recorder, **load)
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "mode": args.mode,
+            "students": args.students,
+            "concurrency": args.concurrency,
+            "actions_per_student": args.actions,
+            "sqlite": sqlite3.sqlite_version,
+            "dataset": dataset,
+        },
+        **recorder.report(wall),
+    }
+
+    print(f"\n{'route':<36} {'req':>6} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'5xx':>5}", file=sys.stderr)
+    for route, stats in report["routes"].items():
+        print(
+            f"{route:<36} {stats['requests']:>6} {stats['rps']:>7.1f} {stats['p50_ms']:>8.2f} "
+            f"{stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} {stats['server_errors']:>5}",
+            file=sys.stderr,
+        )
+    print(
+        f"\n{report['requests']} requests in {report['wall_seconds']:.1f}s ({report['rps']} req/s), "
+        f"'database is locked': {report['database_locked']}",
+        file=sys.stderr,
+    )
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Microbenchmarks for the hot biobuddy functions, reported as JSON.
+
+Each benchmark calls one function repeatedly against a synthetic database
+(bench/datagen.py) with randomly chosen but seeded arguments, and records
+the latency of every call. The report has ops/sec and latency percentiles
+per benchmark plus the commit and dataset it ran on, so two runs can be
+compared with --compare.
+
+Usage (from src/):
+    python bench/microbench.py --output before.json
+    python bench/microbench.py --output after.json --compare before.json
+
+Without --db a fresh database is generated for every run (the writes of
+process_review and toggle_favorite would otherwise accumulate).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from itertools import count
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+from biobuddy.db import Database
+from biobuddy.favorites import toggle_favorite
+from biobuddy.flashcards import get_user_flashcards, DECK_PAGE_SIZE
+from biobuddy.papers import get_papers
+from biobuddy.study import get_due_cards, process_review, RATINGS
+from biobuddy.user import authenticate_user
+from bench.datagen import generate, username, BENCH_PASSWORD
+
+
+DEFAULT_SECONDS = 2.0  # Measuring time per benchmark
+MIN_ITERATIONS = 20  # Even when a call takes longer than the whole budget
+MAX_ITERATIONS = 100_000
+WARMUP_ITERATIONS = 5
+REGRESSION_THRESHOLD = 0.10  # --compare flags a median latency this much slower
+PERCENTILES = (50, 90, 99)
+
+
+# name -> function(db, rng) returning (callable, iterator of argument tuples)
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def _count(db, table):
+    return db.select_one(f"SELECT COUNT(*) AS n FROM {table}")["n"]
+
+
+@benchmark("get_papers")
+def _bench_get_papers(db, rng):
+    years = [row["year"] for row in db.query("SELECT DISTINCT year FROM Papers")]
+
+    def arguments():
+        while True:
+            filters = {}
+            if rng.random() < 0.6:
+                filters["year"] = str(rng.choice(years))
+            if rng.random() < 0.4:
+                filters["level"] = rng.choice(("HL", "SL"))
+            if rng.random() < 0.3:
+                filters["type"] = rng.choice(("QP", "MS"))
+            yield (rng.choice(("biology", "chemistry")), filters)
+
+    return get_papers, arguments()
+
+
+@benchmark("get_due_cards")
+def _bench_get_due_cards(db, rng):
+    users = _count(db, "Users")
+    return get_due_cards, ((rng.randint(1, users),) for _ in count())
+
+
+@benchmark("process_review")
+def _bench_process_review(db, rng):
+    users = _count(db, "Users")
+    card_ids = {}
+
+    def arguments():
+        while True:
+            user_id = rng.randint(1, users)
+            if user_id not in card_ids:
+                card_ids[user_id] = [row["id"] for row in db.query(
+                    "SELECT id FROM Flashcards WHERE user_id = ?", (user_id,)
+                )]
+            if card_ids[user_id]:
+                yield (user_id, rng.choice(card_ids[user_id]), rng.choice(RATINGS))
+
+    return process_review, arguments()
+
+
+@benchmark("toggle_favorite")
+def _bench_toggle_favorite(db, rng):
+    users = _count(db, "Users")
+    papers = _count(db, "Papers")
+    return toggle_favorite, ((rng.randint(1, users), rng.randint(1, papers)) for _ in count())
+
+
+@benchmark("get_user_flashcards")
+def _bench_get_user_flashcards(db, rng):
+    users = _count(db, "Users")
+
+    def arguments():
+        while True:
+            # First page of the deck, sometimes filtered by subject
+            yield (rng.randint(1, users), None, DECK_PAGE_SIZE, rng.choice((None, 1, 2)))
+
+    return get_user_flashcards, arguments()
+
+
+@benchmark("authenticate_user")
+def _bench_authenticate_user(db, rng):
+    users = _count(db, "Users")
+    return authenticate_user, ((username(rng.randint(1, users)), BENCH_PASSWORD) for _ in count())
+
+
+def measure(db, function, arguments, seconds=DEFAULT_SECONDS):
+    """Calls function(db, *args) until `seconds` have been spent in it. Returns latencies in ns."""
+    for _ in range(WARMUP_ITERATIONS):
+        function(db, *next(arguments))
+
+    samples = []
+    spent = 0
+    budget = seconds * 1e9
+    while len(samples) < MAX_ITERATIONS and (spent < budget or len(samples) < MIN_ITERATIONS):
+        args = next(arguments)
+        started = time.perf_counter_ns()
+        function(db, *args)
+        elapsed = time.perf_counter_ns() - started
+        samples.append(elapsed)
+        spent += elapsed
+    return samples
+
+
+def summarize(samples):
+    latencies = np.array(samples, dtype=float) / 1e6  # ms
+    summary = {
+        "iterations": len(samples),
+        "ops_per_sec": round(len(samples) / (latencies.sum() / 1000), 1),
+        "mean_ms": round(float(latencies.mean()), 4),
+    }
+    for percentile, value in zip(PERCENTILES, np.percentile(latencies, PERCENTILES)):
+        summary[f"p{percentile}_ms"] = round(float(value), 4)
+    summary["max_ms"] = round(float(latencies.max()), 4)
+    return summary
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(db: Database, names=None, seconds=DEFAULT_SECONDS, seed=0, log=None):
+    """Runs the selected benchmarks (all by default). Returns {name: summary}."""
+    results = {}
+    for name in names or BENCHMARKS:
+        function, arguments = BENCHMARKS[name](db, random.Random(seed))
+        results[name] = summarize(measure(db, function, arguments, seconds))
+        if log:
+            log(f"{name:<20} {results[name]['ops_per_sec']:>10.1f} ops/s  p50 {results[name]['p50_ms']:.3f} ms")
+    return results
+
+
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Median latency change per benchmark against an earlier report.
+    Returns [(name, baseline p50, current p50, relative change, regressed)].
+    """
+    rows = []
+    for name, current in report["benchmarks"].items():
+        before = baseline.get("benchmarks", {}).get(name)
+        if before is None:
+            continue
+        change = current["p50_ms"] / before["p50_ms"] - 1 if before["p50_ms"] else 0.0
+        rows.append((name, before["p50_ms"], current["p50_ms"], change, change > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the hot biobuddy functions and report JSON.")
+    parser.add_argument("--db", help="Existing database generated by bench/datagen.py (default: a fresh one)")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--cards", type=int, default=1000, help="Flashcards per user")
+    parser.add_argument("--papers", type=int, default=3000)
+    parser.add_argument("--favorites", type=int, default=20, help="Favorite papers per user")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--seconds", type=float, default=DEFAULT_SECONDS, help="Measuring time per benchmark")
+    parser.add_argument("--only", help="Comma-separated benchmark names (" + ", ".join(BENCHMARKS) + ")")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="Earlier JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Relative p50 slowdown counted as a regression (default 0.10)")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        print(f"Error: unknown benchmark(s): {', '.join(unknown)}")
+        sys.exit(1)
+
+    def log(message):
+        print(message, file=sys.stderr)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.db:
+            db = Database(args.db, tuned=True)
+            dataset = {"db": args.db}
+        else:
+            db = Database(os.path.join(tmp, "bench.db"), tuned=True)
+            log("Generating dataset...")
+            dataset = generate(db, args.users, args.cards, args.papers, args.favorites, args.seed)
+            dataset["seed"] = args.seed
+
+        report = {
+            "meta": {
+                "commit": _git_commit(),
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "platform": platform.platform(),
+                "seconds_per_benchmark": args.seconds,
+                "dataset": dataset,
+            },
+            "benchmarks": run_benchmarks(db, names, args.seconds, args.seed, log),
+        }
+        db.close()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        log(f"Report written to {args.output}")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold)
+        log(f"\nvs {args.compare} (commit {baseline.get('meta', {}).get('commit')}):")
+        for name, before, after, change, regressed in rows:
+            log(f"{name:<20} p50 {before:>9.3f} -> {after:>9.3f} ms  {change:+7.1%}{'  REGRESSION' if regressed else ''}")
+        if any(row[4] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Process-local index of the papers catalog.
+
+The catalog only changes when update_papers.py / create_db.py run, so every
+worker keeps all papers in memory, grouped by subject and already sorted.
+A version counter in the Meta table tells workers when to reload.
+"""
+import sqlite3
+
+from .db import Database
+
+
+CATALOG_VERSION_KEY = 'catalog_version'
+
+# Fields the papers page can filter on
+FILTER_FIELDS = ('year', 'level', 'type', 'paper_number')
+_INT_FIELDS = ('year', 'paper_number')
+
+# Facet counts are cached per filter combination; there are only a few hundred
+FACET_CACHE_SIZE = 512
+
+
+def get_catalog_version(db: Database):
+    """Current catalog version (0 for databases that were never synced)."""
+    try:
+        row = db.select_one("SELECT value FROM Meta WHERE key = ?", (CATALOG_VERSION_KEY,))
+    except sqlite3.OperationalError:
+        # Database created before the Meta table existed
+        return 0
+    return row["value"] if row else 0
+
+
+def bump_catalog_version(db: Database):
+    """Marks the catalog as changed so every worker reloads its index."""
+    db.execute(
+        """
+        INSERT INTO Meta (key, value) VALUES (?, 1)
+        ON CONFLICT(key) DO UPDATE SET value = value + 1
+        """,
+        (CATALOG_VERSION_KEY,),
+    )
+
+
+def _normalize(field, value):
+    """Request args are strings; year and paper_number are stored as integers."""
+    if field in _INT_FIELDS:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    return value
+
+
+class SubjectCatalog:
+    """All papers of one subject in display order, with a lookup set per filter value."""
+
+    def __init__(self, subject_id, papers):
+        self.subject_id = subject_id
+        self.papers = papers
+        # {'year': {2018: {0, 3, ...}}, ...} -> positions in self.papers
+        self.lookup = {field: {} for field in FILTER_FIELDS}
+        for position, paper in enumerate(papers):
+            for field in FILTER_FIELDS:
+                self.lookup[field].setdefault(paper[field], set()).add(position)
+        self.years = sorted(self.lookup['year'], reverse=True)
+        self._facet_cache = {}
+
+    @staticmethod
+    def _active_filters(filters):
+        return {
+            field: _normalize(field, filters[field])
+            for field in FILTER_FIELDS
+            if filters and filters.get(field)
+        }
+
+    def facets(self, filters=None):
+        """
+        Number of papers each filter option would return, given the other active filters.
+        e.g. with level=HL selected, the year counts are "HL papers per year"
+        and the level counts ignore the level filter itself.
+        Returns {'year': [{'value': 2018, 'count': 8}, ...], 'level': [...], ...}
+        """
+        active = self._active_filters(filters)
+        key = tuple(sorted(active.items()))
+        cached = self._facet_cache.get(key)
+        if cached is not None:
+            return cached
+
+        counts = {field: dict.fromkeys(self.lookup[field], 0) for field in FILTER_FIELDS}
+        for field, value in active.items():
+            # Keep a selected option visible even when nothing matches it
+            if value is not None:
+                counts[field].setdefault(value, 0)
+        # One pass: a paper counts for facet F if it matches every active filter except F
+        for paper in self.papers:
+            missed = [field for field, value in active.items() if paper[field] != value]
+            if not missed:
+                for field in FILTER_FIELDS:
+                    counts[field][paper[field]] += 1
+            elif len(missed) == 1:
+                field = missed[0]
+                counts[field][paper[field]] += 1
+
+        result = {
+            field: [
+                {'value': value, 'count': counts[field][value]}
+                for value in sorted(counts[field], reverse=(field == 'year'))
+            ]
+            for field in FILTER_FIELDS
+        }
+        if len(self._facet_cache) >= FACET_CACHE_SIZE:
+            self._facet_cache.clear()
+        self._facet_cache[key] = result
+        return result
+
+    def filter(self, filters=None):
+        """Intersects the lookup sets of the active filters; keeps display order."""
+        selected = None
+        for field, value in self._active_filters(filters).items():
+            positions = self.lookup[field].get(value, set())
+            selected = positions if selected is None else selected & positions
+            if not selected:
+                return []
+
+        if selected is None:
+            return list(self.papers)
+        return [self.papers[position] for position in sorted(selected)]
+
+
+class CatalogIndex:
+    def __init__(self):
+        # (version, {'biology': SubjectCatalog}, {paper_id: paper}) swapped as one object on reload
+        self._state = (None, {}, {})
+
+    def refresh(self, db: Database):
+        """Reloads the index if the catalog version in the database changed."""
+        version = get_catalog_version(db)
+        if version != self._state[0]:
+            self._state = (version,) + self._load(db)
+        return self
+
+    @property
+    def version(self):
+        return self._state[0]
+
+    def subject(self, subject_name):
+        return self._state[1].get(subject_name.lower())
+
+    def paper(self, paper_id):
+        return self._state[2].get(paper_id)
+
+    @staticmethod
+    def _load(db: Database):
+        papers_by_subject = {}
+        papers_by_id = {}
+        rows = db.query(
+            """
+            SELECT p.*, s.name AS subject_name
+            FROM Papers p
+            JOIN Subjects s ON p.subject_id = s.id
+            ORDER BY p.subject_id, p.year DESC, p.level ASC, p.paper_number ASC, p.id ASC
+            """
+        )
+        for row in rows:
+            papers_by_subject.setdefault(row["subject_id"], []).append(row)
+            papers_by_id[row["id"]] = row
+
+        subjects = {}
+        for row in db.query("SELECT id, name FROM Subjects"):
+            subjects[row["name"].lower()] = SubjectCatalog(row["id"], papers_by_subject.get(row["id"], []))
+        return subjects, papers_by_id
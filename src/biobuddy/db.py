@@ -1,23 +1,180 @@
 """
 Database module for SQLite operations.
 """
+import logging
+import os
+import queue
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 
 
-_all_ = ['Database', 'get_db']
+_all_ = ['Database', 'ConnectionPool', 'get_db', 'get_pool', 'add_query_observer', 'remove_query_observer']
+
+
+# Connection tuning, overridable via environment variables.
+BUSY_TIMEOUT_MS = int(os.environ.get('BIOBUDDY_DB_BUSY_TIMEOUT_MS', 5000))
+CACHE_SIZE_KB = int(os.environ.get('BIOBUDDY_DB_CACHE_SIZE_KB', 16384))  # 16 MB page cache
+MMAP_SIZE = int(os.environ.get('BIOBUDDY_DB_MMAP_SIZE', 128 * 1024 * 1024))  # 128 MB
+SYNCHRONOUS = os.environ.get('BIOBUDDY_DB_SYNCHRONOUS', 'NORMAL')  # Safe with WAL
+STATEMENT_CACHE_SIZE = int(os.environ.get('BIOBUDDY_DB_STATEMENT_CACHE', 256))
+POOL_SIZE = int(os.environ.get('BIOBUDDY_DB_POOL_SIZE', 8))  # Idle connections kept per database
+# Statements slower than this are logged with their query plan; unset = off
+SLOW_QUERY_MS = float(os.environ['BIOBUDDY_SLOW_QUERY_MS']) if os.environ.get('BIOBUDDY_SLOW_QUERY_MS') else None
+
+logger = logging.getLogger('biobuddy.db')
+
+# Called as observer(sql, seconds, rows) after every statement run through a Database.
+# A tuple, replaced as a whole, so the query path reads it without a lock.
+_query_observers = ()
+_observers_lock = threading.Lock()
+
+
+def add_query_observer(observer):
+    """observer(sql, seconds, rows) is called after every statement. Adding one twice is a no-op."""
+    global _query_observers
+    with _observers_lock:
+        if observer not in _query_observers:
+            _query_observers = _query_observers + (observer,)
+
+
+def remove_query_observer(observer):
+    global _query_observers
+    with _observers_lock:
+        _query_observers = tuple(o for o in _query_observers if o is not observer)
+
+
+def _param_shape(params):
+    """Types of the bound parameters, never their values: (1, 'x') -> '(int, str)'."""
+    if params is None:
+        return '()'
+    if isinstance(params, dict):
+        return '{' + ', '.join(f'{name}: {type(value).__name__}' for name, value in params.items()) + '}'
+    return '(' + ', '.join(type(value).__name__ for value in params) + ')'
 
 
 class Database:
-    def __init__(self, db_path):
+    def __init__(self, db_path, tuned=False, slow_query_ms=SLOW_QUERY_MS, shared=False):
+        """
+        shared: the connection may be handed from one thread to another (by a
+        ConnectionPool). It must still only be used by one thread at a time.
+        """
         self.db_path = db_path
-        self._conn = sqlite3.connect(self.db_path)
+        self.slow_query_ms = slow_query_ms  # None: no slow-query log
+        # isolation_level=None: statements autocommit unless they run inside
+        # transaction(), which issues BEGIN/COMMIT itself.
+        if tuned:
+            self._conn = sqlite3.connect(
+                self.db_path,
+                timeout=BUSY_TIMEOUT_MS / 1000,
+                cached_statements=STATEMENT_CACHE_SIZE,
+                isolation_level=None,
+                check_same_thread=not shared,
+            )
+            self._apply_pragmas()
+        else:
+            self._conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=not shared)
+        self._tx_depth = 0
         # Enable Foreign Key support (SQLite has it off by default)
         self._conn.execute("PRAGMA foreign_keys = ON;")
         self._conn.row_factory = sqlite3.Row
 
+    def _apply_pragmas(self):
+        """
+        Settings for long-lived connections:
+        WAL lets readers continue while a writer commits, the busy timeout
+        waits for locks instead of failing, and the caches are sized for reuse.
+        """
+        self._conn.execute("PRAGMA journal_mode = WAL;")
+        self._conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS};")
+        self._conn.execute(f"PRAGMA synchronous = {SYNCHRONOUS};")
+        self._conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB};")
+        self._conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE};")
+        self._conn.execute("PRAGMA temp_store = MEMORY;")
+
     def close(self):
         self._conn.close()
 
+    def reset(self):
+        """Discards any uncommitted work so the connection can be reused."""
+        self._tx_depth = 0
+        if self._conn.in_transaction:
+            self._conn.rollback()
+
+    @property
+    def in_transaction(self):
+        return self._tx_depth > 0
+
+    @contextmanager
+    def transaction(self):
+        """
+        Groups several statements into one atomic commit.
+        The outermost block runs BEGIN IMMEDIATE (taking the write lock up front)
+        and COMMIT; nested blocks become savepoints, so an inner failure only
+        rolls back the inner block when the caller handles the exception.
+        """
+        depth = self._tx_depth
+        savepoint = f"sp_{depth}"
+        if depth == 0:
+            self._conn.execute("BEGIN IMMEDIATE")
+        else:
+            self._conn.execute(f"SAVEPOINT {savepoint}")
+        self._tx_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._tx_depth = depth
+            if depth == 0:
+                self._conn.execute("ROLLBACK")
+            else:
+                self._conn.execute(f"ROLLBACK TO {savepoint}")
+                self._conn.execute(f"RELEASE {savepoint}")
+            raise
+        else:
+            self._tx_depth = depth
+            if depth == 0:
+                self._conn.execute("COMMIT")
+            else:
+                self._conn.execute(f"RELEASE {savepoint}")
+
+    def _finish(self, observers, query, params, started, rows, many=False):
+        seconds = time.perf_counter() - started
+        for observer in observers:
+            observer(query, seconds, rows)
+        if self.slow_query_ms is not None and seconds * 1000 >= self.slow_query_ms:
+            self._log_slow_query(query, params, seconds, rows, many)
+
+    def _log_slow_query(self, query, params, seconds, rows, many):
+        if many:
+            # The parameter sequence is consumed by now; bulk statements get no plan
+            shape, plan = f'executemany, {rows} rows', []
+        else:
+            shape = _param_shape(params)
+            try:
+                plan = self.explain(query, params)
+            except sqlite3.Error:
+                plan = []  # DDL, PRAGMA etc. have no plan worth showing
+        logger.warning(
+            "Slow query (%.1f ms, %d rows, params %s): %s%s",
+            seconds * 1000, rows, shape, ' '.join(query.split()),
+            ''.join('\n    ' + line for line in plan),
+        )
+
+    def explain(self, query, params=None):
+        """
+        EXPLAIN QUERY PLAN as indented lines, e.g.
+        ['SEARCH f USING INDEX idx_cards_review (user_id=? AND next_review_date<?)', ...].
+        Nothing is executed.
+        """
+        rows = self._conn.execute(f"EXPLAIN QUERY PLAN {query}", params or ()).fetchall()
+        depth = {0: -1}  # Plan node id -> nesting level; rows are (id, parent, notused, detail)
+        lines = []
+        for row in rows:
+            depth[row[0]] = depth.get(row[1], -1) + 1
+            lines.append('  ' * depth[row[0]] + row[3])
+        return lines
+
     @property
     def connection(self):
         return self._conn
@@ -27,27 +184,150 @@ class Database:
         return self._conn.cursor()
 
     def execute(self, query, params=None):
+        """Runs one statement. Outside of transaction() it is committed immediately."""
+        observers = _query_observers
+        started = time.perf_counter() if observers or self.slow_query_ms is not None else None
         cursor = self._conn.cursor()
         if params:
             cursor.execute(query, params)
         else:
             cursor.execute(query)
-        self._conn.commit()
+        if started is not None:
+            # Rows of a SELECT are fetched later by the caller; rowcount covers DML
+            self._finish(observers, query, params, started, max(cursor.rowcount, 0))
+        return cursor
+
+    def executemany(self, query, seq_of_params):
+        """Runs one statement for every parameter tuple (use inside transaction() for bulk loads)."""
+        observers = _query_observers
+        started = time.perf_counter() if observers or self.slow_query_ms is not None else None
+        cursor = self._conn.cursor()
+        cursor.executemany(query, seq_of_params)
+        if started is not None:
+            self._finish(observers, query, None, started, max(cursor.rowcount, 0), many=True)
         return cursor
 
+    def query(self, query, params=None):
+        """Read path: runs a SELECT and returns all rows, never commits."""
+        observers = _query_observers
+        started = time.perf_counter() if observers or self.slow_query_ms is not None else None
+        cursor = self._conn.cursor()
+        if params:
+            cursor.execute(query, params)
+        else:
+            cursor.execute(query)
+        rows = cursor.fetchall()
+        if started is not None:
+            self._finish(observers, query, params, started, len(rows))
+        return rows
+
     def execute_script(self, script):
         cursor = self._conn.cursor()
         cursor.executescript(script)
-        self._conn.commit()
         return cursor
 
     def select_one(self, query, params=None):
+        observers = _query_observers
+        started = time.perf_counter() if observers or self.slow_query_ms is not None else None
         cursor = self._conn.cursor()
         if params:
             cursor.execute(query, params)
         else:
             cursor.execute(query)
-        return cursor.fetchone()
+        row = cursor.fetchone()
+        if started is not None:
+            self._finish(observers, query, params, started, 0 if row is None else 1)
+        return row
+
+
+class ConnectionPool:
+    """
+    Tuned connections shared by every thread of the process, so a server that
+    starts a thread per request (werkzeug) still reuses them instead of paying
+    for the connect and PRAGMA setup each time.
+
+    Idle connections wait in a LIFO queue of at most `size`: acquire() takes
+    the most recently used one or opens a new one, and release() puts it back,
+    or closes it if `size` are idle already. acquire() never blocks, so a burst
+    of concurrent requests gets extra connections that are closed afterwards.
+    A worker forked from a parent that already had connections opens its own
+    instead of sharing them.
+    """
+
+    def __init__(self, db_path, size=POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._pid = os.getpid()
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            # The parent's connections are left alone: closing them here would
+            # touch file locks the parent still holds.
+            self._idle = queue.LifoQueue(maxsize=self.size)
+            self._pid = os.getpid()
+
+    def acquire(self) -> Database:
+        self._check_pid()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return Database(self.db_path, tuned=True, shared=True)
+
+    def release(self, db: Database):
+        """Returns a connection to the pool instead of closing it."""
+        try:
+            db.reset()
+        except sqlite3.Error:
+            # A broken connection is dropped; a later acquire opens a new one.
+            self._close(db)
+            return
+        self._check_pid()
+        try:
+            self._idle.put_nowait(db)
+        except queue.Full:
+            self._close(db)
+
+    @contextmanager
+    def connection(self):
+        """with pool.connection() as db: ... acquires and releases around the block."""
+        db = self.acquire()
+        try:
+            yield db
+        finally:
+            self.release(db)
+
+    def discard(self):
+        """Closes every idle connection (connections in use are closed on release once full)."""
+        while True:
+            try:
+                db = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(db)
+
+    def idle_count(self):
+        return self._idle.qsize()
+
+    @staticmethod
+    def _close(db):
+        try:
+            db.close()
+        except sqlite3.Error:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path) -> ConnectionPool:
+    """Returns the process-wide pool for a database file."""
+    pool = _pools.get(db_path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(db_path, ConnectionPool(db_path))
+    return pool
 
 
 def get_db(db_path='biobuddy.db') -> Database:
@@ -0,0 +1,241 @@
+"""
+Bulk import and export of flashcard decks.
+
+Supported formats:
+    csv   - header row with subject, question, answer columns
+    jsonl - one {"subject": ..., "question": ..., "answer": ...} object per line
+    tsv   - Anki-style plain text: question<TAB>answer[<TAB>subject],
+            lines starting with '#' (Anki's "#separator:tab" headers) are skipped
+            and <br> stands for a line break
+
+Imports are read as a stream and written in chunks with executemany, one
+transaction per chunk, and exports are generators, so memory use does not
+grow with the size of the deck.
+"""
+import csv
+import io
+import json
+import os
+import re
+
+from .db import Database
+from .stats import bump_stats_version
+
+
+DECK_FORMATS = ('csv', 'jsonl', 'tsv')
+DECK_COLUMNS = ('subject', 'question', 'answer')
+
+IMPORT_CHUNK_SIZE = 500  # Rows per transaction
+EXPORT_PAGE_SIZE = 500  # Rows fetched per query while exporting
+MAX_REPORTED_ERRORS = 100  # Row errors kept in the summary (all are counted)
+
+_TSV_LINE_BREAK = re.compile(r'<br\s*/?>', re.IGNORECASE)
+
+_EXTENSIONS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.tsv': 'tsv', '.txt': 'tsv'}
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'tsv': 'text/tab-separated-values',
+}
+
+
+class DeckFormatError(ValueError):
+    """Raised when an upload cannot be read as a deck at all (bad format or header)."""
+
+
+def guess_format(filename):
+    """Deck format from a file name, e.g. 'cards.csv' -> 'csv'. None if unknown."""
+    return _EXTENSIONS.get(os.path.splitext(filename or '')[1].lower())
+
+
+def _csv_rows(stream):
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [name.strip().lower() for name in header]
+    missing = [name for name in ('question', 'answer') if name not in columns]
+    if missing:
+        raise DeckFormatError(f"CSV header is missing: {', '.join(missing)}")
+
+    for values in reader:
+        if not any(values):
+            continue
+        # Line numbers count the header as line 1
+        yield reader.line_num, dict(zip(columns, values))
+
+
+def _jsonl_rows(stream):
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_no, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield line_no, "Expected a JSON object"
+            continue
+        yield line_no, row
+
+
+def _tsv_rows(stream):
+    for line_no, line in enumerate(stream, start=1):
+        line = line.rstrip('\r\n')
+        if not line.strip() or line.startswith('#'):
+            continue
+        values = [_TSV_LINE_BREAK.sub('\n', value) for value in line.split('\t')]
+        yield line_no, dict(zip(('question', 'answer', 'subject'), values))
+
+
+_READERS = {'csv': _csv_rows, 'jsonl': _jsonl_rows, 'tsv': _tsv_rows}
+
+
+def iter_deck_rows(stream, fmt):
+    """
+    Yields (line_no, row) for every card in a text stream, where row is a dict
+    with 'subject'/'question'/'answer' keys or an error message string.
+    """
+    if fmt not in _READERS:
+        raise DeckFormatError(f"Unknown deck format: {fmt}")
+    return _READERS[fmt](stream)
+
+
+def _validate(row, subjects_map, default_subject_id):
+    """Returns (subject_id, question, answer) or an error message."""
+    question = str(row.get('question') or '').strip()
+    answer = str(row.get('answer') or '').strip()
+    if not question:
+        return "Missing question"
+    if not answer:
+        return "Missing answer"
+
+    subject = str(row.get('subject') or '').strip()
+    if not subject:
+        if default_subject_id is None:
+            return "Missing subject"
+        return default_subject_id, question, answer
+
+    subject_id = subjects_map.get(subject.lower())
+    if subject_id is None:
+        return f"Unknown subject: {subject}"
+    return subject_id, question, answer
+
+
+def import_deck(db: Database, user_id, stream, fmt, default_subject_id=None,
+                chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """
+    Imports cards from a text stream into the user's deck.
+    Valid rows are inserted chunk by chunk (one transaction each), invalid rows are skipped.
+    progress(imported, failed) is called after every chunk.
+    Returns {'imported': n, 'failed': n, 'errors': [(line_no, message), ...]}.
+    Raises DeckFormatError if the stream cannot be parsed as the given format,
+    or if default_subject_id is not a subject (checked before anything is written).
+    """
+    subjects_map = {row["name"].lower(): row["id"] for row in db.query("SELECT id, name FROM Subjects")}
+    if default_subject_id is not None and default_subject_id not in subjects_map.values():
+        raise DeckFormatError("Unknown subject")
+    summary = {'imported': 0, 'failed': 0, 'errors': []}
+
+    def fail(line_no, message):
+        summary['failed'] += 1
+        if len(summary['errors']) < MAX_REPORTED_ERRORS:
+            summary['errors'].append((line_no, message))
+
+    def flush(batch):
+        with db.transaction():
+            db.executemany(
+                """
+                INSERT INTO Flashcards (user_id, subject_id, question, answer, leitner_box, next_review_date)
+                VALUES (?, ?, ?, ?, 1, CURRENT_TIMESTAMP)
+                """,
+                batch,
+            )
+            bump_stats_version(db, user_id)
+        summary['imported'] += len(batch)
+        if progress:
+            progress(summary['imported'], summary['failed'])
+
+    batch = []
+    for line_no, row in iter_deck_rows(stream, fmt):
+        card = row if isinstance(row, str) else _validate(row, subjects_map, default_subject_id)
+        if isinstance(card, str):
+            fail(line_no, card)
+            continue
+
+        batch.append((user_id,) + card)
+        if len(batch) >= chunk_size:
+            flush(batch)
+            batch = []
+
+    if batch:
+        flush(batch)
+    elif progress:
+        progress(summary['imported'], summary['failed'])
+
+    return summary
+
+
+def _iter_cards(db: Database, user_id, subject_id=None):
+    """User's cards in creation order, fetched page by page (keyset on id)."""
+    query = """
+        SELECT f.id, s.name AS subject, f.question, f.answer
+        FROM Flashcards f
+        JOIN Subjects s ON f.subject_id = s.id
+        WHERE f.user_id = ? AND f.id > ?
+    """
+    if subject_id is not None:
+        query += " AND f.subject_id = ?"
+    query += " ORDER BY f.id LIMIT ?"
+
+    last_id = 0
+    while True:
+        params = (user_id, last_id) + ((subject_id,) if subject_id is not None else ()) + (EXPORT_PAGE_SIZE,)
+        page = db.query(query, params)
+        yield from page
+        if len(page) < EXPORT_PAGE_SIZE:
+            return
+        last_id = page[-1]["id"]
+
+
+def _tsv_field(value):
+    # Tabs and line breaks would split the record; Anki renders <br> as a line break
+    return value.replace('\t', ' ').replace('\r\n', '<br>').replace('\n', '<br>')
+
+
+def export_deck(db: Database, user_id, fmt, subject_id=None):
+    """
+    Yields the user's deck as text chunks in the given format (one chunk per page of cards).
+    The output can be imported again with import_deck.
+    """
+    if fmt not in DECK_FORMATS:
+        raise DeckFormatError(f"Unknown deck format: {fmt}")
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    if fmt == 'csv':
+        writer.writerow(DECK_COLUMNS)
+    elif fmt == 'tsv':
+        buffer.write("#separator:tab\n#html:true\n")
+
+    count = 0
+    for card in _iter_cards(db, user_id, subject_id):
+        if fmt == 'csv':
+            writer.writerow([card[column] for column in DECK_COLUMNS])
+        elif fmt == 'jsonl':
+            buffer.write(json.dumps({column: card[column] for column in DECK_COLUMNS}, ensure_ascii=False))
+            buffer.write("\n")
+        else:
+            buffer.write("\t".join(_tsv_field(card[c]) for c in ('question', 'answer', 'subject')))
+            buffer.write("\n")
+
+        count += 1
+        if count % EXPORT_PAGE_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
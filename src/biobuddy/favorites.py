@@ -1,38 +1,59 @@
 """
 The favorites (likes) management module.
 """
+from . import profiles
 from .db import Database
 
+
+# Unknown papers insert nothing (instead of failing the foreign key)
+_INSERT_SQL = """
+    INSERT INTO Favorites (user_id, paper_id)
+    SELECT ?, id FROM Papers WHERE id = ?
+    ON CONFLICT DO NOTHING
+"""
+_DELETE_SQL = "DELETE FROM Favorites WHERE user_id = ? AND paper_id = ?"
+
+
 def toggle_favorite(db: Database, user_id, paper_id):
     """
     If there is a like - removes it. If not - adds it.
-    Returns True if added (active), False if removed.
-    """
-    # 1. Check if already in favorites
-    existing = db.select_one(
-        "SELECT 1 FROM Favorites WHERE user_id = ? AND paper_id = ?", 
-        (user_id, paper_id)
-    )
-    
-    if existing:
-        # Remove
-        db.execute(
-            "DELETE FROM Favorites WHERE user_id = ? AND paper_id = ?", 
-            (user_id, paper_id)
-        )
-        return False
-    else:
-        # Add
-        db.execute(
-            "INSERT INTO Favorites (user_id, paper_id) VALUES (?, ?)", 
-            (user_id, paper_id)
-        )
-        return True
+    Returns True if added (active), False if removed (or the paper does not exist).
+    """
+    with db.transaction():
+        # The DELETE doubles as the existence check: nothing deleted means it was not a favorite
+        if db.execute(_DELETE_SQL, (user_id, paper_id)).rowcount:
+            added = False
+        else:
+            added = db.execute(_INSERT_SQL, (user_id, paper_id)).rowcount > 0
+    profiles.favorite_changed(db, user_id, paper_id, added)
+    return added
+
+
+def set_favorites(db: Database, user_id, add=(), remove=()):
+    """
+    Stars the papers in `add` and unstars those in `remove`, in one transaction.
+    Papers already in the wanted state (or unknown) are skipped.
+    Returns (ids added, ids removed).
+    """
+    added, removed = [], []
+    with db.transaction():
+        for paper_id in remove:
+            if db.execute(_DELETE_SQL, (user_id, paper_id)).rowcount:
+                removed.append(paper_id)
+        for paper_id in add:
+            if db.execute(_INSERT_SQL, (user_id, paper_id)).rowcount:
+                added.append(paper_id)
+
+    for paper_id in removed:
+        profiles.favorite_changed(db, user_id, paper_id, False)
+    for paper_id in added:
+        profiles.favorite_changed(db, user_id, paper_id, True)
+    return added, removed
 
 
 def get_user_favorites(db: Database, user_id):
     """
-    Returns papers favorited by the user, ordered by most recently added.
+    Returns papers favorited by the user, ordered by paper id.
     """
     query = """
         SELECT p.*, s.name as subject_name
@@ -40,14 +61,14 @@ def get_user_favorites(db: Database, user_id):
         JOIN Favorites f ON p.id = f.paper_id
         JOIN Subjects s ON p.subject_id = s.id
         WHERE f.user_id = ?
+        ORDER BY f.paper_id
     """
-    cursor = db.execute(query, (user_id,))
-    return cursor.fetchall()
+    return db.query(query, (user_id,))
 
 
 def get_favorite_ids(db: Database, user_id):
     """
     Returns a set of paper IDs favorited by the user for quick lookup "if paper.id in favorites".
     """
-    cursor = db.execute("SELECT paper_id FROM Favorites WHERE user_id = ?", (user_id,))
-    return {row['paper_id'] for row in cursor.fetchall()}
+    rows = db.query("SELECT paper_id FROM Favorites WHERE user_id = ?", (user_id,))
+    return {row['paper_id'] for row in rows}
@@ -1,24 +1,100 @@
 """
-Module for managing flashcards: create, read, update, delete.
+Module for managing flashcards: create, read, update, delete, search.
 """
+import re
+import sqlite3
+
+from markupsafe import Markup, escape
+
 from .db import Database
+from .stats import bump_stats_version
+
+
+# Cards shown per page of the deck (the rest loads while scrolling)
+DECK_PAGE_SIZE = 50
+
+SEARCH_LIMIT = 20
+SNIPPET_TOKENS = 16  # Words of the answer shown around the matches
+PREFIX_MIN_LENGTH = 2  # A one-letter prefix matches nearly every card, so it is searched as a word
+
+# Full-text index over question/answer. It stores no text of its own (content=Flashcards),
+# and the triggers keep it in step with every insert, edit and delete.
+# Reviews only touch leitner_box/next_review_date, so they never fire the update trigger.
+# user_id is indexed as a token too: a search matches it together with the words, so FTS5
+# only ranks the searching user's cards instead of everyone's matches.
+SEARCH_INDEX_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS FlashcardsSearch USING fts5(
+    question, answer, user_id,
+    content = 'Flashcards', content_rowid = 'id',
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS flashcards_search_insert AFTER INSERT ON Flashcards BEGIN
+    INSERT INTO FlashcardsSearch (rowid, question, answer, user_id)
+    VALUES (new.id, new.question, new.answer, new.user_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS flashcards_search_delete AFTER DELETE ON Flashcards BEGIN
+    INSERT INTO FlashcardsSearch (FlashcardsSearch, rowid, question, answer, user_id)
+    VALUES ('delete', old.id, old.question, old.answer, old.user_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS flashcards_search_update AFTER UPDATE OF question, answer, user_id ON Flashcards BEGIN
+    INSERT INTO FlashcardsSearch (FlashcardsSearch, rowid, question, answer, user_id)
+    VALUES ('delete', old.id, old.question, old.answer, old.user_id);
+    INSERT INTO FlashcardsSearch (rowid, question, answer, user_id)
+    VALUES (new.id, new.question, new.answer, new.user_id);
+END;
+"""
+
+# Control characters as highlight markers: they cannot clash with card text
+# and survive HTML escaping, so they are swapped for <mark> afterwards
+_MARK_START, _MARK_END = '\x02', '\x03'
+_SEARCH_TERM_RE = re.compile(r'\w+', re.UNICODE)
 
 
-def get_user_flashcards(db: Database, user_id):
+def get_user_flashcards(db: Database, user_id, before_id=None, limit=None, subject_id=None):
     """
-    Retrieves all flashcards for a specific user.
+    Retrieves flashcards for a specific user.
     Joins with Subjects table to get friendly names.
     Orders by ID descending (newest first).
+    Keyset pagination: pass the last id of the previous page as before_id,
+    so every page costs the same no matter how deep the user has scrolled.
     """
     query = '''
         SELECT f.*, s.name as subject_name 
         FROM Flashcards f
         JOIN Subjects s ON f.subject_id = s.id
         WHERE f.user_id = ?
-        ORDER BY f.id DESC
     '''
-    cursor = db.execute(query, (user_id,))
-    return cursor.fetchall()
+    params = [user_id]
+
+    if before_id is not None:
+        query += " AND f.id < ?"
+        params.append(before_id)
+
+    if subject_id is not None:
+        query += " AND f.subject_id = ?"
+        params.append(subject_id)
+
+    query += " ORDER BY f.id DESC"
+
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    return db.query(query, tuple(params))
+
+
+def count_user_flashcards(db: Database, user_id, subject_id=None):
+    """Number of cards in the user's deck (optionally for one subject)."""
+    query = "SELECT COUNT(*) AS card_count FROM Flashcards WHERE user_id = ?"
+    params = [user_id]
+    if subject_id is not None:
+        query += " AND subject_id = ?"
+        params.append(subject_id)
+    return db.select_one(query, tuple(params))["card_count"]
 
 
 def get_card_by_id(db: Database, card_id, user_id):
@@ -27,7 +103,12 @@ def get_card_by_id(db: Database, card_id, user_id):
     Crucial for the 'Edit' page to pre-fill the form.
     Includes a user_id check to prevent accessing other people's cards.
     """
-    query = "SELECT * FROM Flashcards WHERE id = ? AND user_id = ?"
+    query = '''
+        SELECT f.*, s.name as subject_name
+        FROM Flashcards f
+        JOIN Subjects s ON f.subject_id = s.id
+        WHERE f.id = ? AND f.user_id = ?
+    '''
     return db.select_one(query, (card_id, user_id))
 
 
@@ -35,38 +116,133 @@ def create_flashcard(db: Database, user_id, subject_id, question, answer):
     """
     Creates a new card.
     Default state: Leitner Box 1, Review Date = Now.
+    Returns the new card's id.
     """
-    db.execute('''
-        INSERT INTO Flashcards (user_id, subject_id, question, answer, leitner_box, next_review_date)
-        VALUES (?, ?, ?, ?, 1, CURRENT_TIMESTAMP)
-    ''', (user_id, subject_id, question, answer))
+    with db.transaction():
+        cursor = db.execute('''
+            INSERT INTO Flashcards (user_id, subject_id, question, answer, leitner_box, next_review_date)
+            VALUES (?, ?, ?, ?, 1, CURRENT_TIMESTAMP)
+        ''', (user_id, subject_id, question, answer))
+        bump_stats_version(db, user_id)
+    return cursor.lastrowid
 
 
 def update_flashcard(db: Database, user_id, card_id, subject_id, question, answer):
     """
     Updates an existing card.
     Security: Always checks user_id to ensure ownership.
+    Returns True if the card was found.
     """
-    db.execute('''
-        UPDATE Flashcards 
-        SET subject_id = ?, question = ?, answer = ?
-        WHERE id = ? AND user_id = ?
-    ''', (subject_id, question, answer, card_id, user_id))
+    with db.transaction():
+        cursor = db.execute('''
+            UPDATE Flashcards 
+            SET subject_id = ?, question = ?, answer = ?
+            WHERE id = ? AND user_id = ?
+        ''', (subject_id, question, answer, card_id, user_id))
+        if cursor.rowcount > 0:
+            bump_stats_version(db, user_id)
+    return cursor.rowcount > 0
 
 
 def delete_flashcard(db: Database, user_id, card_id):
     """
     Permanently removes a card.
+    Returns True if the card was found.
     """
-    db.execute('''
-        DELETE FROM Flashcards 
-        WHERE id = ? AND user_id = ?
-    ''', (card_id, user_id))
+    with db.transaction():
+        cursor = db.execute('''
+            DELETE FROM Flashcards 
+            WHERE id = ? AND user_id = ?
+        ''', (card_id, user_id))
+        if cursor.rowcount > 0:
+            bump_stats_version(db, user_id)
+    return cursor.rowcount > 0
 
 
 def get_subjects(db: Database):
     """
     Helper to populate dropdown menus (Biology, Chemistry).
     """
-    cursor = db.execute("SELECT * FROM Subjects")
-    return cursor.fetchall()
+    return db.query("SELECT * FROM Subjects")
+
+
+def ensure_search_index(db: Database):
+    """
+    Creates the search index and its triggers in databases created before they existed,
+    and indexes the cards that are already there.
+    """
+    exists = db.select_one("SELECT 1 FROM sqlite_master WHERE name = 'FlashcardsSearch'")
+    db.execute_script(SEARCH_INDEX_SQL)
+    if not exists:
+        rebuild_search_index(db)
+
+
+def rebuild_search_index(db: Database):
+    """Re-indexes every card in one pass (faster than the triggers after a bulk load)."""
+    db.execute("INSERT INTO FlashcardsSearch (FlashcardsSearch) VALUES ('rebuild')")
+
+
+def _match_expression(text, user_id):
+    """
+    Turns free text into an FTS5 query over one user's cards: every word must match
+    the question or answer, the last one as a prefix (so results show up while typing).
+    Quoting each word keeps FTS5 syntax out of user input.
+    """
+    terms = _SEARCH_TERM_RE.findall(text or '')
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    if len(terms[-1]) >= PREFIX_MIN_LENGTH:
+        quoted[-1] += '*'
+    words = ' '.join(quoted)
+    return f'user_id : "{int(user_id)}" AND {{question answer}} : ({words})'
+
+
+def _highlight_html(text):
+    """Escapes card text and turns the highlight markers into <mark> tags."""
+    html = str(escape(text))
+    return Markup(html.replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'))
+
+
+def search_flashcards(db: Database, user_id, query, limit=SEARCH_LIMIT, subject_id=None):
+    """
+    Full-text search over the user's cards, best matches first (bm25, question weighted double).
+    Each result has the card columns plus subject_name, and 'question_html' / 'answer_html'
+    with the matched words wrapped in <mark> (the answer is cut to a snippet).
+    """
+    expression = _match_expression(query, user_id)
+    if expression is None:
+        return []
+
+    sql = f"""
+        SELECT f.*, s.name AS subject_name,
+               highlight(FlashcardsSearch, 0, '{_MARK_START}', '{_MARK_END}') AS question_marked,
+               snippet(FlashcardsSearch, 1, '{_MARK_START}', '{_MARK_END}', '…', {SNIPPET_TOKENS}) AS answer_marked
+        FROM FlashcardsSearch
+        JOIN Flashcards f ON f.id = FlashcardsSearch.rowid
+        JOIN Subjects s ON f.subject_id = s.id
+        WHERE FlashcardsSearch MATCH ? AND f.user_id = ?
+    """
+    # The MATCH already keeps to the user's cards; the user_id check on the row is a safeguard
+    params = [expression, user_id]
+    if subject_id is not None:
+        sql += " AND f.subject_id = ?"
+        params.append(subject_id)
+    sql += " ORDER BY bm25(FlashcardsSearch, 2.0, 1.0, 0.0) LIMIT ?"
+    params.append(limit)
+
+    try:
+        rows = db.query(sql, tuple(params))
+    except sqlite3.OperationalError as e:
+        if 'no such table' not in str(e):
+            raise
+        ensure_search_index(db)
+        rows = db.query(sql, tuple(params))
+
+    results = []
+    for row in rows:
+        card = dict(row)
+        card['question_html'] = _highlight_html(card.pop('question_marked'))
+        card['answer_html'] = _highlight_html(card.pop('answer_marked'))
+        results.append(card)
+    return results
@@ -0,0 +1,76 @@
+"""
+Cache for rendered HTML fragments that are shared between users.
+
+A fragment is rendered once with slot markers where per-user values go
+(e.g. whether a paper is starred), and split at those markers. Filling it
+in for a request is then a single join instead of a template render.
+Fragments are kept in a bounded LRU cache keyed by whatever they were
+rendered from (subject, filters, catalog version...).
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from markupsafe import Markup
+
+
+FRAGMENT_CACHE_SIZE = int(os.environ.get('BIOBUDDY_FRAGMENT_CACHE_SIZE', 256))
+
+_SLOT_RE = re.compile(r'<!--slot:([a-z_]+):([^>]*?)-->')
+
+
+def slot(name, value):
+    """Marker for a per-user value; left as an HTML comment if never filled."""
+    return Markup(f'<!--slot:{name}:{value}-->')
+
+
+class Fragment:
+    def __init__(self, html):
+        # re.split with two groups: [text, name, value, text, name, value, ..., text]
+        parts = _SLOT_RE.split(html)
+        self._texts = parts[0::3]
+        self._slots = list(zip(parts[1::3], parts[2::3]))
+
+    def fill(self, value_for):
+        """HTML with every slot replaced by value_for(name, value)."""
+        out = [self._texts[0]]
+        for (name, value), text in zip(self._slots, self._texts[1:]):
+            out.append(value_for(name, value))
+            out.append(text)
+        return Markup(''.join(out))
+
+
+class LRUCache:
+    """Thread-safe mapping that drops the least recently used entry when full."""
+
+    def __init__(self, maxsize=FRAGMENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
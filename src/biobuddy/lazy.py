@@ -0,0 +1,35 @@
+"""
+Deferred imports for heavy modules that only a few code paths need.
+"""
+import importlib
+import sys
+import types
+
+
+class _LazyModule(types.ModuleType):
+    """
+    Stands in for a module until an attribute is first read, then imports it.
+    The import goes through importlib, whose per-module lock makes a thread
+    that asks at the same time wait for the finished module. (LazyLoader
+    has no such lock before Python 3.12, so two request threads could see
+    a half-initialised module.)
+    """
+
+    def __getattr__(self, attr):
+        # Only called for names the proxy itself lacks, i.e. the module's own
+        module = importlib.import_module(self.__name__)
+        value = getattr(module, attr)
+        setattr(self, attr, value)
+        return value
+
+
+def lazy_import(name):
+    """
+    Returns module `name`, imported on first attribute access instead of now.
+    NumPy takes ~80 ms to import and is only used by statistics and batch
+    rescheduling, so workers start serving without it.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return _LazyModule(name)
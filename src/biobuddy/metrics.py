@@ -0,0 +1,191 @@
+"""
+Request and SQL metrics in the Prometheus text format.
+
+Counters live in per-thread shards: a thread only ever writes to its own
+dicts, so recording a request or a query takes no lock. A scrape copies
+every shard and adds them up. Shards of threads that have exited (e.g.
+werkzeug's thread-per-request server) are folded into one "retired" shard,
+so the totals stay monotonic without keeping a shard per dead thread.
+
+Queries are grouped by fingerprint: the SQL with literals replaced by ?
+and whitespace collapsed.
+"""
+import re
+import threading
+from functools import lru_cache
+
+
+# Request latency histogram buckets (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FINGERPRINT_LENGTH = 200  # Longer statements are truncated in labels
+RETIRE_AFTER_SHARDS = 64  # Fold dead threads' shards once this many exist
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _Shard:
+    def __init__(self, thread):
+        self.thread = thread
+        self.requests = {}  # (endpoint, method, status) -> count
+        self.latency = {}  # endpoint -> [bucket counts..., +Inf count, sum]
+        self.queries = {}  # fingerprint -> [count, seconds, rows]
+
+    def merge(self, other):
+        for key, count in list(other.requests.items()):
+            self.requests[key] = self.requests.get(key, 0) + count
+        for table in ('latency', 'queries'):
+            mine = getattr(self, table)
+            for key, values in list(getattr(other, table).items()):
+                values = list(values)
+                if key in mine:
+                    mine[key] = [a + b for a, b in zip(mine[key], values)]
+                else:
+                    mine[key] = values
+
+
+_local = threading.local()
+_shards = []
+_shards_lock = threading.Lock()  # Only taken to add or retire shards
+_retired = _Shard(None)
+
+
+def _shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = _Shard(threading.current_thread())
+        with _shards_lock:
+            if len(_shards) >= RETIRE_AFTER_SHARDS:
+                _retire_dead_shards()
+            _shards.append(shard)
+        _local.shard = shard
+    return shard
+
+
+def _retire_dead_shards():
+    """Caller holds _shards_lock. A dead thread writes no more, so its shard can be merged safely."""
+    alive = []
+    for shard in _shards:
+        if shard.thread.is_alive():
+            alive.append(shard)
+        else:
+            _retired.merge(shard)
+    _shards[:] = alive
+
+
+def observe_request(endpoint, method, status, seconds):
+    shard = _shard()
+    key = (endpoint, method, status)
+    shard.requests[key] = shard.requests.get(key, 0) + 1
+
+    buckets = shard.latency.get(endpoint)
+    if buckets is None:
+        buckets = shard.latency[endpoint] = [0] * (len(LATENCY_BUCKETS) + 2)
+    for index, bound in enumerate(LATENCY_BUCKETS):
+        if seconds <= bound:
+            buckets[index] += 1
+            break
+    else:
+        buckets[len(LATENCY_BUCKETS)] += 1
+    buckets[-1] += seconds
+
+
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)+\s*\)", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """'SELECT * FROM T WHERE id = 5' -> 'SELECT * FROM T WHERE id = ?'."""
+    text = _LITERAL_RE.sub('?', sql)
+    text = _SPACE_RE.sub(' ', text).strip()
+    text = _IN_LIST_RE.sub('IN (...)', text)  # Lists of any length share one fingerprint
+    return text[:FINGERPRINT_LENGTH]
+
+
+def observe_query(sql, seconds, rows):
+    """Database query observer (see biobuddy.db.add_query_observer)."""
+    key = fingerprint(sql)
+    queries = _shard().queries
+    stats = queries.get(key)
+    if stats is None:
+        queries[key] = [1, seconds, rows]
+    else:
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] += rows
+
+
+def snapshot():
+    """All shards added up, as one _Shard."""
+    total = _Shard(None)
+    with _shards_lock:
+        shards = [_retired] + list(_shards)
+    for shard in shards:
+        total.merge(shard)
+    return total
+
+
+def reset():
+    """Forgets every recorded value (tests)."""
+    global _retired
+    with _shards_lock:
+        for shard in _shards:
+            shard.requests.clear()
+            shard.latency.clear()
+            shard.queries.clear()
+        _retired = _Shard(None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(extra=()):
+    """
+    Prometheus text exposition of everything recorded so far.
+    extra: (name, type, help, value) samples to append, e.g. gauges owned by other modules.
+    """
+    data = snapshot()
+    lines = []
+
+    lines.append('# HELP biobuddy_http_requests_total HTTP requests by endpoint, method and status.')
+    lines.append('# TYPE biobuddy_http_requests_total counter')
+    for (endpoint, method, status), count in sorted(data.requests.items()):
+        lines.append(f'biobuddy_http_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {count}')
+
+    lines.append('# HELP biobuddy_http_request_duration_seconds Request latency by endpoint.')
+    lines.append('# TYPE biobuddy_http_request_duration_seconds histogram')
+    for endpoint, buckets in sorted(data.latency.items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), buckets):
+            cumulative += count
+            labels = _labels(endpoint=endpoint, le=bound)
+            lines.append(f'biobuddy_http_request_duration_seconds_bucket{labels} {cumulative}')
+        lines.append(f'biobuddy_http_request_duration_seconds_sum{_labels(endpoint=endpoint)} {_number(buckets[-1])}')
+        lines.append(f'biobuddy_http_request_duration_seconds_count{_labels(endpoint=endpoint)} {cumulative}')
+
+    for name, index, help_text in (
+        ('biobuddy_db_queries_total', 0, 'SQL statements run, by query fingerprint.'),
+        ('biobuddy_db_query_seconds_total', 1, 'Time spent in SQL statements, by query fingerprint.'),
+        ('biobuddy_db_query_rows_total', 2, 'Rows returned (SELECT) or changed (DML), by query fingerprint.'),
+    ):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for query, stats in sorted(data.queries.items()):
+            lines.append(f'{name}{_labels(query=query)} {_number(stats[index])}')
+
+    for name, metric_type, help_text, value in extra:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        lines.append(f'{name} {_number(value)}')
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,165 @@
+"""
+Versioned schema migrations, keyed on PRAGMA user_version.
+
+Each migration has a number; the database remembers the last one applied
+in its header (PRAGMA user_version, 0 for databases created before this
+module). migrate() applies the missing ones in order, so an existing
+database is brought up to date in place, while the app keeps serving:
+
+- A migration runs in one BEGIN IMMEDIATE transaction together with the
+  version bump, so it is applied completely or not at all. (Migration 1
+  cannot: it reuses helpers that call executescript. Run it once, e.g. via
+  create_db.py, before starting several workers on an old database.)
+- In WAL mode readers are never blocked. Writers wait on the busy timeout
+  while an index is built, which takes well under a second at our sizes.
+- Every migration is idempotent (IF NOT EXISTS, column checks), and the
+  version is re-read after taking the write lock, so several workers
+  starting at once apply each migration exactly once.
+
+New migrations are appended at the end with the next number; shipped ones
+are never edited.
+"""
+from .db import Database
+from .flashcards import SEARCH_INDEX_SQL, ensure_search_index
+from .paper_files import ensure_file_columns
+from .review_log import ensure_review_log
+from .study import ensure_scheduler_columns
+
+
+# (version, description, function(db), transactional) in version order
+MIGRATIONS = []
+
+
+def migration(version, description, transactional=True):
+    """Registers a migration. Versions must be consecutive, starting at 1."""
+    def register(function):
+        assert version == len(MIGRATIONS) + 1, f"migration {version} out of order"
+        MIGRATIONS.append((version, description, function, transactional))
+        return function
+    return register
+
+
+@migration(1, "Columns and tables added before migrations existed", transactional=False)
+def _baseline(db: Database):
+    # The ensure_* helpers use executescript, which commits on its own, so this
+    # one runs outside a transaction; every step checks before it changes anything.
+    ensure_file_columns(db)
+    ensure_scheduler_columns(db)
+    ensure_review_log(db)
+    ensure_search_index(db)
+
+
+@migration(2, "Indexes for the catalog, favorites and deck queries")
+def _access_path_indexes(db: Database):
+    # Catalog load (get_papers, get_unique_years, get_facets): papers per subject,
+    # newest first, read in index order instead of being sorted on every reload
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_papers_listing "
+        "ON Papers(subject_id, year DESC, level, paper_number)"
+    )
+    # Favorites are keyed (user_id, paper_id); deleting a paper cascades by paper_id
+    db.execute("CREATE INDEX IF NOT EXISTS idx_favorites_paper ON Favorites(paper_id, user_id)")
+    # Deck pages (get_user_flashcards): one user's cards, newest id first
+    db.execute("CREATE INDEX IF NOT EXISTS idx_cards_deck ON Flashcards(user_id, id)")
+    # Fresh statistics so the planner picks the new indexes
+    for table in ("Papers", "Favorites", "Flashcards"):
+        db.execute(f"ANALYZE {table}")
+
+
+@migration(3, "Favorite count per paper, kept up to date by triggers")
+def _favorite_counts(db: Database):
+    columns = {row["name"] for row in db.query("PRAGMA table_info(Papers)")}
+    if "favorite_count" not in columns:
+        db.execute("ALTER TABLE Papers ADD COLUMN favorite_count INTEGER NOT NULL DEFAULT 0")
+    db.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS favorites_count_insert AFTER INSERT ON Favorites BEGIN
+            UPDATE Papers SET favorite_count = favorite_count + 1 WHERE id = new.paper_id;
+        END
+        """
+    )
+    db.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS favorites_count_delete AFTER DELETE ON Favorites BEGIN
+            UPDATE Papers SET favorite_count = favorite_count - 1 WHERE id = old.paper_id;
+        END
+        """
+    )
+    # One GROUP BY now, for the favorites that exist already; the triggers keep it from here
+    db.execute(
+        """
+        UPDATE Papers
+        SET favorite_count = (SELECT COUNT(*) FROM Favorites WHERE Favorites.paper_id = Papers.id)
+        """
+    )
+    # Most starred papers of a subject (papers.get_popular_papers)
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_papers_popular ON Papers(subject_id, favorite_count DESC)"
+    )
+
+
+@migration(4, "Meta table for version counters")
+def _meta_table(db: Database):
+    # bump_stats_version runs on every review and card edit, so it relies on
+    # the table existing instead of creating it each time
+    db.execute("CREATE TABLE IF NOT EXISTS Meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+
+@migration(5, "Search index scoped per user", transactional=False)
+def _search_index_by_user(db: Database):
+    # FTS5 tables cannot gain a column, so the index is dropped and rebuilt with user_id.
+    # The script (executescript, hence not transactional) wraps it in its own transaction.
+    columns = {row["name"] for row in db.query("PRAGMA table_info(FlashcardsSearch)")}
+    if "user_id" in columns:
+        return
+    db.execute_script(
+        """
+        BEGIN IMMEDIATE;
+        DROP TRIGGER IF EXISTS flashcards_search_insert;
+        DROP TRIGGER IF EXISTS flashcards_search_delete;
+        DROP TRIGGER IF EXISTS flashcards_search_update;
+        DROP TABLE IF EXISTS FlashcardsSearch;
+        """
+        + SEARCH_INDEX_SQL
+        + """
+        INSERT INTO FlashcardsSearch (FlashcardsSearch) VALUES ('rebuild');
+        COMMIT;
+        """
+    )
+
+
+LATEST_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(db: Database):
+    return db.select_one("PRAGMA user_version")[0]
+
+
+def _set_schema_version(db: Database, version):
+    # PRAGMA takes no parameters; version is always an int from MIGRATIONS
+    db.execute(f"PRAGMA user_version = {int(version)}")
+
+
+def migrate(db: Database, log=None):
+    """
+    Applies every migration newer than the database's version, in order.
+    Returns the versions applied (empty if the schema was already current).
+    """
+    applied = []
+    for version, description, function, transactional in MIGRATIONS:
+        if get_schema_version(db) >= version:
+            continue
+        if transactional:
+            with db.transaction():
+                # Another process may have applied it while we waited for the lock
+                if get_schema_version(db) >= version:
+                    continue
+                function(db)
+                _set_schema_version(db, version)
+        else:
+            function(db)
+            _set_schema_version(db, version)
+        applied.append(version)
+        if log:
+            log(f"Applied migration {version}: {description}")
+    return applied
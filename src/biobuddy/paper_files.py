@@ -0,0 +1,310 @@
+"""
+Paper PDF files on disk: filename parsing and incremental catalog sync.
+
+Filenames follow {Subject}_{Year}_{Level}_{Type}_{Number}[_TZ{n}].pdf,
+e.g. Biology_2022_HL_MS_1_TZ2.pdf.
+
+Every synced paper stores its file size, mtime, SHA-256 and page count,
+so a re-run only reads files whose stat changed and can tell renames
+(same content, new name) from real additions. Metadata extraction runs
+in a process pool, so a bulk import uses every core.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .db import Database
+from .catalog import bump_catalog_version
+
+
+PAPER_LEVELS = ('HL', 'SL')
+PAPER_TYPES = ('QP', 'MS')  # QP: Question Paper, MS: Mark Scheme
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Below this many changed files the process pool costs more than it saves
+PARALLEL_MIN_FILES = 8
+
+# Columns added to Papers for the sync manifest: name -> SQL type
+FILE_COLUMNS = {
+    'file_size': 'INTEGER',
+    'file_mtime_ns': 'INTEGER',
+    'sha256': 'TEXT',
+    'page_count': 'INTEGER',
+    'timezone': 'TEXT',
+}
+
+_TIMEZONE_RE = re.compile(r'^(TZ\d+)')
+# A page object is "/Type /Page"; "/Type /Pages" is the page tree node
+_PAGE_RE = re.compile(rb'/Type\s*/Page(?![A-Za-z])')
+_PAGE_RE_OVERLAP = 32
+
+
+class PaperFilenameError(ValueError):
+    """Raised when a filename does not follow the papers naming scheme."""
+
+
+def parse_paper_filename(filename):
+    """
+    Parses a paper filename into its catalog fields.
+    Returns dict with keys 'subject', 'year', 'level', 'type', 'paper_number', 'timezone'
+    ('timezone' is e.g. 'TZ1', or None when the paper has a single timezone).
+    Raises PaperFilenameError describing the first invalid part.
+    """
+    if not filename.endswith(".pdf"):
+        raise PaperFilenameError(f"Not a PDF: {filename}")
+
+    name_parts = filename[:-len(".pdf")].split("_")
+    if len(name_parts) < 5:
+        raise PaperFilenameError(f"Invalid format: {filename}")
+
+    subj_str, year, level, type_str, num = name_parts[:5]
+
+    if not year.isdigit():
+        raise PaperFilenameError(f"Invalid year: {year} in {filename}")
+    if level not in PAPER_LEVELS:
+        raise PaperFilenameError(f"Invalid level: {level} in {filename}")
+    if type_str not in PAPER_TYPES:
+        raise PaperFilenameError(f"Invalid type: {type_str} in {filename}")
+    if not num.isdigit():
+        raise PaperFilenameError(f"Invalid number: {num} in {filename}")
+
+    timezone = None
+    for part in name_parts[5:]:
+        match = _TIMEZONE_RE.match(part)
+        if match:
+            timezone = match.group(1)
+            break
+
+    return {
+        'subject': subj_str,
+        'year': int(year),
+        'level': level,
+        'type': type_str,
+        'paper_number': int(num),
+        'timezone': timezone,
+    }
+
+
+def scan_directory(papers_dir):
+    """
+    Cheap stat snapshot of the papers folder: {filename: (size, mtime_ns)}.
+    Uses os.scandir, so no extra stat call per file on most platforms.
+    """
+    snapshot = {}
+    with os.scandir(papers_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith(".pdf") and entry.is_file():
+                stat = entry.stat()
+                snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+def extract_pdf_metadata(path):
+    """
+    Reads a PDF once, in chunks, and returns {'size', 'sha256', 'page_count'}.
+    page_count counts page objects and is None when they are hidden in
+    compressed object streams.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    pages = 0
+    tail = b""
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+            # Keep the end of the previous chunk so a marker split across chunks is still found
+            window = tail + chunk
+            pages += len(_PAGE_RE.findall(window))
+            tail = window[-_PAGE_RE_OVERLAP:]
+            pages -= len(_PAGE_RE.findall(tail))
+    # Nothing follows the final tail, so count it here
+    pages += len(_PAGE_RE.findall(tail))
+
+    return {'size': size, 'sha256': digest.hexdigest(), 'page_count': pages or None}
+
+
+def _extract_all(paths, workers=None):
+    """Metadata for many files, spread over a process pool for large batches."""
+    if len(paths) < PARALLEL_MIN_FILES:
+        return [extract_pdf_metadata(path) for path in paths]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(extract_pdf_metadata, paths, chunksize=4))
+
+
+def ensure_file_columns(db: Database):
+    """Adds the manifest columns to Papers in databases created before they existed."""
+    existing = {row["name"] for row in db.query("PRAGMA table_info(Papers)")}
+    for column, sql_type in FILE_COLUMNS.items():
+        if column not in existing:
+            db.execute(f"ALTER TABLE Papers ADD COLUMN {column} {sql_type}")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_papers_sha256 ON Papers(sha256)")
+
+
+def find_duplicate_papers(db: Database):
+    """Groups of filenames whose contents are identical: [[filename, ...], ...]."""
+    rows = db.query(
+        """
+        SELECT sha256, filename FROM Papers
+        WHERE sha256 IN (
+            SELECT sha256 FROM Papers WHERE sha256 IS NOT NULL
+            GROUP BY sha256 HAVING COUNT(*) > 1
+        )
+        ORDER BY sha256, filename
+        """
+    )
+    groups = {}
+    for row in rows:
+        groups.setdefault(row["sha256"], []).append(row["filename"])
+    return list(groups.values())
+
+
+def _plan_sync(db: Database, papers_dir, snapshot, log, workers):
+    """
+    Works out what changed without holding a write lock (reading the files takes a while).
+    Returns (changes, known, summary): changes lists (filename, info, subject_id, stat, metadata)
+    for new or modified files, known maps filename -> (size, mtime_ns, sha256) for the DB.
+    """
+    summary = dict.fromkeys(('added', 'renamed', 'updated', 'removed', 'skipped', 'unchanged'), 0)
+
+    subjects_map = {row["name"].lower(): row["id"] for row in db.query("SELECT name, id FROM Subjects")}
+    known = {
+        row["filename"]: (row["file_size"], row["file_mtime_ns"], row["sha256"])
+        for row in db.query("SELECT filename, file_size, file_mtime_ns, sha256 FROM Papers")
+    }
+
+    candidates = []
+    for filename in sorted(snapshot):
+        stat = snapshot[filename]
+        if filename in known and known[filename][:2] == stat:
+            summary['unchanged'] += 1
+            continue
+
+        try:
+            info = parse_paper_filename(filename)
+        except PaperFilenameError as e:
+            log(f" - Skipping: {e}")
+            summary['skipped'] += 1
+            continue
+
+        subject_id = subjects_map.get(info['subject'].lower())
+        if not subject_id:
+            log(f" - Unknown subject: {info['subject']} in {filename}")
+            summary['skipped'] += 1
+            continue
+
+        candidates.append((filename, info, subject_id, stat))
+
+    metadata = _extract_all([os.path.join(papers_dir, c[0]) for c in candidates], workers)
+    changes = [candidate + (meta,) for candidate, meta in zip(candidates, metadata)]
+    return changes, known, summary
+
+
+def sync_paper_files(db: Database, papers_dir, log=print, workers=None):
+    """
+    Brings the Papers table in line with the PDFs in papers_dir.
+    Only new files and files whose size/mtime changed are read (in parallel).
+    A new file with the same content as a vanished one is treated as a rename,
+    so the paper keeps its id (and everyone's favorites).
+    All changes are applied in one transaction. The schema must be migrated
+    already (biobuddy.migrations), which the scripts do once at startup.
+    Returns counts: {'added', 'renamed', 'updated', 'removed', 'skipped', 'unchanged'}.
+    """
+    snapshot = scan_directory(papers_dir)
+    changes, known, summary = _plan_sync(db, papers_dir, snapshot, log, workers)
+
+    # Files that disappeared, indexed by content hash to detect renames
+    vanished = set(known) - set(snapshot)
+    vanished_by_hash = {known[name][2]: name for name in vanished if known[name][2]}
+
+    with db.transaction():
+        for filename, info, subject_id, (size, mtime_ns), meta in changes:
+            fields = (
+                subject_id, info['year'], info['level'], info['type'], info['paper_number'],
+                info['timezone'], size, mtime_ns, meta['sha256'], meta['page_count'],
+            )
+            if filename in known:
+                # Replaced in place (or a row synced before file metadata was recorded)
+                old_name = filename
+                if known[filename][2] != meta['sha256']:
+                    log(f" ~ Updated: {filename}")
+                    summary['updated'] += 1
+                else:
+                    summary['unchanged'] += 1
+            elif meta['sha256'] in vanished_by_hash:
+                old_name = vanished_by_hash.pop(meta['sha256'])
+                vanished.discard(old_name)
+                log(f" > Renamed: {old_name} -> {filename}")
+                summary['renamed'] += 1
+            else:
+                old_name = None
+
+            if old_name is None:
+                db.execute(
+                    """
+                    INSERT INTO Papers (subject_id, year, level, type, paper_number, timezone,
+                                        file_size, file_mtime_ns, sha256, page_count, filename)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    fields + (filename,),
+                )
+                log(f" + Added: {filename}")
+                summary['added'] += 1
+            else:
+                db.execute(
+                    """
+                    UPDATE Papers
+                    SET subject_id = ?, year = ?, level = ?, type = ?, paper_number = ?, timezone = ?,
+                        file_size = ?, file_mtime_ns = ?, sha256 = ?, page_count = ?, filename = ?
+                    WHERE filename = ?
+                    """,
+                    fields + (filename, old_name),
+                )
+
+        if vanished:
+            removed = sorted(vanished)
+            db.executemany("DELETE FROM Papers WHERE filename = ?", [(filename,) for filename in removed])
+            for filename in removed:
+                log(f" - Deleted: {filename}")
+            summary['removed'] = len(removed)
+
+        if summary['added'] or summary['renamed'] or summary['updated'] or summary['removed']:
+            # Tell running app workers to reload their catalog index
+            bump_catalog_version(db)
+
+    if summary['added'] or summary['renamed']:
+        for group in find_duplicate_papers(db):
+            log(f" ! Identical files: {', '.join(group)}")
+
+    return summary
+
+
+def watch_paper_files(db: Database, papers_dir, interval=2.0, log=print):
+    """
+    Polls papers_dir and syncs whenever its stat snapshot changes.
+    Runs until interrupted (Ctrl+C).
+    """
+    previous = None
+    while True:
+        try:
+            snapshot = scan_directory(papers_dir)
+            summary = sync_paper_files(db, papers_dir, log=log) if snapshot != previous else None
+        except (sqlite3.OperationalError, OSError) as e:
+            # e.g. database is locked, or a PDF was removed between the scan and
+            # hashing it: keep `previous` so the next poll retries
+            log(f"Sync failed, retrying: {e}")
+        else:
+            if summary is not None:
+                changes = {
+                    key: value for key, value in summary.items()
+                    if value and key not in ('unchanged', 'skipped')
+                }
+                if changes:
+                    log(f"[{time.strftime('%H:%M:%S')}] Synced: {changes}")
+                previous = snapshot
+        time.sleep(interval)
@@ -2,61 +2,78 @@
 Module for retrieving papers based on subject and filters.
 """
 from .db import Database
+from .catalog import CatalogIndex
+
+
+POPULAR_LIMIT = 10  # Papers listed by get_popular_papers by default
+
+# Shared by all requests of this worker; reloaded when the catalog version changes
+_catalog = CatalogIndex()
+
+
+def get_catalog(db: Database) -> CatalogIndex:
+    """Returns the in-memory catalog index, reloading it if the catalog was synced."""
+    return _catalog.refresh(db)
 
 
 def get_papers(db: Database, subject_name, filters=None):
     """
     Retrieves papers based on subject and optional filters.
     filters: dict with keys 'year', 'level', 'type', 'paper_number'
+    Results are sorted by year (newest first), level and paper number.
     """
-    # 1. Find subject ID
-    subj_row = db.select_one(
-        "SELECT id FROM Subjects WHERE name = ?", (subject_name.capitalize(),)
-    )
-    if not subj_row:
+    subject = get_catalog(db).subject(subject_name)
+    if subject is None:
         return []
 
-    subject_id = subj_row["id"]
-
-    # 2. Basic query
-    query = "SELECT * FROM Papers WHERE subject_id = ?"
-    params = [subject_id]
+    return subject.filter(filters)
 
-    # 3. Dynamically add filters
-    if filters:
-        if filters.get("year"):
-            query += " AND year = ?"
-            params.append(filters["year"])
 
-        if filters.get("level"):
-            query += " AND level = ?"
-            params.append(filters["level"])
+def get_paper(db: Database, paper_id):
+    """Single paper (with subject_name) by id, or None."""
+    return get_catalog(db).paper(paper_id)
 
-        if filters.get("type"):
-            query += " AND type = ?"
-            params.append(filters["type"])
 
-        if filters.get("paper_number"):
-            query += " AND paper_number = ?"
-            params.append(filters["paper_number"])
-
-    # 4. Sort results
-    query += " ORDER BY year DESC, level ASC, paper_number ASC"
+def get_facets(db: Database, subject_name, filters=None):
+    """
+    Option counts for the filter dropdowns, e.g. {'year': [{'value': 2018, 'count': 8}, ...]}.
+    Each facet's counts respect all the other selected filters.
+    Returns None for an unknown subject.
+    """
+    subject = get_catalog(db).subject(subject_name)
+    if subject is None:
+        return None
 
-    cursor = db.execute(query, tuple(params))
-    return cursor.fetchall()
+    return subject.facets(filters)
 
 
 def get_unique_years(db: Database, subject_name):
     """Helper to populate the Year dropdown filter."""
-    subj_row = db.select_one(
-        "SELECT id FROM Subjects WHERE name = ?", (subject_name.capitalize(),)
-    )
-    if not subj_row:
+    subject = get_catalog(db).subject(subject_name)
+    if subject is None:
+        return []
+
+    return list(subject.years)
+
+
+def get_popular_papers(db: Database, subject_name, limit=POPULAR_LIMIT):
+    """
+    The subject's most starred papers (favorite_count, kept by triggers on
+    Favorites), most starred first. Read from the table, not the catalog,
+    since the counts change with every star.
+    """
+    subject = get_catalog(db).subject(subject_name)
+    if subject is None:
         return []
 
-    cursor = db.execute(
-        "SELECT DISTINCT year FROM Papers WHERE subject_id = ? ORDER BY year DESC",
-        (subj_row["id"],),
+    return db.query(
+        """
+        SELECT p.*, s.name AS subject_name
+        FROM Papers p
+        JOIN Subjects s ON p.subject_id = s.id
+        WHERE p.subject_id = ? AND p.favorite_count > 0
+        ORDER BY p.favorite_count DESC, p.id
+        LIMIT ?
+        """,
+        (subject.subject_id, limit),
     )
-    return [row["year"] for row in cursor.fetchall()]
@@ -0,0 +1,92 @@
+"""
+Per-process cache of the user data shown on most pages: the username, the
+ids of the user's favorite papers and the favorite papers themselves.
+
+Entries live for PROFILE_TTL seconds. Favorites toggled through this worker
+update the cached entry in place (see favorites.toggle_favorite); changes
+made by another worker, or a paper sync that renamed a favorite, show up
+here once the entry expires. The papers page, whose ETag depends on the
+stars, reads them from the database instead.
+"""
+import os
+import threading
+import time
+from typing import NamedTuple
+
+from . import favorites
+from .db import Database
+from .papers import get_paper
+
+
+PROFILE_TTL = float(os.environ.get('BIOBUDDY_PROFILE_TTL', 60))  # Seconds
+PROFILE_CACHE_SIZE = 4096  # Users kept in the cache; it is cleared when full
+
+
+class Profile(NamedTuple):
+    username: str
+    favorite_ids: frozenset
+    favorites: tuple  # Paper rows (with subject_name), ordered by id like get_user_favorites;
+                      # their favorite_count is as of loading and not kept current
+
+
+_cache = {}  # user_id -> (expires_at, Profile)
+_lock = threading.Lock()
+_changes = 0  # Bumped on every in-place update, so a load racing with one is not stored
+
+
+def get_profile(db: Database, user_id):
+    """The user's Profile, from the cache when fresh. None if the user does not exist."""
+    now = time.monotonic()
+    entry = _cache.get(user_id)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    changes = _changes
+    user = db.select_one("SELECT username FROM Users WHERE id = ?", (user_id,))
+    if user is None:
+        invalidate_profile(user_id)
+        return None
+    rows = favorites.get_user_favorites(db, user_id)
+    profile = Profile(user["username"], frozenset(row["id"] for row in rows), tuple(rows))
+
+    with _lock:
+        if changes == _changes:
+            if len(_cache) >= PROFILE_CACHE_SIZE:
+                _cache.clear()
+            _cache[user_id] = (now + PROFILE_TTL, profile)
+    return profile
+
+
+def invalidate_profile(user_id=None):
+    """Drops one user's entry (or every entry)."""
+    global _changes
+    with _lock:
+        _changes += 1
+        if user_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(user_id, None)
+
+
+def favorite_changed(db: Database, user_id, paper_id, added):
+    """Applies a committed favorite toggle to the cached entry, if there is one."""
+    global _changes
+    paper = get_paper(db, paper_id) if added else None
+    with _lock:
+        _changes += 1
+        entry = _cache.get(user_id)
+        if entry is None:
+            return
+        expires_at, profile = entry
+        if added == (paper_id in profile.favorite_ids):
+            return
+        if added:
+            if paper is None:  # Not in this worker's catalog yet: reload next time
+                del _cache[user_id]
+                return
+            rows = sorted(profile.favorites + (paper,), key=lambda row: row["id"])
+            ids = profile.favorite_ids | {paper_id}
+        else:
+            rows = [row for row in profile.favorites if row["id"] != paper_id]
+            ids = profile.favorite_ids - {paper_id}
+        _cache[user_id] = (expires_at, profile._replace(favorite_ids=ids, favorites=tuple(rows)))
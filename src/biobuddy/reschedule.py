@@ -0,0 +1,217 @@
+"""
+Batch rescheduling: recomputes due dates for many cards at once.
+
+Used when a user switches scheduler or changes its parameters (and for the
+whole database when the defaults change). Card states are loaded into NumPy
+arrays, every card's interval is recomputed in a few vectorized operations
+per scheduler, and the results are written back with executemany in one
+transaction.
+
+Each card keeps its last review time and gets the interval the new
+scheduler would have given it then. Cards that were never reviewed, or whose
+last answer was 'hard' (due again right away), keep their due date.
+"""
+import json
+import time
+from itertools import islice
+
+from .db import Database
+from .lazy import lazy_import
+from .stats import bump_stats_version
+from .schedulers import (
+    SCHEDULERS, DEFAULT_SCHEDULER, FSRS_FACTOR, FSRS_DECAY, MAX_BOX, get_scheduler
+)
+
+np = lazy_import('numpy')
+
+
+WRITE_CHUNK_SIZE = 10_000  # Rows per executemany call
+
+_LOAD_SQL = """
+    SELECT f.id, f.leitner_box, f.ease, f.interval_days, f.stability, f.difficulty,
+           julianday(f.last_reviewed), u.scheduler, u.scheduler_params
+    FROM Flashcards f
+    JOIN Users u ON u.id = f.user_id
+    WHERE f.last_reviewed IS NOT NULL AND f.interval_days > 0
+"""
+
+# next_review_date is written in the same text format as the rest of the app uses
+_WRITE_SQL = """
+    UPDATE Flashcards
+    SET next_review_date = strftime('%Y-%m-%d %H:%M:%f', ?),
+        interval_days = ?,
+        ease = COALESCE(?, ease),
+        stability = COALESCE(?, stability),
+        difficulty = COALESCE(?, difficulty)
+    WHERE id = ?
+"""
+
+
+def load_card_states(db: Database, user_id=None):
+    """
+    Reviewed cards of one user (or everyone) as column arrays:
+    {'id', 'leitner_box', 'ease', 'interval_days', 'stability', 'difficulty', 'reviewed_jd', 'group'}.
+    NULLs become NaN; reviewed_jd is the last review as a Julian day;
+    group indexes `groups`, the list of distinct (scheduler, params_json) pairs.
+    Returns (arrays, groups).
+    """
+    sql = _LOAD_SQL
+    params = ()
+    if user_id is not None:
+        sql += " AND f.user_id = ?"
+        params = (user_id,)
+
+    # Plain tuples are much cheaper to build than sqlite3.Row for 100k+ rows
+    cursor = db.cursor
+    cursor.row_factory = None
+    rows = cursor.execute(sql, params).fetchall()
+
+    columns = list(zip(*rows)) if rows else [()] * 9
+    group_keys = list(zip(columns[7], columns[8]))
+    groups = sorted(set(group_keys), key=lambda key: (key[0] or '', key[1] or ''))
+    group_index = {key: index for index, key in enumerate(groups)}
+
+    arrays = {
+        'id': np.array(columns[0], dtype=np.int64),
+        'leitner_box': np.array(columns[1], dtype=float),
+        'ease': np.array(columns[2], dtype=float),
+        'interval_days': np.array(columns[3], dtype=float),
+        'stability': np.array(columns[4], dtype=float),
+        'difficulty': np.array(columns[5], dtype=float),
+        'reviewed_jd': np.array(columns[6], dtype=float),
+        'group': np.array([group_index[key] for key in group_keys], dtype=np.int64),
+    }
+    return arrays, groups
+
+
+def _leitner_intervals(cards, params):
+    table = np.array([0] + list(params['intervals']), dtype=float)
+    boxes = np.clip(np.nan_to_num(cards['leitner_box'], nan=1), 1, MAX_BOX).astype(np.int64)
+    return table[boxes], {}
+
+
+def _sm2_intervals(cards, params):
+    # SM-2 grows the interval from the previous one, so the current interval stays;
+    # cards new to SM-2 start from the default ease
+    ease = np.where(np.isnan(cards['ease']), params['initial_ease'], cards['ease'])
+    return np.minimum(cards['interval_days'], params['max_interval']), {'ease': ease}
+
+
+def _fsrs_intervals(cards, params):
+    # Cards new to FSRS: the last interval approximates the stability (90% recall)
+    stability = np.where(np.isnan(cards['stability']), cards['interval_days'], cards['stability'])
+    stability = np.maximum(stability, 0.1)
+    difficulty = np.where(np.isnan(cards['difficulty']), params['weights'][4], cards['difficulty'])
+
+    intervals = stability / FSRS_FACTOR * (params['desired_retention'] ** (1 / FSRS_DECAY) - 1)
+    intervals = np.clip(np.round(intervals), 1, params['max_interval'])
+    return intervals, {'stability': stability, 'difficulty': difficulty}
+
+
+_BATCH_INTERVALS = {
+    'leitner': _leitner_intervals,
+    'sm2': _sm2_intervals,
+    'fsrs': _fsrs_intervals,
+}
+
+
+def compute_schedule(cards, groups):
+    """
+    Vectorized intervals for loaded card states (one pass per scheduler group).
+    Returns {'interval_days', 'due_jd', 'ease', 'stability', 'difficulty'} arrays;
+    state columns a scheduler does not use are NaN (left unchanged on write).
+    """
+    count = len(cards['id'])
+    result = {
+        'interval_days': np.empty(count),
+        'ease': np.full(count, np.nan),
+        'stability': np.full(count, np.nan),
+        'difficulty': np.full(count, np.nan),
+    }
+
+    for index, (name, params_json) in enumerate(groups):
+        mask = cards['group'] == index
+        if not mask.any():
+            continue
+        scheduler = get_scheduler(name, params_json)
+        selected = {key: values[mask] for key, values in cards.items()}
+
+        intervals, state = _BATCH_INTERVALS[scheduler.name](selected, scheduler.params)
+        result['interval_days'][mask] = intervals
+        for key, values in state.items():
+            result[key][mask] = values
+
+    result['due_jd'] = cards['reviewed_jd'] + result['interval_days']
+    return result
+
+
+def _nullable(values):
+    """Array -> list with NaN as None (SQL NULL)."""
+    return [None if value != value else value for value in values.tolist()]
+
+
+def write_schedule(db: Database, cards, schedule):
+    """Writes due dates and filled-in state back in one transaction. Returns the row count."""
+    rows = zip(
+        schedule['due_jd'].tolist(),
+        schedule['interval_days'].tolist(),
+        _nullable(schedule['ease']),
+        _nullable(schedule['stability']),
+        _nullable(schedule['difficulty']),
+        cards['id'].tolist(),
+    )
+    count = len(cards['id'])
+    with db.transaction():
+        for _ in range(0, count, WRITE_CHUNK_SIZE):
+            db.executemany(_WRITE_SQL, list(islice(rows, WRITE_CHUNK_SIZE)))
+    return count
+
+
+def reschedule_cards(db: Database, user_id=None, log=None):
+    """
+    Recomputes the due date of every reviewed card of one user (or of everyone)
+    with each user's current scheduler. Returns the number of cards updated.
+    Runs in one write transaction, so reviews made meanwhile cannot be overwritten with stale state.
+    """
+    with db.transaction():
+        started = time.perf_counter()
+        cards, groups = load_card_states(db, user_id)
+        loaded = time.perf_counter()
+        schedule = compute_schedule(cards, groups)
+        computed = time.perf_counter()
+        count = write_schedule(db, cards, schedule)
+        bump_stats_version(db, user_id)
+
+    if log:
+        log(
+            f"Rescheduled {count} cards: load {loaded - started:.2f}s, "
+            f"compute {computed - loaded:.3f}s, write {time.perf_counter() - computed:.2f}s"
+        )
+    return count
+
+
+def set_user_scheduler(db: Database, user_id, name, params=None):
+    """
+    Switches a user's scheduler (and/or its parameters) and reschedules their cards.
+    Raises ValueError for an unknown scheduler or parameter. Returns the number of cards updated.
+    """
+    if name not in SCHEDULERS:
+        raise ValueError(f"Unknown scheduler: {name}")
+    # Validates the parameters before anything is saved
+    SCHEDULERS[name](params)
+
+    params_json = json.dumps(params, sort_keys=True) if params else None
+    with db.transaction():
+        db.execute(
+            "UPDATE Users SET scheduler = ?, scheduler_params = ? WHERE id = ?",
+            (name, params_json, user_id),
+        )
+        return reschedule_cards(db, user_id)
+
+
+def get_user_scheduler(db: Database, user_id):
+    """(scheduler name, params dict) for a user."""
+    row = db.select_one("SELECT scheduler, scheduler_params FROM Users WHERE id = ?", (user_id,))
+    if row is None or row["scheduler"] not in SCHEDULERS:
+        return DEFAULT_SCHEDULER, {}
+    return row["scheduler"], json.loads(row["scheduler_params"]) if row["scheduler_params"] else {}
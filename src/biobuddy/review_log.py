@@ -0,0 +1,267 @@
+"""
+Append-only log of every review, written through an in-memory buffer.
+
+The study path only updates the card itself; its Reviews row is queued and
+written later, together with other reviews, in one transaction. The buffer
+flushes when it holds FLUSH_SIZE entries, otherwise every FLUSH_INTERVAL
+seconds, and once more at interpreter exit. A crash can therefore lose the
+last few seconds of log entries, but never a card update.
+
+The log is the history the card columns cannot keep: it drives analytics and
+can rebuild every card's scheduler state (replay_reviews).
+"""
+import atexit
+import os
+import threading
+from datetime import datetime, timedelta
+
+from .db import Database, get_pool
+from .schedulers import STATE_FIELDS, get_scheduler
+from .stats import bump_stats_version
+
+
+FLUSH_SIZE = int(os.environ.get('BIOBUDDY_REVIEW_FLUSH_SIZE', 200))
+FLUSH_INTERVAL = float(os.environ.get('BIOBUDDY_REVIEW_FLUSH_INTERVAL', 2.0))  # Seconds
+MAX_PENDING = 50_000  # While writes keep failing, older entries beyond this are dropped
+
+# Reviews are never updated; card_id has no foreign key so a deleted card keeps its history
+REVIEWS_SQL = """
+CREATE TABLE IF NOT EXISTS Reviews (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    card_id INTEGER NOT NULL,
+    rating TEXT NOT NULL,           -- 'hard' / 'medium' / 'easy'
+    box_before INTEGER,
+    box_after INTEGER,
+    interval_days REAL,             -- Delay the scheduler chose after this review
+    reviewed_at TIMESTAMP NOT NULL,
+    response_ms INTEGER             -- Time from showing the card to rating it (client study loop only)
+);
+
+CREATE INDEX IF NOT EXISTS idx_reviews_user ON Reviews(user_id, reviewed_at);
+CREATE INDEX IF NOT EXISTS idx_reviews_card ON Reviews(card_id, reviewed_at);
+"""
+
+# Order of the values in a log entry tuple
+REVIEW_COLUMNS = (
+    'user_id', 'card_id', 'rating', 'box_before', 'box_after',
+    'interval_days', 'reviewed_at', 'response_ms',
+)
+
+_INSERT_SQL = f"""
+    INSERT INTO Reviews ({", ".join(REVIEW_COLUMNS)})
+    VALUES ({", ".join("?" for _ in REVIEW_COLUMNS)})
+"""
+
+
+def ensure_review_log(db: Database):
+    """Creates the Reviews table in databases created before it existed."""
+    db.execute_script(REVIEWS_SQL)
+
+
+def write_reviews(db: Database, entries):
+    """Appends log entries (tuples in REVIEW_COLUMNS order) in one transaction."""
+    with db.transaction():
+        db.executemany(_INSERT_SQL, entries)
+        # Retention statistics come from the log, so they change again once it is written
+        for user_id in {entry[0] for entry in entries}:
+            bump_stats_version(db, user_id)
+
+
+class ReviewLogBuffer:
+    """
+    Thread-safe queue of log entries, flushed by a background thread.
+    writer(entries) is called from that thread (or from flush()) with a list of entries.
+    """
+
+    def __init__(self, writer, flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.writer = writer
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._init_state()
+
+    def _init_state(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()  # One writer at a time keeps entries in order
+        self._entries = []
+        self._thread = None
+        self._closed = False
+        self.flushed = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+
+    def append(self, entry):
+        """Queues one entry; never blocks on the database."""
+        if self._pid != os.getpid():
+            # Forked worker: the lock, thread and queued entries belong to the parent
+            self._init_state()
+        with self._lock:
+            self._entries.append(entry)
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name='review-log', daemon=True)
+                self._thread.start()
+            if len(self._entries) >= self.flush_size:
+                self._wakeup.notify()
+
+    def pending(self):
+        with self._lock:
+            return len(self._entries)
+
+    def flush(self):
+        """Writes everything queued so far. Returns the number of entries written."""
+        with self._flush_lock:
+            with self._lock:
+                entries, self._entries = self._entries, []
+            if not entries:
+                return 0
+            try:
+                self.writer(entries)
+            except Exception:
+                # Keep the entries (in order) for the next attempt
+                with self._lock:
+                    self._entries[:0] = entries
+                    overflow = len(self._entries) - MAX_PENDING
+                    if overflow > 0:
+                        del self._entries[:overflow]
+                        self.dropped += overflow
+                self.failed_flushes += 1
+                raise
+            self.flushed += len(entries)
+            return len(entries)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._closed and len(self._entries) < self.flush_size:
+                    self._wakeup.wait(self.flush_interval)
+                closed = self._closed
+            try:
+                self.flush()
+            except Exception:
+                pass  # Retried on the next round; failed_flushes counts them
+            if closed:
+                return
+
+    def close(self):
+        """Stops the background thread after a final flush."""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+            thread = self._thread
+        if thread is not None and self._pid == os.getpid():
+            thread.join()
+        self.flush()
+
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+
+
+def _write_pooled(pool, entries):
+    with pool.connection() as db:
+        write_reviews(db, entries)
+
+
+def get_review_log(db_path) -> ReviewLogBuffer:
+    """Process-wide buffer for a database file; flushed at exit."""
+    buffer = _buffers.get(db_path)
+    if buffer is None:
+        with _buffers_lock:
+            buffer = _buffers.get(db_path)
+            if buffer is None:
+                pool = get_pool(db_path)
+                buffer = ReviewLogBuffer(lambda entries: _write_pooled(pool, entries))
+                atexit.register(buffer.close)
+                _buffers[db_path] = buffer
+    return buffer
+
+
+def get_card_reviews(db: Database, user_id, card_id):
+    """A card's review history, oldest first."""
+    return db.query(
+        "SELECT * FROM Reviews WHERE user_id = ? AND card_id = ? ORDER BY reviewed_at, id",
+        (user_id, card_id),
+    )
+
+
+def parse_timestamp(value):
+    """TIMESTAMP columns come back as text ('2024-05-01 10:00:00[.ffffff]'); None if unreadable."""
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def replay_reviews(db: Database, user_id, log=None):
+    """
+    Rebuilds the scheduler state of the user's cards from the log: every logged card
+    starts from scratch and goes through its reviews again with the user's current scheduler.
+    Cards without logged reviews are left alone. Reviews whose reviewed_at cannot be read
+    are skipped, and their number is passed to log. Returns the number of cards rebuilt.
+    """
+    user = db.select_one("SELECT scheduler, scheduler_params FROM Users WHERE id = ?", (user_id,))
+    if user is None:
+        return 0
+    scheduler = get_scheduler(user["scheduler"], user["scheduler_params"])
+
+    with db.transaction():
+        reviews = db.query(
+            """
+            SELECT r.card_id, r.rating, r.reviewed_at
+            FROM Reviews r
+            JOIN Flashcards f ON f.id = r.card_id AND f.user_id = r.user_id
+            WHERE r.user_id = ?
+            ORDER BY r.card_id, r.reviewed_at, r.id
+            """,
+            (user_id,),
+        )
+
+        updates = []
+        skipped = 0
+        card_id = None
+        last_reviewed = None
+        for review in reviews:
+            reviewed_at = parse_timestamp(review["reviewed_at"])
+            if reviewed_at is None:
+                skipped += 1
+                continue
+
+            if review["card_id"] != card_id:
+                if last_reviewed is not None:
+                    updates.append(_state_row(state, last_reviewed, card_id))
+                card_id = review["card_id"]
+                state = dict.fromkeys(STATE_FIELDS)
+                state.update(leitner_box=1, repetitions=0, lapses=0)
+                last_reviewed = None
+
+            elapsed = None
+            if last_reviewed is not None:
+                elapsed = (reviewed_at - last_reviewed).total_seconds() / 86400
+            state = scheduler.review(state, review["rating"], elapsed)
+            last_reviewed = reviewed_at
+
+        if last_reviewed is not None:
+            updates.append(_state_row(state, last_reviewed, card_id))
+
+        db.executemany(
+            f"""
+            UPDATE Flashcards
+            SET {", ".join(field + " = ?" for field in STATE_FIELDS)},
+                next_review_date = ?, last_reviewed = ?
+            WHERE id = ?
+            """,
+            updates,
+        )
+        bump_stats_version(db, user_id)
+    if skipped and log:
+        log(f"Skipped {skipped} reviews with an unreadable reviewed_at.")
+    return len(updates)
+
+
+def _state_row(state, last_reviewed, card_id):
+    next_date = last_reviewed + timedelta(days=state['interval_days'])
+    return tuple(state[field] for field in STATE_FIELDS) + (next_date, last_reviewed, card_id)
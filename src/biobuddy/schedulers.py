@@ -0,0 +1,212 @@
+"""
+Spaced-repetition schedulers: Leitner boxes, SM-2 and an FSRS-style memory model.
+
+Every scheduler turns (card state, rating) into the card's new state and the
+number of days until it is due again. Ratings are the three study buttons;
+'hard' means "I did not know it", so every scheduler shows the card again
+right away (interval 0).
+
+Card state lives in Flashcards columns shared by all schedulers:
+    leitner_box   Leitner box 1-5 (kept up to date by every scheduler; the deck shows it)
+    ease          SM-2 ease factor
+    interval_days Days between the last review and the next one
+    repetitions   Successful reviews in a row
+    lapses        Number of times the card was forgotten
+    stability     FSRS: days until recall probability falls to 90%
+    difficulty    FSRS: 1 (easy) to 10 (hard)
+so a user can switch algorithm and keep their progress (see biobuddy.reschedule).
+"""
+import json
+import math
+from functools import lru_cache
+
+
+DEFAULT_SCHEDULER = 'leitner'
+
+# Leitner System Intervals (Days)
+# Box 1: Daily, Box 2: 3 days, Box 3: Week, etc.
+INTERVALS = {1: 1, 2: 3, 3: 7, 4: 14, 5: 30}
+MAX_BOX = 5
+
+# State columns read and written by the schedulers
+STATE_FIELDS = ('leitner_box', 'ease', 'interval_days', 'repetitions', 'lapses', 'stability', 'difficulty')
+
+# FSRS forgetting curve: R(t, S) = (1 + FACTOR * t / S) ** DECAY, so R(S, S) = 0.9
+FSRS_DECAY = -0.5
+FSRS_FACTOR = 19 / 81
+# Default FSRS-4.5 weights
+FSRS_WEIGHTS = (
+    0.4872, 1.4003, 3.7145, 13.8206, 5.1618, 1.2298, 0.8975, 0.031, 1.6474,
+    0.1367, 1.0461, 2.1072, 0.0793, 0.3246, 1.587, 0.2272, 2.8755,
+)
+
+
+def fsrs_interval(stability, desired_retention):
+    """Days until the recall probability drops to desired_retention."""
+    return stability / FSRS_FACTOR * (desired_retention ** (1 / FSRS_DECAY) - 1)
+
+
+class Scheduler:
+    """
+    Base class: subclasses set `name` and DEFAULTS and implement _schedule().
+    params override DEFAULTS (e.g. {'desired_retention': 0.85}).
+    """
+    name = None
+    DEFAULTS = {}
+
+    def __init__(self, params=None):
+        params = dict(params or {})
+        unknown = set(params) - set(self.DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown {self.name} parameters: {', '.join(sorted(unknown))}")
+        self.params = {**self.DEFAULTS, **params}
+
+    def review(self, card, rating, elapsed_days):
+        """
+        New state for a card rated 'hard', 'medium' or 'easy'.
+        card: mapping with the STATE_FIELDS (NULL columns as None);
+        elapsed_days: days since the previous review (None for a new card).
+        Returns a dict with every STATE_FIELDS key; 'interval_days' is the delay until the next review.
+        """
+        failed = rating == 'hard'
+        box = card['leitner_box'] or 1
+
+        state = dict(card)
+        if rating == 'easy':
+            # Promote: Move to next box (max 5)
+            state['leitner_box'] = min(MAX_BOX, box + 1)
+        elif failed:
+            # Demote: Reset to Box 1 (Need to relearn)
+            state['leitner_box'] = 1
+        state.update(self._schedule(state, rating, elapsed_days))
+
+        state['repetitions'] = 0 if failed else (card['repetitions'] or 0) + 1
+        state['lapses'] = (card['lapses'] or 0) + failed
+        if failed:
+            state['interval_days'] = 0
+        return {field: state.get(field) for field in STATE_FIELDS}
+
+    def _schedule(self, card, rating, elapsed_days):
+        """Algorithm-specific fields; card already has its new leitner_box, everything else is old."""
+        raise NotImplementedError
+
+
+class LeitnerScheduler(Scheduler):
+    """Five boxes with fixed intervals: 'easy' moves a card up a box, 'hard' back to box 1."""
+    name = 'leitner'
+    DEFAULTS = {'intervals': [INTERVALS[box] for box in range(1, MAX_BOX + 1)]}
+
+    def _schedule(self, card, rating, elapsed_days):
+        return {'interval_days': self.params['intervals'][card['leitner_box'] - 1]}
+
+
+class SM2Scheduler(Scheduler):
+    """
+    SuperMemo-2: intervals of 1 and 6 days, then the previous interval times the
+    card's ease, which drops when a card is hard to remember.
+    """
+    name = 'sm2'
+    DEFAULTS = {'initial_ease': 2.5, 'min_ease': 1.3, 'max_interval': 36500}
+
+    # SM-2 grades answers 0-5; below 3 is a failed recall
+    QUALITY = {'hard': 2, 'medium': 4, 'easy': 5}
+
+    def _schedule(self, card, rating, elapsed_days):
+        quality = self.QUALITY[rating]
+        ease = card['ease'] or self.params['initial_ease']
+        ease += 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+        ease = max(self.params['min_ease'], ease)
+
+        repetitions = card['repetitions'] or 0
+        if quality < 3:
+            interval = 0
+        elif repetitions == 0:
+            interval = 1
+        elif repetitions == 1:
+            interval = 6
+        else:
+            interval = round(max(card['interval_days'] or 1, 1) * ease)
+
+        return {'ease': ease, 'interval_days': min(interval, self.params['max_interval'])}
+
+
+class FSRSScheduler(Scheduler):
+    """
+    FSRS-style model: each card has a memory stability S and difficulty D,
+    updated from how well it was recalled, and is due when the predicted
+    recall probability falls to desired_retention.
+    """
+    name = 'fsrs'
+    DEFAULTS = {'desired_retention': 0.9, 'max_interval': 36500, 'weights': list(FSRS_WEIGHTS)}
+
+    # FSRS grades: 1 again, 2 hard, 3 good, 4 easy
+    GRADES = {'hard': 1, 'medium': 3, 'easy': 4}
+
+    def _initial_difficulty(self, grade):
+        w = self.params['weights']
+        return min(max(w[4] - (grade - 3) * w[5], 1.0), 10.0)
+
+    def _next_difficulty(self, difficulty, grade):
+        w = self.params['weights']
+        difficulty = difficulty - w[6] * (grade - 3)
+        # Mean reversion towards the default difficulty keeps D from drifting to the bounds
+        difficulty = w[7] * w[4] + (1 - w[7]) * difficulty
+        return min(max(difficulty, 1.0), 10.0)
+
+    def _next_stability(self, stability, difficulty, retrievability, grade):
+        w = self.params['weights']
+        if grade == 1:
+            forgotten = (
+                w[11] * difficulty ** -w[12] * ((stability + 1) ** w[13] - 1)
+                * math.exp((1 - retrievability) * w[14])
+            )
+            return min(forgotten, stability)
+
+        hard_penalty = w[15] if grade == 2 else 1.0
+        easy_bonus = w[16] if grade == 4 else 1.0
+        return stability * (
+            1 + math.exp(w[8]) * (11 - difficulty) * stability ** -w[9]
+            * (math.exp((1 - retrievability) * w[10]) - 1) * hard_penalty * easy_bonus
+        )
+
+    def _schedule(self, card, rating, elapsed_days):
+        grade = self.GRADES[rating]
+        w = self.params['weights']
+        stability = card['stability']
+        difficulty = card['difficulty']
+
+        if stability is None and card['interval_days']:
+            # Card scheduled by another algorithm: its last interval is the best guess for S
+            stability = float(card['interval_days'])
+
+        if stability is None:
+            stability = max(w[grade - 1], 0.1)
+            difficulty = self._initial_difficulty(grade)
+        else:
+            difficulty = difficulty if difficulty is not None else w[4]
+            elapsed = max(elapsed_days or 0, 0)
+            retrievability = (1 + FSRS_FACTOR * elapsed / stability) ** FSRS_DECAY
+            stability = max(self._next_stability(stability, difficulty, retrievability, grade), 0.1)
+            difficulty = self._next_difficulty(difficulty, grade)
+
+        interval = fsrs_interval(stability, self.params['desired_retention'])
+        interval = min(max(round(interval), 1), self.params['max_interval'])
+        return {'stability': stability, 'difficulty': difficulty, 'interval_days': interval}
+
+
+SCHEDULERS = {cls.name: cls for cls in (LeitnerScheduler, SM2Scheduler, FSRSScheduler)}
+
+
+@lru_cache(maxsize=64)
+def _cached_scheduler(name, params_json):
+    return SCHEDULERS[name](json.loads(params_json) if params_json else None)
+
+
+def get_scheduler(name=None, params_json=None) -> Scheduler:
+    """
+    Scheduler for a Users.scheduler / Users.scheduler_params pair (instances are cached).
+    Unknown names fall back to the default scheduler.
+    """
+    if name not in SCHEDULERS:
+        name, params_json = DEFAULT_SCHEDULER, None
+    return _cached_scheduler(name, params_json)
@@ -0,0 +1,190 @@
+"""
+Study statistics for the /stats dashboard: box distribution per subject,
+due cards per day for the next FORECAST_DAYS days, and retention (share of
+reviews not rated 'hard') by box and by subject.
+
+Each table is one GROUP BY query whose few hundred rows are scattered into
+NumPy count arrays, so the cost does not depend on how the rows are walked
+in Python. Results are cached per user in this process; every change to a
+user's cards or reviews bumps their version in the Meta table, which drops
+the cached copy in every worker.
+"""
+import sqlite3
+from datetime import date, datetime, timedelta
+
+from .db import Database
+from .lazy import lazy_import
+from .schedulers import MAX_BOX
+
+np = lazy_import('numpy')
+
+
+FORECAST_DAYS = 30
+RETENTION_WINDOW_DAYS = 90  # Reviews older than this do not count towards retention
+STATS_CACHE_SIZE = 1024  # Users kept in the cache; it is cleared when full
+
+_VERSION_KEY = 'stats_version:'
+
+# Calendar days until each card is due (0 = today, overdue or unscheduled), capped at FORECAST_DAYS ("later")
+_CARDS_SQL = f"""
+    SELECT subject_id, leitner_box,
+           MIN(MAX(IFNULL(CAST(julianday(date(next_review_date)) - julianday(date('now', 'localtime')) AS INTEGER), 0), 0),
+               {FORECAST_DAYS}) AS due_day,
+           COUNT(*) AS cards
+    FROM Flashcards
+    WHERE user_id = ?
+    GROUP BY 1, 2, 3
+"""
+
+# box_before is the box the card was in when it was tested
+_RETENTION_SQL = """
+    SELECT f.subject_id, r.box_before,
+           SUM(r.rating != 'hard') AS recalled,
+           COUNT(*) AS reviews
+    FROM Reviews r
+    LEFT JOIN Flashcards f ON f.id = r.card_id
+    WHERE r.user_id = ? AND r.reviewed_at >= ?
+    GROUP BY 1, 2
+"""
+
+
+def bump_stats_version(db: Database, user_id=None):
+    """Marks a user's statistics (or everyone's, without user_id) as out of date."""
+    if user_id is not None:
+        db.execute(
+            """
+            INSERT INTO Meta (key, value) VALUES (?, 1)
+            ON CONFLICT(key) DO UPDATE SET value = value + 1
+            """,
+            (_VERSION_KEY + str(user_id),),
+        )
+    else:
+        # WHERE true: the upsert needs it to tell ON CONFLICT from a join constraint
+        db.execute(
+            """
+            INSERT INTO Meta (key, value) SELECT ? || id, 1 FROM Users WHERE true
+            ON CONFLICT(key) DO UPDATE SET value = value + 1
+            """,
+            (_VERSION_KEY,),
+        )
+
+
+def get_stats_version(db: Database, user_id):
+    try:
+        row = db.select_one("SELECT value FROM Meta WHERE key = ?", (_VERSION_KEY + str(user_id),))
+    except sqlite3.OperationalError:
+        # Database created before the Meta table existed
+        return 0
+    return row["value"] if row else 0
+
+
+def _boxes(values):
+    """Box numbers as 0-based column indexes (NULL or out-of-range boxes count as box 1)."""
+    boxes = np.array([value or 1 for value in values], dtype=np.int64)
+    return np.clip(boxes, 1, MAX_BOX) - 1
+
+
+def _rates(recalled, reviews):
+    """Recalled / reviewed per bucket, None where there were no reviews."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rates = recalled / reviews
+    return [None if count == 0 else round(rate, 4) for rate, count in zip(rates.tolist(), reviews.tolist())]
+
+
+def compute_stats(db: Database, user_id):
+    """Builds the statistics dict served by /api/stats (see the dashboard for the layout)."""
+    today = date.today()
+    subject_names = {row["id"]: row["name"] for row in db.query("SELECT id, name FROM Subjects ORDER BY name")}
+    subject_ids = list(subject_names)
+    subject_index = {subject_id: index for index, subject_id in enumerate(subject_ids)}
+
+    # 1. Cards: box per subject and due day, one aggregate query
+    cursor = db.cursor
+    cursor.row_factory = None
+    rows = cursor.execute(_CARDS_SQL, (user_id,)).fetchall()
+    subjects, boxes, days, counts = (list(column) for column in zip(*rows)) if rows else ([], [], [], [])
+    counts = np.array(counts, dtype=np.int64)
+    rows_subject = np.array([subject_index.get(subject_id, -1) for subject_id in subjects], dtype=np.int64)
+    known = rows_subject >= 0
+
+    box_counts = np.zeros((len(subject_ids), MAX_BOX), dtype=np.int64)
+    np.add.at(box_counts, (rows_subject[known], _boxes(boxes)[known]), counts[known])
+    due = np.bincount(np.array(days, dtype=np.int64), weights=counts, minlength=FORECAST_DAYS + 1).astype(np.int64)
+
+    # 2. Reviews of the last RETENTION_WINDOW_DAYS: recalled / total per subject and box
+    since = datetime.combine(today - timedelta(days=RETENTION_WINDOW_DAYS), datetime.min.time())
+    rows = cursor.execute(_RETENTION_SQL, (user_id, since)).fetchall()
+    subjects, boxes, recalled, reviews = (list(column) for column in zip(*rows)) if rows else ([], [], [], [])
+    # Reviews of deleted cards count towards their box only (last column: no subject)
+    rows_subject = np.array([subject_index.get(subject_id, len(subject_ids)) for subject_id in subjects], dtype=np.int64)
+    shape = (len(subject_ids) + 1, MAX_BOX)
+    recalled_counts = np.zeros(shape, dtype=np.int64)
+    review_counts = np.zeros(shape, dtype=np.int64)
+    review_boxes = _boxes(boxes)
+    np.add.at(recalled_counts, (rows_subject, review_boxes), np.array(recalled, dtype=np.int64))
+    np.add.at(review_counts, (rows_subject, review_boxes), np.array(reviews, dtype=np.int64))
+
+    by_box_recalled, by_box_reviews = recalled_counts.sum(axis=0), review_counts.sum(axis=0)
+    by_subject_recalled, by_subject_reviews = recalled_counts[:-1].sum(axis=1), review_counts[:-1].sum(axis=1)
+    box_rates = _rates(by_box_recalled, by_box_reviews)
+    subject_rates = _rates(by_subject_recalled, by_subject_reviews)
+    total_reviews = int(by_box_reviews.sum())
+
+    return {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'total_cards': int(counts.sum()),
+        'boxes': list(range(1, MAX_BOX + 1)),
+        'box_distribution': [
+            {
+                'subject_id': subject_id,
+                'subject': subject_names[subject_id],
+                'counts': box_counts[index].tolist(),
+                'total': int(box_counts[index].sum()),
+            }
+            for index, subject_id in enumerate(subject_ids)
+            if box_counts[index].any()
+        ],
+        'box_totals': box_counts.sum(axis=0).tolist(),
+        'forecast': [
+            {'date': (today + timedelta(days=day)).isoformat(), 'due': int(due[day])}
+            for day in range(FORECAST_DAYS)
+        ],
+        'due_later': int(due[FORECAST_DAYS]),
+        'retention': {
+            'window_days': RETENTION_WINDOW_DAYS,
+            'reviews': total_reviews,
+            'rate': round(int(by_box_recalled.sum()) / total_reviews, 4) if total_reviews else None,
+            'by_box': [
+                {'box': box + 1, 'reviews': int(by_box_reviews[box]), 'rate': box_rates[box]}
+                for box in range(MAX_BOX)
+            ],
+            'by_subject': [
+                {
+                    'subject_id': subject_id,
+                    'subject': subject_names[subject_id],
+                    'reviews': int(by_subject_reviews[index]),
+                    'rate': subject_rates[index],
+                }
+                for index, subject_id in enumerate(subject_ids)
+                if by_subject_reviews[index]
+            ],
+        },
+    }
+
+
+# {user_id: ((version, day), stats)}; the day is part of the key because the forecast starts today
+_cache = {}
+
+
+def get_user_stats(db: Database, user_id):
+    """Statistics for a user, recomputed only after their cards or reviews changed (or the day did)."""
+    key = (get_stats_version(db, user_id), date.today())
+    cached = _cache.get(user_id)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    stats = compute_stats(db, user_id)
+    if len(_cache) >= STATS_CACHE_SIZE:
+        _cache.clear()
+    _cache[user_id] = (key, stats)
+    return stats
@@ -1,13 +1,64 @@
 """
-Module for handling spaced repetition reviews using the Leitner system.
+Module for handling spaced repetition reviews.
+The interval after each review comes from the user's scheduler (Leitner by default, see biobuddy.schedulers).
 """
 from .db import Database
+from .schedulers import INTERVALS, STATE_FIELDS, DEFAULT_SCHEDULER, get_scheduler
+from .review_log import parse_timestamp, write_reviews
+from .stats import bump_stats_version
 
 from datetime import datetime, timedelta
 
-# Leitner System Intervals (Days)
-# Box 1: Daily, Box 2: 3 days, Box 3: Week, etc.
-INTERVALS = {1: 1, 2: 3, 3: 7, 4: 14, 5: 30}
+RATINGS = ("hard", "medium", "easy")
+
+# Columns added for the pluggable schedulers: table -> {name: SQL type}
+SCHEDULER_COLUMNS = {
+    'Flashcards': {
+        'ease': 'REAL',
+        'interval_days': 'REAL',
+        'repetitions': 'INTEGER NOT NULL DEFAULT 0',
+        'lapses': 'INTEGER NOT NULL DEFAULT 0',
+        'stability': 'REAL',
+        'difficulty': 'REAL',
+    },
+    'Users': {
+        'scheduler': f"TEXT NOT NULL DEFAULT '{DEFAULT_SCHEDULER}'",
+        'scheduler_params': 'TEXT',
+    },
+}
+
+# The study page counts due cards only up to this many (shown as "1000+"),
+# so the per-review cost does not grow with the backlog.
+DUE_COUNT_LIMIT = 1000
+
+
+def ensure_scheduler_columns(db: Database):
+    """
+    Adds the scheduler columns to databases created before they existed.
+    Cards already reviewed under the old Leitner-only code get their interval and
+    last review time back-filled from their box, so they can be rescheduled later.
+    """
+    added = False
+    for table, columns in SCHEDULER_COLUMNS.items():
+        existing = {row["name"] for row in db.query(f"PRAGMA table_info({table})")}
+        for column, sql_type in columns.items():
+            if column not in existing:
+                db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {sql_type}")
+                added = True
+
+    if added:
+        box_interval = " ".join(f"WHEN {box} THEN {days}" for box, days in INTERVALS.items())
+        db.execute(
+            f"""
+            UPDATE Flashcards
+            SET interval_days = CASE leitner_box {box_interval} END,
+                last_reviewed = COALESCE(
+                    last_reviewed,
+                    datetime(next_review_date, '-' || CASE leitner_box {box_interval} END || ' days')
+                )
+            WHERE leitner_box > 1 AND interval_days IS NULL
+            """
+        )
 
 
 def get_due_cards(db: Database, user_id):
@@ -23,57 +74,162 @@ def get_due_cards(db: Database, user_id):
         AND f.next_review_date <= datetime('now', 'localtime')
         ORDER BY f.next_review_date ASC
     """
-    return db.execute(query, (user_id,)).fetchall()
+    return db.query(query, (user_id,))
+
+
+def get_next_due_card(db: Database, user_id):
+    """
+    Fetches only the most overdue card (with its subject name).
+    Walks idx_cards_review in order and stops after one row.
+    """
+    query = """
+        SELECT f.*, s.name as subject_name
+        FROM Flashcards f
+        JOIN Subjects s ON f.subject_id = s.id
+        WHERE f.user_id = ?
+        AND f.next_review_date <= datetime('now', 'localtime')
+        ORDER BY f.next_review_date ASC
+        LIMIT 1
+    """
+    return db.select_one(query, (user_id,))
 
 
-def process_review(db: Database, user_id, card_id, rating):
+def get_next_due_cards(db: Database, user_id, limit):
     """
-    Updates the card's Box and Next Review Date based on user rating.
-    rating: 'hard' (reset), 'medium' (stay), 'easy' (advance)
+    Fetches the next `limit` due cards in queue order.
+    Used by the JSON study API so the browser can prefetch a batch.
+    """
+    query = """
+        SELECT f.id, f.question, f.answer, f.leitner_box, s.name as subject_name
+        FROM Flashcards f
+        JOIN Subjects s ON f.subject_id = s.id
+        WHERE f.user_id = ?
+        AND f.next_review_date <= datetime('now', 'localtime')
+        ORDER BY f.next_review_date ASC
+        LIMIT ?
+    """
+    return db.query(query, (user_id, limit))
+
+
+def count_due_cards(db: Database, user_id, limit=None):
     """
-    # 1. Get current card state
+    Counts due cards without touching the table rows:
+    (user_id, next_review_date) is fully covered by idx_cards_review.
+    With a limit, stops counting after limit + 1 cards (anything above limit means "more than limit").
+    """
+    inner = """
+        SELECT 1
+        FROM Flashcards
+        WHERE user_id = ?
+        AND next_review_date <= datetime('now', 'localtime')
+    """
+    params = [user_id]
+    if limit is not None:
+        inner += " LIMIT ?"
+        params.append(limit + 1)
+
+    row = db.select_one(f"SELECT COUNT(*) AS due_count FROM ({inner})", tuple(params))
+    return row["due_count"]
+
+
+def get_study_queue(db: Database, user_id, count_limit=DUE_COUNT_LIMIT):
+    """
+    Returns (next_card, due_count) for the study page.
+    next_card is None when nothing is due; due_count is capped at count_limit + 1.
+    """
+    card = get_next_due_card(db, user_id)
+    if card is None:
+        return None, 0
+    return card, count_due_cards(db, user_id, count_limit)
+
+
+def process_review(db: Database, user_id, card_id, rating, review_log=None):
+    """
+    Updates the card's scheduling state and Next Review Date based on user rating.
+    rating: 'hard' (forgotten), 'medium' (recalled), 'easy' (recalled easily)
+    The review is logged through review_log (a ReviewLogBuffer) if given, else written directly.
+    """
+    # Read and write inside one transaction so concurrent reviews of the same card can't interleave
+    with db.transaction():
+        entry = _apply_review(db, user_id, card_id, rating)
+        if entry:
+            bump_stats_version(db, user_id)
+        if entry and review_log is None:
+            write_reviews(db, [entry])
+    # Buffered entries are queued only once the card update is committed
+    if entry and review_log is not None:
+        review_log.append(entry)
+
+
+def process_reviews(db: Database, user_id, reviews, review_log=None):
+    """
+    Applies a batch of reviews recorded by the browser in a single transaction.
+    reviews: iterable of (card_id, rating, reviewed_at[, response_ms]) in the order they happened;
+    reviewed_at is a datetime (or None for 'now').
+    Returns the number of reviews applied (unknown cards and ratings are skipped).
+    """
+    entries = []
+    with db.transaction():
+        for review in reviews:
+            card_id, rating, reviewed_at = review[:3]
+            if rating not in RATINGS:
+                continue
+            response_ms = review[3] if len(review) > 3 else None
+            entry = _apply_review(db, user_id, card_id, rating, reviewed_at, response_ms)
+            if entry:
+                entries.append(entry)
+        if entries:
+            bump_stats_version(db, user_id)
+        if entries and review_log is None:
+            write_reviews(db, entries)
+    if review_log is not None:
+        for entry in entries:
+            review_log.append(entry)
+    return len(entries)
+
+
+def _apply_review(db: Database, user_id, card_id, rating, reviewed_at=None, response_ms=None):
+    """
+    Scheduler update for one card; the caller owns the transaction.
+    Returns the review's log entry (see review_log.REVIEW_COLUMNS),
+    or None if the card does not belong to the user.
+    """
+    # 1. Get current card state and the user's scheduler
     card = db.select_one(
-        "SELECT leitner_box FROM Flashcards WHERE id=? AND user_id=?",
+        f"""
+        SELECT {", ".join("f." + field for field in STATE_FIELDS)}, f.last_reviewed,
+               u.scheduler, u.scheduler_params
+        FROM Flashcards f
+        JOIN Users u ON u.id = f.user_id
+        WHERE f.id = ? AND f.user_id = ?
+        """,
         (card_id, user_id),
     )
     if not card:
-        return
-
-    current_box = card["leitner_box"]
-    new_box = current_box
-
-    # 2. Apply Leitner Logic
-    if rating == "easy":
-        # Promote: Move to next box (max 5)
-        new_box = min(5, current_box + 1)
-    elif rating == "medium":
-        # Stagnate: Stay in current box (or demote if strictly punitive, but 'stay' is friendlier)
-        new_box = current_box
-    elif rating == "hard":
-        # Demote: Reset to Box 1 (Need to relearn)
-        new_box = 1
-
-    # 3. Calculate time delay
-    days_delay = INTERVALS.get(new_box, 1)
-
-    # If it was hard, we might want to review it sooner (e.g. 10 minutes),
-    # but for this MVP, we set it to 'tomorrow' or 'same day' logic.
-    # Let's add the timedelta to current time.
-    if rating == "hard":
-        # If hard, review again very soon (e.g., 0 days = remains 'due' effectively, or 1 day)
-        # Let's set to 0 days (effectively immediately/tomorrow depending on your logic)
-        # For simplicity in MVP: Reset to Box 1 means review tomorrow.
-        days_delay = 0
-
-    next_date = datetime.now() + timedelta(days=days_delay)
-
-    # 4. Update DB
+        return None
+
+    reviewed_at = reviewed_at or datetime.now()
+    last_reviewed = parse_timestamp(card["last_reviewed"])
+    elapsed_days = None
+    if last_reviewed is not None:
+        elapsed_days = (reviewed_at - last_reviewed).total_seconds() / 86400
+
+    # 2. Let the scheduler work out the new state and interval
+    scheduler = get_scheduler(card["scheduler"], card["scheduler_params"])
+    state = scheduler.review(card, rating, elapsed_days)
+    next_date = reviewed_at + timedelta(days=state["interval_days"])
+
+    # 3. Update DB
     db.execute(
-        """
-        UPDATE Flashcards 
-        SET leitner_box = ?, next_review_date = ?
+        f"""
+        UPDATE Flashcards
+        SET {", ".join(field + " = ?" for field in STATE_FIELDS)},
+            next_review_date = ?, last_reviewed = ?
         WHERE id = ? AND user_id = ?
-    """,
-        (new_box, next_date, card_id, user_id),
+        """,
+        tuple(state[field] for field in STATE_FIELDS) + (next_date, reviewed_at, card_id, user_id),
+    )
+    return (
+        user_id, card_id, rating, card["leitner_box"], state["leitner_box"],
+        state["interval_days"], reviewed_at, response_ms,
     )
-
@@ -1,46 +1,158 @@
 """
 Password hashing and verification using PBKDF2-HMAC-SHA256.
+
+Hashes are stored as "pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>", so the
+work factor can be raised without breaking existing accounts: old hashes
+(including the original "salt:hash" format) still verify and are upgraded on
+the next successful login.
+
+PBKDF2 runs on a small bounded thread pool (hashlib releases the GIL while
+hashing), so a burst of logins cannot occupy every request thread at once.
 """
+import os
+import hmac
 import secrets
 import hashlib
 import binascii
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from .db import Database
 
 
-PBKDF2_ITERATIONS = 100_000  # Number of iterations for PBKDF2 hashing
+HASH_ALGORITHM = 'pbkdf2_sha256'
+PBKDF2_ITERATIONS = int(os.environ.get('BIOBUDDY_PBKDF2_ITERATIONS', 100_000))  # Work factor for new hashes
+LEGACY_ITERATIONS = 100_000  # Used by the old "salt:hash" format
+
+HASH_WORKERS = int(os.environ.get('BIOBUDDY_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+HASH_MAX_PENDING = int(os.environ.get('BIOBUDDY_HASH_MAX_PENDING', 64))  # Running + queued
+HASH_WAIT_TIMEOUT = 10.0  # Seconds a request waits for a free slot before giving up
+
+
+class HashingBusyError(RuntimeError):
+    """Raised when too many password hashes are already pending."""
+
+
+class _HashingStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.queue_seconds = 0.0
+        self.max_queue_seconds = 0.0
+        self.hash_seconds = 0.0
+
+    def record(self, queued, hashed):
+        with self._lock:
+            self.completed += 1
+            self.queue_seconds += queued
+            self.max_queue_seconds = max(self.max_queue_seconds, queued)
+            self.hash_seconds += hashed
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'queue_seconds_total': self.queue_seconds,
+                'queue_seconds_max': self.max_queue_seconds,
+                'hash_seconds_total': self.hash_seconds,
+            }
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(HASH_MAX_PENDING)
+_stats = _HashingStats()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='pbkdf2')
+    return _executor
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    """Runs PBKDF2 on the hashing pool and waits for the result."""
+    if not _slots.acquire(timeout=HASH_WAIT_TIMEOUT):
+        _stats.reject()
+        raise HashingBusyError("Too many password checks in progress")
+
+    submitted = time.perf_counter()
+
+    def work():
+        started = time.perf_counter()
+        result = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+        _stats.record(started - submitted, time.perf_counter() - started)
+        return result
+
+    try:
+        return _get_executor().submit(work).result()
+    finally:
+        _slots.release()
+
+
+def get_hashing_stats() -> dict:
+    """Counters for the hashing pool: completed/rejected jobs and time spent queued and hashing."""
+    return _stats.snapshot()
+
+
+def _parse_hash(stored_password: str):
+    """Returns (iterations, salt, hash) for both the current and the legacy format."""
+    if stored_password.startswith(HASH_ALGORITHM + '$'):
+        _, iterations, salt_hex, hash_hex = stored_password.split('$')
+        return int(iterations), binascii.unhexlify(salt_hex), binascii.unhexlify(hash_hex)
+
+    salt_hex, hash_hex = stored_password.split(':')
+    return LEGACY_ITERATIONS, binascii.unhexlify(salt_hex), binascii.unhexlify(hash_hex)
 
 
 def hash_password(password: str) -> str:
     """
     Hashes a password using PBKDF2-HMAC-SHA256 with a random salt.
-    Returns a string in format "salt:hash_value"
+    Returns a string in format "pbkdf2_sha256$iterations$salt$hash_value"
     """
     # Generate a random 16-byte salt
     salt = secrets.token_bytes(16)
 
-    # Hash the password with the salt, 100,000 iterations
-    pwd_hash = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, PBKDF2_ITERATIONS)
+    pwd_hash = _pbkdf2(password, salt, PBKDF2_ITERATIONS)
 
-    # Return as a single string: salt(hex) + separator + hash(hex)
-    return binascii.hexlify(salt).decode('ascii') + ':' + binascii.hexlify(pwd_hash).decode('ascii')
+    return '$'.join((
+        HASH_ALGORITHM,
+        str(PBKDF2_ITERATIONS),
+        binascii.hexlify(salt).decode('ascii'),
+        binascii.hexlify(pwd_hash).decode('ascii'),
+    ))
 
 
 def verify_password(stored_password: str, provided_password: str) -> bool:
     """
     Verifies a provided password against the stored hashed password.
-    The stored_password is in format "salt:hash_value"
+    Accepts both "pbkdf2_sha256$iterations$salt$hash" and the legacy "salt:hash_value".
     """
-    salt_hex, hash_hex = stored_password.split(':')
-    salt = binascii.unhexlify(salt_hex)
-    stored_hash = binascii.unhexlify(hash_hex)
+    iterations, salt, stored_hash = _parse_hash(stored_password)
 
     # Hash the provided password with the same salt and iterations
-    pwd_hash = hashlib.pbkdf2_hmac('sha256', provided_password.encode('utf-8'), salt, PBKDF2_ITERATIONS)
+    pwd_hash = _pbkdf2(provided_password, salt, iterations)
 
-    # Compare the hashes
-    return pwd_hash == stored_hash
+    # Constant-time comparison, so the response time does not leak how many bytes matched
+    return hmac.compare_digest(pwd_hash, stored_hash)
+
+
+def needs_rehash(stored_password: str) -> bool:
+    """True if the hash uses the legacy format or a different work factor."""
+    if not stored_password.startswith(HASH_ALGORITHM + '$'):
+        return True
+    return _parse_hash(stored_password)[0] != PBKDF2_ITERATIONS
 
 
 def create_user(db: Database, username: str, password: str) -> bool:
@@ -62,7 +174,8 @@ def create_user(db: Database, username: str, password: str) -> bool:
 def authenticate_user(db: Database, username: str, password: str) -> int | None:
     """
     Authenticates a user by verifying the provided password.
-    Returns True if authentication is successful, False otherwise (user not found or wrong password).
+    Returns the user id if authentication is successful, None otherwise (user not found or wrong password).
+    Outdated hashes are transparently re-hashed with the current work factor.
     """
     user = db.select_one(
         "SELECT id, password_hash FROM Users WHERE username = ?",
@@ -75,6 +188,11 @@ def authenticate_user(db: Database, username: str, password: str) -> int | None:
     ok = verify_password(stored_password, password)
 
     if ok:
+        if needs_rehash(stored_password):
+            db.execute(
+                "UPDATE Users SET password_hash = ? WHERE id = ?",
+                (hash_password(password), user['id'])
+            )
         return user['id']
     else:
         return None
@@ -1,6 +1,10 @@
 import os
 from biobuddy.db import Database
 from biobuddy.user import create_user
+from biobuddy.paper_files import sync_paper_files
+from biobuddy.flashcards import SEARCH_INDEX_SQL
+from biobuddy.review_log import REVIEWS_SQL
+from biobuddy.migrations import migrate, get_schema_version
 
 
 # Configuration via Environment variables
@@ -12,20 +16,25 @@ SCHEMA_SQL = """
 -- Database Schema for BioBuddy Application --
 
 -- Users Table --
-CREATE TABLE Users (
+CREATE TABLE IF NOT EXISTS Users (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     username TEXT UNIQUE NOT NULL,
-    password_hash TEXT NOT NULL
+    password_hash TEXT NOT NULL,
+
+    -- Spaced repetition algorithm ('leitner', 'sm2', 'fsrs') and its
+    -- parameter overrides as JSON (NULL = defaults), see biobuddy.schedulers
+    scheduler TEXT NOT NULL DEFAULT 'leitner',
+    scheduler_params TEXT
 );
 
 -- Subjects Table --
-CREATE TABLE Subjects (
+CREATE TABLE IF NOT EXISTS Subjects (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     name TEXT UNIQUE NOT NULL
 );
 
 -- Papers Table --
-CREATE TABLE Papers (
+CREATE TABLE IF NOT EXISTS Papers (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     subject_id INTEGER NOT NULL,
     year INTEGER NOT NULL,
@@ -33,11 +42,20 @@ CREATE TABLE Papers (
     type TEXT NOT NULL CHECK(type IN ('QP', 'MS')), -- QP: Question Paper, MS: Mark Scheme
     paper_number INTEGER NOT NULL,  -- Paper Number (1, 2, 3)
     filename TEXT UNIQUE NOT NULL,
+
+    -- Filled in by the paper sync (biobuddy.paper_files):
+    timezone TEXT,                  -- 'TZ1' / 'TZ2' suffix, NULL if the paper has one timezone
+    file_size INTEGER,
+    file_mtime_ns INTEGER,          -- Lets re-syncs skip files that did not change
+    sha256 TEXT,                    -- Content checksum: rename/duplicate detection, ETags
+    page_count INTEGER,
     FOREIGN KEY (subject_id) REFERENCES Subjects (id)
 );
 
+CREATE INDEX IF NOT EXISTS idx_papers_sha256 ON Papers(sha256);
+
 -- Favorites Table --
-CREATE TABLE Favorites (
+CREATE TABLE IF NOT EXISTS Favorites (
     user_id INTEGER,
     paper_id INTEGER,
     PRIMARY KEY (user_id, paper_id),
@@ -46,7 +64,7 @@ CREATE TABLE Favorites (
 );
 
 -- Flashcards Table --
-CREATE TABLE Flashcards (
+CREATE TABLE IF NOT EXISTS Flashcards (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     user_id INTEGER NOT NULL,
     subject_id INTEGER NOT NULL,
@@ -63,91 +81,46 @@ CREATE TABLE Flashcards (
     -- If current_time < next_review_date, the query will hide this card.
     next_review_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     last_reviewed TIMESTAMP,
+
+    -- Scheduler state (biobuddy.schedulers); NULL until a scheduler that uses it runs
+    ease REAL,                      -- SM-2 ease factor
+    interval_days REAL,             -- Days between the last review and next_review_date
+    repetitions INTEGER NOT NULL DEFAULT 0,  -- Successful reviews in a row
+    lapses INTEGER NOT NULL DEFAULT 0,       -- Times the card was forgotten
+    stability REAL,                 -- FSRS memory stability (days)
+    difficulty REAL,                -- FSRS difficulty (1-10)
     
     FOREIGN KEY (user_id) REFERENCES Users (id) ON DELETE CASCADE,
     FOREIGN KEY (subject_id) REFERENCES Subjects (id)
 );
 
-CREATE INDEX idx_cards_review ON Flashcards(user_id, next_review_date);
+CREATE INDEX IF NOT EXISTS idx_cards_review ON Flashcards(user_id, next_review_date);
 
-"""
+-- Meta Table --
+-- Small key/value counters, e.g. 'catalog_version' (bumped on every paper sync
+-- so app workers know to reload their in-memory catalog)
+CREATE TABLE IF NOT EXISTS Meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+
+""" + SEARCH_INDEX_SQL + REVIEWS_SQL
 
 def create_tables(db):
+    """
+    Creates missing tables and applies the schema migrations (safe to re-run).
+    An existing database is migrated first: SCHEMA_SQL describes the current
+    schema, so its indexes and search table only fit once the migrations have
+    added the columns (and indexed the cards that are already there).
+    """
+    applied = []
+    if db.select_one("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Users'"):
+        applied += migrate(db)
     db.execute_script(SCHEMA_SQL)
-    print("Tables created successfully.")
-
-    # """Creates the necessary tables and indexes."""
-    # cursor = conn.cursor()
-    #
-    # # --- Table: Users ---
-    # cursor.execute('''
-    # CREATE TABLE IF NOT EXISTS Users (
-    #     id INTEGER PRIMARY KEY AUTOINCREMENT,
-    #     username TEXT UNIQUE NOT NULL,
-    #     password_hash TEXT NOT NULL,
-    #     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    # );
-    # ''')
-    #
-    # # --- Table: Subjects ---
-    # # Good normalization practice: store names separately
-    # cursor.execute('''
-    # CREATE TABLE IF NOT EXISTS Subjects (
-    #     id INTEGER PRIMARY KEY AUTOINCREMENT,
-    #     name TEXT UNIQUE NOT NULL
-    # );
-    # ''')
-    #
-    # # --- Table: Papers (Resources) ---
-    # cursor.execute('''
-    # CREATE TABLE IF NOT EXISTS Papers (
-    #     id INTEGER PRIMARY KEY AUTOINCREMENT,
-    #     subject_id INTEGER NOT NULL,
-    #     year INTEGER NOT NULL,
-    #     level TEXT NOT NULL CHECK(level IN ('HL', 'SL')),
-    #     type TEXT NOT NULL CHECK(type IN ('QP', 'MS')), -- QP: Question Paper, MS: Mark Scheme
-    #     filename TEXT NOT NULL,
-    #     FOREIGN KEY (subject_id) REFERENCES Subjects (id)
-    # );
-    # ''')
-    #
-    # # Index for fast filtering by subject and year (Use Case #7)
-    # cursor.execute('CREATE INDEX IF NOT EXISTS idx_papers_filter ON Papers(subject_id, year);')
-    #
-    # # --- Table: Favorites ---
-    # # Junction table for Many-to-Many relationship
-    # cursor.execute('''
-    # CREATE TABLE IF NOT EXISTS Favorites (
-    #     user_id INTEGER,
-    #     paper_id INTEGER,
-    #     added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    #     PRIMARY KEY (user_id, paper_id),
-    #     FOREIGN KEY (user_id) REFERENCES Users (id) ON DELETE CASCADE,
-    #     FOREIGN KEY (paper_id) REFERENCES Papers (id) ON DELETE CASCADE
-    # );
-    # ''')
-    #
-    # # --- Table: Flashcards (Crucial for HL Complexity) ---
-    # cursor.execute('''
-    # CREATE TABLE IF NOT EXISTS Flashcards (
-    #     id INTEGER PRIMARY KEY AUTOINCREMENT,
-    #     user_id INTEGER NOT NULL,
-    #     subject_id INTEGER NOT NULL,
-    #     question TEXT NOT NULL,
-    #     answer TEXT NOT NULL,
-    #     leitner_box INTEGER DEFAULT 1, -- Box 1 to 5
-    #     next_review_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    #     last_reviewed TIMESTAMP,
-    #     FOREIGN KEY (user_id) REFERENCES Users (id) ON DELETE CASCADE,
-    #     FOREIGN KEY (subject_id) REFERENCES Subjects (id)
-    # );
-    # ''')
-    #
-    # # Index to quickly find cards due for review (Use Case #19)
-    # cursor.execute('CREATE INDEX IF NOT EXISTS idx_cards_review ON Flashcards(user_id, next_review_date);')
-    #
-    # conn.commit()
-    # print("Tables and Indexes created successfully.")
+    applied += migrate(db)
+    for version in applied:
+        print(f"Applied migration {version}.")
+    print(f"Tables created successfully (schema version {get_schema_version(db)}).")
 
 
 def scan_and_seed_papers(db: Database, papers_dir: str):
@@ -155,79 +128,18 @@ def scan_and_seed_papers(db: Database, papers_dir: str):
     Scans 'static/papers/' and populates the DB automatically.
     Format: {Subject}_{Year}_{Level}_{Type}_{Number}.pdf
     """
-    conn = db.connection
-    cursor = db.cursor
-
-    # Build subject name to ID map
-    subjects_map = {}
-    cursor.execute("SELECT name, id FROM Subjects")
-    for row in cursor.fetchall():
-        subjects_map[row[0].lower()] = row[1]  # {'biology': 1, 'chemistry': 2}
-
-    files = os.listdir(papers_dir)
-    count = 0
-
-    for filename in files:
-        if not filename.endswith(".pdf"):
-            continue
-
-        # Parse filename
-        try:
-            name_parts = filename.replace(".pdf", "").split("_")
-            if len(name_parts) < 5:
-                print(f"Skipping invalid format: {filename}")
-                continue
-            subj_str, year, level, type_str, num = name_parts[:5]
-
-            # Checks
-            subject_id = subjects_map.get(subj_str.lower())
-            if not subject_id:
-                print(f"Unknown subject in file: {filename}")
-                continue
-            if level not in ["HL", "SL"]:
-                print(f"Invalid level in file: {filename}")
-                continue
-            if type_str not in ["QP", "MS"]:
-                print(f"Invalid type in file: {filename}")
-                continue
-            if not num.isdigit():
-                print(f"Invalid paper number in file: {filename}")
-                continue
-
-            # Insert if not exists
-            cursor.execute(
-                """
-                SELECT id FROM Papers 
-                WHERE filename = ?
-                """,
-                (filename,),
-            )
-
-            if not cursor.fetchone():
-                cursor.execute(
-                    """
-                    INSERT INTO Papers (subject_id, year, level, type, paper_number, filename)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                    """,
-                    (subject_id, int(year), level, type_str, int(num), filename),
-                )
-                count += 1
-
-        except ValueError:
-            print(f"Error parsing: {filename}")
-
-    conn.commit()
-    print(f"Scanned folder. Added {count} new papers.")
+    summary = sync_paper_files(db, papers_dir)
+    print(f"Scanned folder. Added {summary['added']} new papers.")
 
 
 def seed_initial_data(db):
     """Populates the database with initial required data."""
     create_user(db, "test", "123")
 
-    for subject in ["Biology", "Chemistry"]:
-        db.execute(
-            "INSERT INTO Subjects (name) VALUES (?)",
-            (subject,)
+    with db.transaction():
+        db.executemany(
+            "INSERT OR IGNORE INTO Subjects (name) VALUES (?)",
+            [(subject,) for subject in ["Biology", "Chemistry"]]
         )
     scan_and_seed_papers(db, PAPERS_PATH)
 
@@ -0,0 +1,111 @@
+import argparse
+import os
+import sys
+
+sys.path.append(os.getcwd())
+from biobuddy.db import Database
+from biobuddy.deck_io import import_deck, export_deck, guess_format, DeckFormatError, DECK_FORMATS
+from biobuddy.flashcards import ensure_search_index, rebuild_search_index
+
+DB_PATH = os.environ.get("BIOBUDDY_DB_PATH", "biobuddy.db")
+
+
+def _get_user_id(db, username):
+    user = db.select_one("SELECT id FROM Users WHERE username = ?", (username,))
+    if user is None:
+        print(f"Error: User {username} does not exist.")
+        sys.exit(1)
+    return user["id"]
+
+
+def _get_subject_id(db, name):
+    if name is None:
+        return None
+    subject = db.select_one("SELECT id FROM Subjects WHERE name = ? COLLATE NOCASE", (name,))
+    if subject is None:
+        print(f"Error: Subject {name} does not exist.")
+        sys.exit(1)
+    return subject["id"]
+
+
+def import_cards(db_path, username, path, fmt=None, subject=None):
+    fmt = fmt or guess_format(path)
+    if fmt is None:
+        print(f"Error: Cannot tell the format of {path}, use --format.")
+        sys.exit(1)
+
+    db = Database(db_path, tuned=True)
+    user_id = _get_user_id(db, username)
+    subject_id = _get_subject_id(db, subject)
+
+    def progress(imported, failed):
+        print(f"\r{imported} imported, {failed} skipped", end="", flush=True)
+
+    try:
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            summary = import_deck(db, user_id, f, fmt, default_subject_id=subject_id, progress=progress)
+    except (DeckFormatError, UnicodeDecodeError) as e:
+        print(f"\nError: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+    print()
+    for line, message in summary["errors"]:
+        print(f" - Line {line}: {message}")
+    if summary["failed"] > len(summary["errors"]):
+        print(f" - ... and {summary['failed'] - len(summary['errors'])} more")
+    print(f"\nImported {summary['imported']} cards for {username}, skipped {summary['failed']}.")
+
+
+def export_cards(db_path, username, path, fmt=None, subject=None):
+    fmt = fmt or guess_format(path) or "csv"
+
+    db = Database(db_path)
+    user_id = _get_user_id(db, username)
+    subject_id = _get_subject_id(db, subject)
+
+    out = sys.stdout if path == "-" else open(path, "w", encoding="utf-8", newline="")
+    try:
+        for chunk in export_deck(db, user_id, fmt, subject_id=subject_id):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        db.close()
+
+    if path != "-":
+        print(f"Exported deck of {username} to {path}.")
+
+
+def reindex_cards(db_path):
+    db = Database(db_path, tuned=True)
+    ensure_search_index(db)
+    rebuild_search_index(db)
+    db.close()
+    print("Search index rebuilt.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import or export flashcard decks (CSV, JSONL or Anki-style TSV).")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("import", "Add the cards of a deck file to a user's deck"),
+                            ("export", "Write a user's deck to a file ('-' for stdout)")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("username")
+        command.add_argument("path")
+        command.add_argument("--format", choices=DECK_FORMATS, help="Defaults to the file extension")
+        command.add_argument("--subject", help="Import: subject for rows without one; export: only this subject")
+
+    commands.add_parser("reindex", help="Rebuild the flashcard search index from scratch")
+
+    args = parser.parse_args()
+
+    if args.command == "import":
+        import_cards(args.db, args.username, args.path, args.format, args.subject)
+    elif args.command == "export":
+        export_cards(args.db, args.username, args.path, args.format, args.subject)
+    else:
+        reindex_cards(args.db)
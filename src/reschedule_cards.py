@@ -0,0 +1,69 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.getcwd())
+from biobuddy.db import Database
+from biobuddy.reschedule import reschedule_cards, set_user_scheduler
+from biobuddy.migrations import migrate
+from biobuddy.review_log import replay_reviews
+from biobuddy.schedulers import SCHEDULERS
+
+DB_PATH = os.environ.get("BIOBUDDY_DB_PATH", "biobuddy.db")
+
+
+def _parse_params(pairs):
+    """['desired_retention=0.85'] -> {'desired_retention': 0.85} (values are JSON, else strings)."""
+    params = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        try:
+            params[key] = json.loads(value)
+        except ValueError:
+            params[key] = value
+    return params
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Switch a user's review scheduler or recompute due dates in bulk.")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    parser.add_argument("--user", help="Username (default: every user, each with their own scheduler)")
+    parser.add_argument("--scheduler", choices=sorted(SCHEDULERS), help="Switch --user to this scheduler first")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUE",
+                        help="Scheduler parameter, e.g. desired_retention=0.85 (repeatable)")
+    parser.add_argument("--replay", action="store_true",
+                        help="Rebuild --user's card states from their review log instead")
+    args = parser.parse_args()
+
+    db = Database(args.db, tuned=True)
+    migrate(db)
+
+    user_id = None
+    if args.user:
+        user = db.select_one("SELECT id FROM Users WHERE username = ?", (args.user,))
+        if user is None:
+            print(f"Error: User {args.user} does not exist.")
+            sys.exit(1)
+        user_id = user["id"]
+
+    if args.replay:
+        if user_id is None:
+            print("Error: --replay needs --user.")
+            sys.exit(1)
+        count = replay_reviews(db, user_id, log=print)
+        print(f"Rebuilt {count} cards of {args.user} from their review log.")
+    elif args.scheduler:
+        if user_id is None:
+            print("Error: --scheduler needs --user.")
+            sys.exit(1)
+        try:
+            count = set_user_scheduler(db, user_id, args.scheduler, _parse_params(args.param))
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        print(f"{args.user} now uses {args.scheduler}; rescheduled {count} cards.")
+    else:
+        reschedule_cards(db, user_id, log=print)
+
+    db.close()
@@ -1,30 +1,433 @@
-// Function to toggle favorite status of a paper
-async function toggleFavorite(btn, paperId) {
-    // 1. Send request to server to toggle favorite status
+// --- Favorites ---
+// Stars flip at once; the changes are sent together in one request after a
+// short pause, so clicking through a list of papers costs a single round trip.
+const FAVORITES_SYNC_MS = 600;  // Wait for a pause in clicking before saving
+
+const favoriteChanges = new Map();  // paperId -> {btn, was, active}
+let favoriteTimer = null;
+
+function showFavorite(btn, active) {
+    btn.textContent = active ? '★' : '☆';
+    btn.classList.toggle('outline', !active);
+}
+
+function toggleFavorite(btn, paperId) {
+    const change = favoriteChanges.get(paperId)
+        || { btn: btn, was: !btn.classList.contains('outline') };
+    change.active = !(change.active ?? change.was);
+    showFavorite(btn, change.active);
+
+    // Starring and unstarring again before the save cancels out
+    if (change.active === change.was) favoriteChanges.delete(paperId);
+    else favoriteChanges.set(paperId, change);
+
+    clearTimeout(favoriteTimer);
+    favoriteTimer = setTimeout(() => syncFavorites(), FAVORITES_SYNC_MS);
+}
+
+async function syncFavorites(keepalive = false) {
+    clearTimeout(favoriteTimer);
+    if (favoriteChanges.size === 0) return;
+
+    const batch = new Map(favoriteChanges);
+    favoriteChanges.clear();
+    const add = [], remove = [];
+    batch.forEach((change, paperId) => (change.active ? add : remove).push(paperId));
+
+    function revert() {
+        batch.forEach((change, paperId) => {
+            // A paper clicked again meanwhile shows the newer choice
+            if (!favoriteChanges.has(paperId)) showFavorite(change.btn, change.was);
+        });
+    }
+
     try {
-        const response = await fetch('/api/toggle_favorite', {
+        const response = await fetch('/api/favorites', {
             method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ paper_id: paperId })
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ add: add, remove: remove }),
+            keepalive: keepalive,
         });
+        if (response.status === 401) {
+            revert();
+            alert("Please log in to save favorites.");
+        } else if (!response.ok) {
+            revert();
+        }
+    } catch (error) {
+        console.error('Error:', error);
+        revert();
+    }
+}
 
-        if (response.ok) {
-            const result = await response.json();
+document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'hidden') syncFavorites(true);
+});
 
-            // 2. Update button appearance based on new status
-            if (result.is_active) {
-                btn.textContent = '★';
-                btn.classList.remove('outline');
-            } else {
-                btn.textContent = '☆';
-                btn.classList.add('outline');
+
+// --- Client-side study session ---
+// The server renders the first card; after that cards are flipped and rated
+// locally from a prefetched queue, and ratings are uploaded in batches.
+const PENDING_REVIEWS_KEY = 'biobuddy.pendingReviews';  // + '.<user id>', so ratings never change hands
+const PREFETCH_SIZE = 20;        // Cards requested per prefetch
+const REFILL_THRESHOLD = 5;      // Prefetch when fewer cards than this are left
+const SYNC_BATCH_SIZE = 10;      // Upload once this many ratings are pending
+const SYNC_INTERVAL_MS = 15000;  // ...or at least this often
+
+function loadPendingReviews(key) {
+    try {
+        // Left by older versions without an owner, so it cannot be uploaded safely
+        localStorage.removeItem(PENDING_REVIEWS_KEY);
+        return JSON.parse(localStorage.getItem(key)) || [];
+    } catch (error) {
+        return [];
+    }
+}
+
+function savePendingReviews(key, reviews) {
+    try {
+        localStorage.setItem(key, JSON.stringify(reviews));
+    } catch (error) {
+        // Storage full or disabled: ratings stay in memory until the next sync
+    }
+}
+
+function initStudySession(root) {
+    const pendingKey = `${PENDING_REVIEWS_KEY}.${root.dataset.userId}`;
+    const batchMax = Number(root.dataset.batchMax);
+    const state = {
+        queue: [],
+        current: { id: Number(root.dataset.cardId) },
+        dueCount: Number(root.dataset.count),
+        countLimit: Number(root.dataset.countLimit),
+        pending: loadPendingReviews(pendingKey),
+        syncing: null,
+        signedOut: false,
+        exhausted: false,
+        shownAt: Date.now(),
+    };
+
+    const cardEl = document.getElementById('card');
+    const countEl = document.getElementById('study-count');
+
+    function renderCount() {
+        const count = Math.max(state.dueCount, 0);
+        countEl.textContent = count > state.countLimit ? state.countLimit + '+' : count;
+    }
+
+    function showCard(card) {
+        state.current = card;
+        state.shownAt = Date.now();
+        cardEl.classList.remove('is-flipped');
+        document.getElementById('card-subject').textContent = card.subject_name;
+        document.getElementById('card-question').textContent = card.question;
+        document.getElementById('card-answer').textContent = card.answer;
+    }
+
+    // 1. Upload pending ratings, in batches no larger than the server accepts
+    function sync(keepalive = false) {
+        if (!state.syncing) {
+            state.syncing = upload(keepalive).finally(() => {
+                state.syncing = null;
+            });
+        }
+        return state.syncing;
+    }
+
+    async function upload(keepalive) {
+        while (state.pending.length > 0 && !state.signedOut) {
+            const batch = state.pending.slice(0, batchMax);
+            let response;
+            try {
+                response = await fetch(root.dataset.reviewsUrl, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ reviews: batch }),
+                    keepalive: keepalive,
+                });
+            } catch (error) {
+                return; // Offline: keep the ratings and retry later
+            }
+
+            if (response.status === 401) {
+                // Session expired: the ratings stay saved under this user until they log in again
+                state.signedOut = true;
+                alert("Your session has expired. Please log in again to save your ratings.");
+                window.location.href = root.dataset.loginUrl;
+                return;
             }
+            if (response.status >= 500) return; // Retry later
+            if (!response.ok) {
+                // Rejected: sending the same batch again would fail again
+                console.error('Ratings rejected:', response.status);
+            }
+            state.pending = state.pending.slice(batch.length);
+            savePendingReviews(pendingKey, state.pending);
+        }
+    }
+
+    // 2. Prefetch the next cards. Ratings are synced first so the server's queue is current.
+    async function refill() {
+        if (state.exhausted) return;
+        await sync();
+        if (state.pending.length > 0) return; // Still offline, or signed out
+
+        try {
+            const response = await fetch(`${root.dataset.cardsUrl}?limit=${PREFETCH_SIZE}`);
+            if (!response.ok) return;
+            const data = await response.json();
+
+            const queued = new Set(state.queue.map(card => card.id));
+            queued.add(state.current && state.current.id);
+            const fresh = data.cards.filter(card => !queued.has(card.id));
+
+            state.queue.push(...fresh);
+            state.dueCount = data.due_count - (state.current ? 1 : 0);
+            state.exhausted = data.cards.length < PREFETCH_SIZE && fresh.length === 0;
+            renderCount();
+        } catch (error) {
+            // Offline: continue with what is already queued
+        }
+    }
+
+    // 3. Rate the current card locally and move on without waiting for the network
+    async function rate(rating) {
+        const now = Date.now();
+        state.pending.push({
+            card_id: state.current.id,
+            rating: rating,
+            reviewed_at: now,
+            response_ms: now - state.shownAt,
+        });
+        savePendingReviews(pendingKey, state.pending);
+        state.dueCount -= 1;
+        renderCount();
+
+        if (state.pending.length >= SYNC_BATCH_SIZE) sync();
+
+        if (state.queue.length < REFILL_THRESHOLD) {
+            const refilling = refill();
+            if (state.queue.length === 0) await refilling;
+        }
+
+        const next = state.queue.shift();
+        if (next) {
+            showCard(next);
         } else {
-            alert("Please log in to save favorites.");
+            state.current = null;
+            await sync();
+            window.location.href = root.dataset.completeUrl;
+        }
+    }
+
+    root.querySelectorAll('a[data-rating]').forEach(link => {
+        link.addEventListener('click', event => {
+            event.preventDefault();
+            event.stopPropagation();
+            if (state.current) rate(link.dataset.rating);
+        });
+    });
+
+    setInterval(() => sync(), SYNC_INTERVAL_MS);
+    window.addEventListener('online', () => sync());
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'hidden') sync(true);
+    });
+
+    // Upload anything left over from an earlier offline session, then start prefetching
+    refill();
+}
+
+// --- Flashcard deck ---
+// The server renders the first page; further pages load as the end of the list
+// scrolls into view, and create/edit/delete update the list without a reload.
+const SEARCH_DEBOUNCE_MS = 150;  // Wait for a pause in typing before searching
+
+function initDeck(root) {
+    const list = document.getElementById('deck-list');
+    const countEl = document.getElementById('deck-count');
+    const emptyEl = document.getElementById('deck-empty');
+    const cardsUrl = root.dataset.cardsUrl;
+    const subjectId = root.dataset.subjectId;
+    let more = document.getElementById('deck-more');
+    let loading = false;
+
+    function fragment(html) {
+        const template = document.createElement('template');
+        template.innerHTML = html.trim();
+        return template.content.firstElementChild;
+    }
+
+    function addToCount(delta) {
+        const count = Number(countEl.textContent) + delta;
+        countEl.textContent = count;
+        emptyEl.hidden = count > 0;
+    }
+
+    async function sendCard(url, method, form) {
+        const response = await fetch(url, {
+            method: method,
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                subject_id: form.elements.subject_id.value,
+                question: form.elements.question.value,
+                answer: form.elements.answer.value,
+            }),
+        });
+        const data = await response.json();
+        if (!response.ok) throw new Error(data.error || 'Request failed');
+        return data.card;
+    }
+
+    // 1. Infinite scroll: fetch the page after the last rendered card
+    async function loadMore() {
+        if (loading || !more) return;
+        loading = true;
+        try {
+            const params = new URLSearchParams({ before: more.dataset.nextBefore });
+            if (subjectId) params.set('subject', subjectId);
+            const response = await fetch(`${cardsUrl}?${params}`);
+            if (!response.ok) return;
+            const data = await response.json();
+
+            data.cards.forEach(card => {
+                if (!document.getElementById(`card-${card.id}`)) list.appendChild(fragment(card.html));
+            });
+            if (data.next_before) {
+                more.dataset.nextBefore = data.next_before;
+            } else {
+                observer.disconnect();
+                more.remove();
+                more = null;
+            }
+        } catch (error) {
+            // Offline: the "Load more" link still works
+        } finally {
+            loading = false;
+        }
+    }
+
+    const observer = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) loadMore();
+    }, { rootMargin: '400px' });
+    if (more) observer.observe(more);
+
+    // 2. Create: prepend the new card (if it belongs to the subject being shown)
+    const createForm = document.getElementById('create-card-form');
+    createForm.addEventListener('submit', async event => {
+        event.preventDefault();
+        try {
+            const card = await sendCard(cardsUrl, 'POST', createForm);
+            const element = fragment(card.html);
+            if (!subjectId || element.dataset.subjectId === subjectId) {
+                list.prepend(element);
+                addToCount(1);
+            }
+            createForm.elements.question.value = '';
+            createForm.elements.answer.value = '';
+        } catch (error) {
+            alert(error.message);
+        }
+    });
+
+    // 3. Edit in a dialog and swap the card in place
+    const dialog = document.getElementById('edit-card-dialog');
+    const editForm = document.getElementById('edit-card-form');
+    let editing = null;
+
+    list.addEventListener('click', event => {
+        const link = event.target.closest('.card-edit');
+        if (!link) return;
+        event.preventDefault();
+        editing = link.closest('.deck-card');
+        editForm.elements.subject_id.value = editing.dataset.subjectId;
+        editForm.elements.question.value = editing.dataset.question;
+        editForm.elements.answer.value = editing.dataset.answer;
+        dialog.showModal();
+    });
+
+    dialog.querySelector('[data-close]').addEventListener('click', () => dialog.close());
+
+    editForm.addEventListener('submit', async event => {
+        event.preventDefault();
+        try {
+            const card = await sendCard(`${cardsUrl}/${editing.dataset.cardId}`, 'PUT', editForm);
+            const element = fragment(card.html);
+            if (subjectId && element.dataset.subjectId !== subjectId) {
+                editing.remove();
+                addToCount(-1);
+            } else {
+                editing.replaceWith(element);
+            }
+            dialog.close();
+        } catch (error) {
+            alert(error.message);
+        }
+    });
+
+    // 4. Search as you type (the form still submits normally without JS)
+    const searchForm = document.getElementById('deck-search-form');
+    const searchInput = searchForm.elements.q;
+    const searchResults = document.getElementById('search-results');
+    const browse = document.getElementById('deck-browse');
+    let searchTimer = null;
+    let searchRequest = 0;
+
+    async function search() {
+        const query = searchInput.value.trim();
+        const requestId = ++searchRequest;
+        if (!query) {
+            searchResults.hidden = true;
+            browse.hidden = false;
+            return;
+        }
+
+        const params = new URLSearchParams({ q: query });
+        if (subjectId) params.set('subject', subjectId);
+        try {
+            const response = await fetch(`${searchForm.dataset.searchUrl}?${params}`);
+            if (!response.ok || requestId !== searchRequest) return; // A newer search is running
+            const data = await response.json();
+            searchResults.innerHTML = data.html;
+            searchResults.hidden = false;
+            browse.hidden = true;
+        } catch (error) {
+            // Offline: leave the current results
         }
-    } catch (error) {
-        console.error('Error:', error);
     }
+
+    searchInput.addEventListener('input', () => {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(search, SEARCH_DEBOUNCE_MS);
+    });
+    searchForm.addEventListener('submit', event => {
+        event.preventDefault();
+        clearTimeout(searchTimer);
+        search();
+    });
+
+    // 5. Delete (the button's confirm() runs before this submit handler)
+    list.addEventListener('submit', async event => {
+        const form = event.target.closest('.card-delete');
+        if (!form) return;
+        event.preventDefault();
+        const card = form.closest('.deck-card');
+        try {
+            const response = await fetch(`${cardsUrl}/${card.dataset.cardId}`, { method: 'DELETE' });
+            if (response.ok || response.status === 404) {
+                card.remove();
+                if (response.ok) addToCount(-1);
+            }
+        } catch (error) {
+            form.submit();
+        }
+    });
 }
+
+document.addEventListener('DOMContentLoaded', () => {
+    const studyRoot = document.getElementById('study-app');
+    if (studyRoot) initStudySession(studyRoot);
+
+    const deckRoot = document.getElementById('deck');
+    if (deckRoot) initDeck(deckRoot);
+});
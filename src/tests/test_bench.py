@@ -0,0 +1,91 @@
+import unittest
+
+import os
+import tempfile
+
+from bench.datagen import generate, username, BENCH_PASSWORD
+from bench.loadtest import Recorder, run_inprocess_mode
+from bench.microbench import BENCHMARKS, compare, run_benchmarks
+from biobuddy.db import Database
+from biobuddy.user import authenticate_user
+
+
+def dump(db):
+    return [
+        [tuple(row) for row in db.query(sql)]
+        for sql in (
+            "SELECT subject_id, question, answer, leitner_box, interval_days FROM Flashcards ORDER BY id",
+            "SELECT filename, year, level, type FROM Papers ORDER BY id",
+            "SELECT user_id, paper_id FROM Favorites ORDER BY user_id, paper_id",
+            "SELECT username, password_hash FROM Users ORDER BY id",
+        )
+    ]
+
+
+class TestDatagen(unittest.TestCase):
+    def generated(self, seed):
+        db = Database(":memory:")
+        counts = generate(db, users=3, cards_per_user=40, papers=50, favorites_per_user=5, seed=seed)
+        return db, counts
+
+    def test_same_seed_same_rows(self):
+        first, counts = self.generated(7)
+        second, _ = self.generated(7)
+        other, _ = self.generated(8)
+        self.assertEqual(counts, {'users': 3, 'cards': 120, 'papers': 50, 'favorites': 15})
+        self.assertEqual(dump(first), dump(second))
+        self.assertNotEqual(dump(first), dump(other))
+
+        self.assertEqual(authenticate_user(first, username(2), BENCH_PASSWORD), 2)
+        # Due dates straddle "now": some cards are due, most are not
+        due = first.select_one(
+            "SELECT COUNT(*) AS n FROM Flashcards WHERE next_review_date <= datetime('now', 'localtime')"
+        )["n"]
+        self.assertTrue(0 < due < 120)
+        for db in (first, second, other):
+            db.close()
+
+
+class TestMicrobench(unittest.TestCase):
+    def test_report(self):
+        db = Database(":memory:")
+        generate(db, users=2, cards_per_user=20, papers=30, favorites_per_user=3)
+        names = [name for name in BENCHMARKS if name != "authenticate_user"]
+        results = run_benchmarks(db, names, seconds=0.01)
+        db.close()
+
+        self.assertEqual(list(results), names)
+        for summary in results.values():
+            self.assertGreaterEqual(summary["iterations"], 20)
+            self.assertLessEqual(summary["p50_ms"], summary["p99_ms"])
+            self.assertGreater(summary["ops_per_sec"], 0)
+
+        slower = {name: dict(summary, p50_ms=summary["p50_ms"] * 2) for name, summary in results.items()}
+        rows = compare({"benchmarks": slower}, {"benchmarks": results})
+        self.assertTrue(all(regressed for *_, regressed in rows))
+
+
+class TestLoadTest(unittest.TestCase):
+    def test_inprocess_run(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "load.db")
+            db = Database(db_path)
+            generate(db, users=2, cards_per_user=30, papers=40, favorites_per_user=2)
+            db.close()
+
+            recorder = Recorder()
+            wall = run_inprocess_mode(
+                db_path, recorder, students=4, concurrency=2, users=2, papers=40, actions=8, seed=1
+            )
+            report = recorder.report(wall)
+
+        self.assertEqual(report["routes"]["POST /login"]["statuses"], {"302": 4})
+        self.assertGreater(report["requests"], 4)
+        self.assertEqual(report["database_locked"], 0)
+        for route, stats in report["routes"].items():
+            self.assertEqual(stats["server_errors"], 0, route)
+            self.assertLessEqual(stats["p50_ms"], stats["p99_ms"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+from biobuddy.catalog import CatalogIndex, bump_catalog_version
+from biobuddy.db import Database
+from create_db import SCHEMA_SQL
+
+
+class TestCatalogIndex(unittest.TestCase):
+    def setUp(self):
+        self.db = Database(":memory:")
+        self.db.execute_script(SCHEMA_SQL)
+        self.db.executemany("INSERT INTO Subjects (name) VALUES (?)", [("Biology",), ("Chemistry",)])
+        papers = []
+        for year in (2018, 2021, 2022):
+            for level in ("HL", "SL"):
+                for type_str in ("QP", "MS"):
+                    for number in (1, 2):
+                        filename = f"Biology_{year}_{level}_{type_str}_{number}.pdf"
+                        papers.append((1, year, level, type_str, number, filename))
+        self.db.executemany(
+            """
+            INSERT INTO Papers (subject_id, year, level, type, paper_number, filename)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            papers,
+        )
+        self.index = CatalogIndex().refresh(self.db)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_filters_match_sql(self):
+        filters = {"year": "2021", "level": "HL", "type": None, "paper_number": "2"}
+        expected = self.db.query(
+            """
+            SELECT id FROM Papers
+            WHERE subject_id = 1 AND year = ? AND level = ? AND paper_number = ?
+            ORDER BY year DESC, level ASC, paper_number ASC, id ASC
+            """,
+            ("2021", "HL", "2"),
+        )
+        result = self.index.subject("biology").filter(filters)
+        self.assertEqual([p["id"] for p in result], [r["id"] for r in expected])
+        self.assertEqual(len(result), 2)
+
+    def test_facets_ignore_own_filter(self):
+        facets = self.index.subject("biology").facets({"year": "2021", "level": "HL"})
+        years = {f["value"]: f["count"] for f in facets["year"]}
+        levels = {f["value"]: f["count"] for f in facets["level"]}
+        numbers = {f["value"]: f["count"] for f in facets["paper_number"]}
+        self.assertEqual(years, {2022: 4, 2021: 4, 2018: 4})
+        self.assertEqual(levels, {"HL": 4, "SL": 4})
+        self.assertEqual(numbers, {1: 2, 2: 2})
+        self.assertEqual([f["value"] for f in facets["year"]], [2022, 2021, 2018])
+
+    def test_unknown_values(self):
+        biology = self.index.subject("Biology")
+        self.assertEqual(biology.filter({"year": "abc"}), [])
+        self.assertEqual(len(biology.filter({})), 24)
+        self.assertEqual(biology.years, [2022, 2021, 2018])
+        self.assertEqual(self.index.subject("chemistry").filter(), [])
+        self.assertIsNone(self.index.subject("physics"))
+
+    def test_reload_on_version_bump(self):
+        self.db.execute("DELETE FROM Papers WHERE year = 2018")
+        self.assertEqual(len(self.index.refresh(self.db).subject("biology").papers), 24)
+
+        bump_catalog_version(self.db)
+        self.assertEqual(len(self.index.refresh(self.db).subject("biology").papers), 16)
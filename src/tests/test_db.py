@@ -0,0 +1,107 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from biobuddy.db import ConnectionPool, Database
+
+
+class TestTransaction(unittest.TestCase):
+    def setUp(self):
+        self.db = Database(":memory:")
+        self.db.execute("CREATE TABLE T (x INTEGER)")
+
+    def tearDown(self):
+        self.db.close()
+
+    def count(self):
+        return self.db.select_one("SELECT COUNT(*) AS n FROM T")["n"]
+
+    def test_commit_and_rollback(self):
+        with self.db.transaction():
+            self.db.executemany("INSERT INTO T (x) VALUES (?)", [(1,), (2,)])
+        self.assertEqual(self.count(), 2)
+
+        with self.assertRaises(RuntimeError):
+            with self.db.transaction():
+                self.db.execute("INSERT INTO T (x) VALUES (3)")
+                raise RuntimeError("boom")
+        self.assertEqual(self.count(), 2)
+        self.assertFalse(self.db.connection.in_transaction)
+
+    def test_nested_savepoint_rolls_back_inner_only(self):
+        with self.db.transaction():
+            self.db.execute("INSERT INTO T (x) VALUES (1)")
+            try:
+                with self.db.transaction():
+                    self.db.execute("INSERT INTO T (x) VALUES (2)")
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual([r["x"] for r in self.db.query("SELECT x FROM T")], [1])
+
+
+class TestSlowQueryLog(unittest.TestCase):
+    def test_logs_plan_and_param_types(self):
+        db = Database(":memory:", slow_query_ms=0)
+        db.execute("CREATE TABLE T (id INTEGER PRIMARY KEY, name TEXT)")
+        db.execute("INSERT INTO T (name) VALUES (?)", ("secret",))
+        with self.assertLogs("biobuddy.db", "WARNING") as logs:
+            db.query("SELECT * FROM T WHERE name = ? AND id > ?", ("secret", 0))
+        db.close()
+
+        message = logs.output[-1]
+        self.assertIn("params (str, int)", message)
+        self.assertIn("SELECT * FROM T WHERE name = ? AND id > ?", message)
+        self.assertIn("SEARCH T USING INTEGER PRIMARY KEY (rowid>?)", message)
+        self.assertNotIn("'secret'", message)
+
+    def test_off_by_default(self):
+        db = Database(":memory:")
+        self.assertIsNone(db.slow_query_ms)
+        with self.assertNoLogs("biobuddy.db"):
+            db.query("SELECT 1")
+        db.close()
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.pool = ConnectionPool(os.path.join(self.tmp.name, "pool.db"), size=2)
+
+    def tearDown(self):
+        self.pool.discard()
+        self.tmp.cleanup()
+
+    def test_reused_across_threads(self):
+        # One short-lived thread per request, as with werkzeug's threaded server
+        seen = []
+
+        def request():
+            with self.pool.connection() as db:
+                seen.append(db)
+                db.query("SELECT 1")
+
+        for _ in range(3):
+            thread = threading.Thread(target=request)
+            thread.start()
+            thread.join()
+        self.assertIs(seen[0], seen[1])
+        self.assertIs(seen[1], seen[2])
+        self.assertEqual(self.pool.idle_count(), 1)
+
+    def test_bounded(self):
+        connections = [self.pool.acquire() for _ in range(3)]
+        self.assertEqual(len(set(map(id, connections))), 3)
+        for db in connections:
+            self.pool.release(db)
+        self.assertEqual(self.pool.idle_count(), 2)
+
+    def test_release_rolls_back(self):
+        db = self.pool.acquire()
+        db.execute("CREATE TABLE T (x INTEGER)")
+        db.execute("BEGIN")
+        db.execute("INSERT INTO T VALUES (1)")
+        self.pool.release(db)
+        with self.pool.connection() as db:
+            self.assertEqual(db.select_one("SELECT COUNT(*) FROM T")[0], 0)
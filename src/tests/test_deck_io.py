@@ -0,0 +1,71 @@
+import io
+import unittest
+
+from biobuddy.db import Database
+from biobuddy.deck_io import DeckFormatError, export_deck, import_deck
+from create_db import SCHEMA_SQL
+
+
+class TestDeckImportExport(unittest.TestCase):
+    def setUp(self):
+        self.db = Database(":memory:")
+        self.db.execute_script(SCHEMA_SQL)
+        self.db.execute("INSERT INTO Users (username, password_hash) VALUES ('u', 'x')")
+        self.db.executemany("INSERT INTO Subjects (name) VALUES (?)", [("Biology",), ("Chemistry",)])
+
+    def tearDown(self):
+        self.db.close()
+
+    def deck(self):
+        return [
+            (row["subject_id"], row["question"], row["answer"])
+            for row in self.db.query("SELECT * FROM Flashcards WHERE user_id = 1 ORDER BY id")
+        ]
+
+    def test_csv_rows_are_validated(self):
+        data = (
+            "Subject,Question,Answer\n"
+            "biology,\"Define osmosis\",\"Water, through a membrane\"\n"
+            "Physics,q,a\n"
+            "Chemistry,,a\n"
+            "Chemistry,\"multi\nline\",a\n"
+        )
+        progress = []
+        summary = import_deck(self.db, 1, io.StringIO(data), "csv", chunk_size=1,
+                              progress=lambda *counts: progress.append(counts))
+        self.assertEqual(summary["imported"], 2)
+        self.assertEqual(summary["errors"], [(3, "Unknown subject: Physics"), (4, "Missing question")])
+        self.assertEqual(self.deck(), [(1, "Define osmosis", "Water, through a membrane"), (2, "multi\nline", "a")])
+        self.assertEqual(progress[-1], (2, 2))
+
+    def test_csv_header_required(self):
+        with self.assertRaises(DeckFormatError):
+            import_deck(self.db, 1, io.StringIO("front,back\nq,a\n"), "csv")
+
+    def test_tsv_default_subject(self):
+        data = "#separator:tab\nq1\ta1\nq2\ta<br>b\tChemistry\nonly question\n"
+        summary = import_deck(self.db, 1, io.StringIO(data), "tsv", default_subject_id=1)
+        self.assertEqual(summary["imported"], 2)
+        self.assertEqual(summary["errors"], [(4, "Missing answer")])
+        self.assertEqual(self.deck(), [(1, "q1", "a1"), (2, "q2", "a\nb")])
+
+    def test_unknown_default_subject(self):
+        data = "q1\ta1\tBiology\nq2\ta2\n"
+        with self.assertRaisesRegex(DeckFormatError, "Unknown subject"):
+            import_deck(self.db, 1, io.StringIO(data), "tsv", default_subject_id=999, chunk_size=1)
+        self.assertEqual(self.deck(), [])
+
+    def test_round_trip(self):
+        cards = [("Biology", f"q{i}", f"a\t{i}\n,\"x\"") for i in range(7)]
+        self.db.executemany(
+            "INSERT INTO Flashcards (user_id, subject_id, question, answer) "
+            "SELECT 1, id, ?, ? FROM Subjects WHERE name = ?",
+            [(q, a, s) for s, q, a in cards],
+        )
+        original = self.deck()
+        for fmt in ("csv", "jsonl", "tsv"):
+            exported = "".join(export_deck(self.db, 1, fmt))
+            self.db.execute("DELETE FROM Flashcards")
+            import_deck(self.db, 1, io.StringIO(exported), fmt)
+            expected = original if fmt != "tsv" else [(s, q, a.replace("\t", " ")) for s, q, a in original]
+            self.assertEqual(self.deck(), expected, fmt)
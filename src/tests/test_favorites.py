@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+
+import app as app_module
+from bench.datagen import generate, username, BENCH_PASSWORD
+from biobuddy.db import Database
+from biobuddy.favorites import get_favorite_ids, set_favorites, toggle_favorite
+from biobuddy.migrations import migrate
+from biobuddy.papers import get_popular_papers
+from biobuddy.profiles import invalidate_profile
+
+
+def favorite_count(db, paper_id):
+    return db.select_one("SELECT favorite_count FROM Papers WHERE id = ?", (paper_id,))["favorite_count"]
+
+
+class TestFavorites(unittest.TestCase):
+    def setUp(self):
+        invalidate_profile()
+        self.db = Database(":memory:")
+        generate(self.db, users=3, cards_per_user=0, papers=10, favorites_per_user=0)
+
+    def tearDown(self):
+        invalidate_profile()
+        self.db.close()
+
+    def test_toggle(self):
+        self.assertTrue(toggle_favorite(self.db, 1, 4))
+        self.assertEqual(get_favorite_ids(self.db, 1), {4})
+        self.assertFalse(toggle_favorite(self.db, 1, 4))
+        self.assertEqual(get_favorite_ids(self.db, 1), set())
+        # Unknown papers are never starred
+        self.assertFalse(toggle_favorite(self.db, 1, 999))
+        self.assertEqual(get_favorite_ids(self.db, 1), set())
+
+    def test_set_favorites(self):
+        toggle_favorite(self.db, 1, 1)
+        added, removed = set_favorites(self.db, 1, add=[1, 2, 3, 999], remove=[1, 5])
+        self.assertEqual((added, removed), ([1, 2, 3], [1]))
+        self.assertEqual(get_favorite_ids(self.db, 1), {1, 2, 3})
+
+    def test_counts_follow_favorites(self):
+        for user_id in (1, 2, 3):
+            toggle_favorite(self.db, user_id, 7)
+        set_favorites(self.db, 1, add=[2])
+        set_favorites(self.db, 2, remove=[7])
+        self.assertEqual((favorite_count(self.db, 7), favorite_count(self.db, 2)), (2, 1))
+
+        subject = "biology" if self.db.select_one("SELECT subject_id FROM Papers WHERE id = 7")[0] == 1 else "chemistry"
+        self.assertEqual(get_popular_papers(self.db, subject, limit=1)[0]["id"], 7)
+        self.assertEqual(get_popular_papers(self.db, "physics"), [])
+
+        # Deleting a user or a paper cascades to Favorites, and the counts follow
+        self.db.execute("DELETE FROM Users WHERE id = 1")
+        self.assertEqual((favorite_count(self.db, 7), favorite_count(self.db, 2)), (1, 0))
+        self.db.execute("DELETE FROM Papers WHERE id = 7")
+        self.assertEqual(self.db.select_one("SELECT COUNT(*) FROM Favorites")[0], 0)
+
+    def test_migration_backfills_counts(self):
+        toggle_favorite(self.db, 1, 3)
+        toggle_favorite(self.db, 2, 3)
+        self.db.execute("UPDATE Papers SET favorite_count = 0")
+        self.db.execute("PRAGMA user_version = 2")
+        migrate(self.db)
+        self.assertEqual(favorite_count(self.db, 3), 2)
+
+
+class TestFavoritesApi(unittest.TestCase):
+    def setUp(self):
+        invalidate_profile()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "favorites.db")
+        db = Database(self.db_path)
+        generate(db, users=1, cards_per_user=0, papers=10, favorites_per_user=0)
+        db.close()
+
+        app_module.DB_PATH = self.db_path
+        app_module.app.config["TESTING"] = True
+        self.client = app_module.app.test_client()
+        self.client.post("/login", data={"username": username(1), "password": BENCH_PASSWORD})
+
+    def tearDown(self):
+        invalidate_profile()
+        app_module.get_pool(self.db_path).discard()
+        self.tmp.cleanup()
+
+    def test_bulk_endpoint(self):
+        response = self.client.post("/api/favorites", json={"add": [1, 2, 3], "remove": []})
+        self.assertEqual(response.get_json(), {"success": True, "added": [1, 2, 3], "removed": []})
+        response = self.client.post("/api/favorites", json={"add": [4], "remove": [2, 9]})
+        self.assertEqual(response.get_json(), {"success": True, "added": [4], "removed": [2]})
+
+        for body in ({"add": ["1"]}, {"add": [1], "remove": [1]}, {"remove": 3}):
+            self.assertEqual(self.client.post("/api/favorites", json=body).status_code, 400)
+
+        db = Database(self.db_path)
+        self.assertEqual(get_favorite_ids(db, 1), {1, 3, 4})
+        db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+
+from biobuddy.db import Database
+from biobuddy.flashcards import (
+    count_user_flashcards, delete_flashcard, ensure_search_index, get_user_flashcards,
+    search_flashcards, update_flashcard
+)
+from create_db import SCHEMA_SQL
+
+
+class TestDeckPagination(unittest.TestCase):
+    def setUp(self):
+        self.db = Database(":memory:")
+        self.db.execute_script(SCHEMA_SQL)
+        self.db.execute("INSERT INTO Users (username, password_hash) VALUES ('u', 'x')")
+        self.db.execute("INSERT INTO Users (username, password_hash) VALUES ('v', 'x')")
+        self.db.executemany("INSERT INTO Subjects (name) VALUES (?)", [("Biology",), ("Chemistry",)])
+        self.db.executemany(
+            "INSERT INTO Flashcards (user_id, subject_id, question, answer) VALUES (?, ?, ?, 'a')",
+            [(1 + i % 2, 1 + i % 3 // 2, f"q{i}") for i in range(30)],
+        )
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_pages_cover_deck_once(self):
+        seen = []
+        before = None
+        while True:
+            page = get_user_flashcards(self.db, 1, before_id=before, limit=4)
+            seen.extend(card["id"] for card in page)
+            if len(page) < 4:
+                break
+            before = page[-1]["id"]
+
+        expected = [card["id"] for card in get_user_flashcards(self.db, 1)]
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(seen), count_user_flashcards(self.db, 1))
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+    def test_subject_filter(self):
+        cards = get_user_flashcards(self.db, 1, limit=100, subject_id=2)
+        self.assertTrue(cards)
+        self.assertTrue(all(card["subject_id"] == 2 for card in cards))
+        self.assertEqual(len(cards), count_user_flashcards(self.db, 1, subject_id=2))
+
+
+class TestFlashcardSearch(unittest.TestCase):
+    def setUp(self):
+        self.db = Database(":memory:")
+        self.db.execute_script(SCHEMA_SQL)
+        self.db.executemany("INSERT INTO Users (username, password_hash) VALUES (?, 'x')", [("u",), ("v",)])
+        self.db.execute("INSERT INTO Subjects (name) VALUES ('Biology')")
+        self.db.executemany(
+            "INSERT INTO Flashcards (user_id, subject_id, question, answer) VALUES (?, 1, ?, ?)",
+            [
+                (1, "Define osmosis", "Movement of water across a membrane"),
+                (1, "What is diffusion?", "Net movement of particles; osmosis is a special case"),
+                (1, "Enzyme <b>inhibitors</b>", "Competitive & non-competitive"),
+                (2, "Define osmosis", "Someone else's card"),
+            ],
+        )
+
+    def tearDown(self):
+        self.db.close()
+
+    def questions(self, query):
+        return [card["question"] for card in search_flashcards(self.db, 1, query)]
+
+    def test_ranked_and_scoped_to_user(self):
+        results = search_flashcards(self.db, 1, "osmosis")
+        self.assertEqual([card["id"] for card in results], [1, 2])
+        self.assertEqual(str(results[0]["question_html"]), "Define <mark>osmosis</mark>")
+        self.assertEqual(results[0]["subject_name"], "Biology")
+
+    def test_prefix_and_escaping(self):
+        results = search_flashcards(self.db, 1, "inhib")
+        self.assertEqual(len(results), 1)
+        self.assertEqual(str(results[0]["question_html"]), "Enzyme &lt;b&gt;<mark>inhibitors</mark>&lt;/b&gt;")
+        self.assertEqual(str(results[0]["answer_html"]), "Competitive &amp; non-competitive")
+        # FTS5 syntax in the input is treated as plain words
+        self.assertEqual(self.questions('membrane" -(water'), ["Define osmosis"])
+        self.assertEqual(self.questions("  "), [])
+
+    def test_index_follows_edits(self):
+        update_flashcard(self.db, 1, 1, 1, "Define turgor", "Pressure of water")
+        self.assertEqual(self.questions("osmosis"), ["What is diffusion?"])
+        self.assertEqual(self.questions("turgor"), ["Define turgor"])
+        delete_flashcard(self.db, 1, 2)
+        self.assertEqual(self.questions("osmosis"), [])
+
+    def test_index_created_for_existing_cards(self):
+        self.db.execute_script(
+            """
+            DROP TRIGGER flashcards_search_insert;
+            DROP TRIGGER flashcards_search_delete;
+            DROP TRIGGER flashcards_search_update;
+            DROP TABLE FlashcardsSearch;
+            """
+        )
+        self.assertEqual(self.questions("water"), ["Define osmosis"])
+        ensure_search_index(self.db)
+        self.assertEqual(self.questions("water"), ["Define osmosis"])
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+
+import app as app_module
+from bench.datagen import generate, username, BENCH_PASSWORD
+from biobuddy.db import Database
+from biobuddy.favorites import toggle_favorite
+from biobuddy.fragments import Fragment, LRUCache, slot
+from biobuddy.profiles import invalidate_profile
+
+
+class TestFragment(unittest.TestCase):
+    def test_fill(self):
+        fragment = Fragment(f"<b>{slot('star', 1)}</b><i>{slot('star', 22)}</i>")
+        self.assertEqual(fragment.fill(lambda name, value: f"{name}={value}"), "<b>star=1</b><i>star=22</i>")
+        self.assertEqual(Fragment("no slots").fill(None), "no slots")
+
+    def test_lru_drops_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertEqual((cache.get("a"), cache.get("b"), cache.get("c")), (1, None, 3))
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+
+class TestPapersPage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "pages.db")
+        db = Database(self.db_path)
+        generate(db, users=2, cards_per_user=0, papers=30, favorites_per_user=0)
+        toggle_favorite(db, 1, 1)
+        self.paper_subject = "biology" if db.select_one("SELECT subject_id FROM Papers WHERE id = 1")[0] == 1 else "chemistry"
+        db.close()
+
+        app_module.DB_PATH = self.db_path
+        app_module._catalog_fragments.clear()
+        invalidate_profile()
+        app_module.app.config["TESTING"] = True
+        self.client = app_module.app.test_client()
+
+    def tearDown(self):
+        app_module.get_pool(self.db_path).discard()
+        self.tmp.cleanup()
+
+    def login(self, index):
+        self.client.post("/login", data={"username": username(index), "password": BENCH_PASSWORD})
+        self.client.get("/")  # Consume the welcome flash
+
+    def test_cached_grid_with_per_user_stars_and_etag(self):
+        url = f"/papers/{self.paper_subject}"
+        anonymous = self.client.get(url)
+        self.assertEqual(anonymous.status_code, 200)
+        self.assertNotIn("toggleFavorite(this", anonymous.get_data(as_text=True))
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": anonymous.headers["ETag"]}).status_code, 304)
+
+        self.login(1)
+        page = self.client.get(url)
+        html = page.get_data(as_text=True)
+        self.assertNotIn("<!--slot:", html)
+        self.assertEqual(html.count("★"), 1)
+        self.assertNotEqual(page.headers["ETag"], anonymous.headers["ETag"])
+        self.assertIn("private", page.headers["Cache-Control"])
+
+        # Same grid for user 2, who has no stars; the rendered fragment is reused
+        misses = app_module._catalog_fragments.misses
+        self.client.get("/logout")
+        self.login(2)
+        other = self.client.get(url)
+        self.assertEqual(other.get_data(as_text=True).count("★"), 0)
+        self.assertEqual(app_module._catalog_fragments.misses, misses)
+
+        # Starring a paper changes the ETag
+        etag = other.headers["ETag"]
+        self.client.post("/api/toggle_favorite", json={"paper_id": 1})
+        revisit = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(revisit.status_code, 200)
+        self.assertEqual(revisit.get_data(as_text=True).count("★"), 1)
+
+    def test_stars_changed_by_another_worker(self):
+        url = f"/papers/{self.paper_subject}"
+        self.login(1)
+        page = self.client.get(url)  # The home page has cached user 1's profile by now
+        self.assertEqual(page.get_data(as_text=True).count("★"), 1)
+
+        # Unstarred through another process: this one's profile cache does not know
+        db = Database(self.db_path)
+        db.execute("DELETE FROM Favorites WHERE user_id = 1")
+        db.close()
+
+        revisit = self.client.get(url, headers={"If-None-Match": page.headers["ETag"]})
+        self.assertEqual(revisit.status_code, 200)
+        self.assertEqual(revisit.get_data(as_text=True).count("★"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,8 @@
+import binascii
+import hashlib
 import unittest
 
-from biobuddy.user import hash_password, verify_password
+from biobuddy.user import PBKDF2_ITERATIONS, hash_password, needs_rehash, verify_password
 
 
 class TestHashPassword(unittest.TestCase):
@@ -12,3 +14,19 @@ class TestHashPassword(unittest.TestCase):
 
         self.assertTrue(verify_password(hashed, password))
         self.assertFalse(verify_password(hashed, "wrong_password"))
+
+    def test_versioned_format(self):
+        hashed = hash_password("passw0rd")
+        algorithm, iterations, salt, digest = hashed.split("$")
+        self.assertEqual(algorithm, "pbkdf2_sha256")
+        self.assertEqual(int(iterations), PBKDF2_ITERATIONS)
+        self.assertFalse(needs_rehash(hashed))
+
+    def test_legacy_hash_still_verifies(self):
+        salt = bytes(16)
+        digest = hashlib.pbkdf2_hmac("sha256", b"passw0rd", salt, 100_000)
+        legacy = binascii.hexlify(salt).decode() + ":" + binascii.hexlify(digest).decode()
+
+        self.assertTrue(verify_password(legacy, "passw0rd"))
+        self.assertFalse(verify_password(legacy, "wrong_password"))
+        self.assertTrue(needs_rehash(legacy))
@@ -0,0 +1,91 @@
+import threading
+import unittest
+from unittest import mock
+
+import app as app_module
+from biobuddy import metrics
+from biobuddy import db as db_module
+from biobuddy.db import Database, add_query_observer, remove_query_observer
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            metrics.fingerprint("SELECT *\n  FROM T WHERE id IN (?, ?, ?) AND name = 'o''k' AND n > 2.5"),
+            "SELECT * FROM T WHERE id IN (...) AND name = ? AND n > ?",
+        )
+        self.assertEqual(metrics.fingerprint("INSERT INTO T (a, b) VALUES (?, 1)"), "INSERT INTO T (a, b) VALUES (?, ?)")
+
+    def test_query_observer(self):
+        db = Database(":memory:")
+        registered = metrics.observe_query in db_module._query_observers  # app.py adds it on import
+        add_query_observer(metrics.observe_query)
+        try:
+            db.execute("CREATE TABLE T (id INTEGER PRIMARY KEY, name TEXT)")
+            db.executemany("INSERT INTO T (name) VALUES (?)", [("a",), ("b",), ("c",)])
+            db.query("SELECT * FROM T WHERE id > 1")
+            db.select_one("SELECT * FROM T WHERE id = 1")
+            db.select_one("SELECT * FROM T WHERE id = 2")
+        finally:
+            if not registered:
+                remove_query_observer(metrics.observe_query)
+            db.close()
+        db_queries = metrics.snapshot().queries
+
+        self.assertEqual(db_queries["INSERT INTO T (name) VALUES (?)"][::2], [1, 3])
+        self.assertEqual(db_queries["SELECT * FROM T WHERE id > ?"][::2], [1, 2])
+        count, seconds, rows = db_queries["SELECT * FROM T WHERE id = ?"]
+        self.assertEqual((count, rows), (2, 2))
+        self.assertGreater(seconds, 0)
+
+    def test_shards_add_up_across_threads(self):
+        def work():
+            for _ in range(100):
+                metrics.observe_request("index", "GET", 200, 0.003)
+            metrics.observe_request("index", "GET", 500, 20.0)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        metrics.observe_request("index", "GET", 200, 0.2)
+
+        text = metrics.render([("biobuddy_test_gauge", "gauge", "Test value.", 3)])
+        self.assertIn('biobuddy_http_requests_total{endpoint="index",method="GET",status="200"} 401', text)
+        self.assertIn('biobuddy_http_requests_total{endpoint="index",method="GET",status="500"} 4', text)
+        self.assertIn('biobuddy_http_request_duration_seconds_bucket{endpoint="index",le="0.005"} 400', text)
+        self.assertIn('biobuddy_http_request_duration_seconds_bucket{endpoint="index",le="0.25"} 401', text)
+        self.assertIn('biobuddy_http_request_duration_seconds_bucket{endpoint="index",le="+Inf"} 405', text)
+        self.assertIn('biobuddy_http_request_duration_seconds_count{endpoint="index"} 405', text)
+        self.assertIn("biobuddy_test_gauge 3\n", text)
+
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.client = app_module.app.test_client()
+
+    def get(self, enabled, token, debug=False, authorization=None):
+        headers = {"Authorization": authorization} if authorization else {}
+        with mock.patch.object(app_module, "METRICS_ENABLED", enabled), \
+                mock.patch.object(app_module, "METRICS_TOKEN", token), \
+                mock.patch.dict(app_module.app.config, {"DEBUG": debug}):
+            return self.client.get("/metrics", headers=headers).status_code
+
+    def test_off_by_default(self):
+        self.assertEqual(self.get(app_module.METRICS_ENABLED, None), 404)
+
+    def test_requires_token(self):
+        self.assertEqual(self.get(True, None), 401)
+        self.assertEqual(self.get(True, None, debug=True), 200)
+        self.assertEqual(self.get(True, "s3cret"), 401)
+        self.assertEqual(self.get(True, "s3cret", authorization="Bearer nope"), 401)
+        self.assertEqual(self.get(True, "s3cret", authorization="Bearer s3cret"), 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
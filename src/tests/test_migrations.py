@@ -0,0 +1,115 @@
+import io
+import sqlite3
+import unittest
+from contextlib import redirect_stdout
+
+from biobuddy.db import Database
+from biobuddy.flashcards import search_flashcards
+from biobuddy.migrations import LATEST_VERSION, get_schema_version, migrate
+from create_db import SCHEMA_SQL, create_tables
+
+
+# The schema as first shipped, before any of the later columns, tables and indexes
+LEGACY_SCHEMA_SQL = """
+CREATE TABLE Users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL, password_hash TEXT NOT NULL);
+CREATE TABLE Subjects (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL);
+CREATE TABLE Papers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, subject_id INTEGER NOT NULL, year INTEGER NOT NULL,
+    level TEXT NOT NULL, type TEXT NOT NULL, paper_number INTEGER NOT NULL, filename TEXT UNIQUE NOT NULL
+);
+CREATE TABLE Favorites (user_id INTEGER, paper_id INTEGER, PRIMARY KEY (user_id, paper_id));
+CREATE TABLE Flashcards (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, subject_id INTEGER NOT NULL,
+    question TEXT NOT NULL, answer TEXT NOT NULL, leitner_box INTEGER DEFAULT 1,
+    next_review_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP, last_reviewed TIMESTAMP
+);
+INSERT INTO Users (username, password_hash) VALUES ('u', 'x');
+INSERT INTO Subjects (name) VALUES ('Biology');
+INSERT INTO Flashcards (user_id, subject_id, question, answer) VALUES (1, 1, 'What is ATP?', 'Energy');
+"""
+
+
+def names(db, kind):
+    return {row["name"] for row in db.query("SELECT name FROM sqlite_master WHERE type = ?", (kind,))}
+
+
+class TestMigrations(unittest.TestCase):
+    def test_upgrades_legacy_database(self):
+        db = Database(":memory:")
+        db.execute_script(LEGACY_SCHEMA_SQL)
+        self.assertEqual(get_schema_version(db), 0)
+
+        self.assertEqual(migrate(db), list(range(1, LATEST_VERSION + 1)))
+        self.assertEqual(get_schema_version(db), LATEST_VERSION)
+        self.assertLessEqual({"idx_papers_listing", "idx_favorites_paper", "idx_cards_deck"}, names(db, "index"))
+        self.assertLessEqual({"Reviews", "FlashcardsSearch", "Meta"}, names(db, "table"))
+        columns = {row["name"] for row in db.query("PRAGMA table_info(Flashcards)")}
+        self.assertLessEqual({"ease", "stability"}, columns)
+        # Existing cards were indexed for search
+        self.assertEqual(db.select_one("SELECT rowid FROM FlashcardsSearch WHERE FlashcardsSearch MATCH 'atp'")[0], 1)
+        # Planner statistics were gathered
+        self.assertTrue(db.query("SELECT * FROM sqlite_stat1 WHERE idx = 'idx_cards_deck'"))
+
+        self.assertEqual(migrate(db), [])
+        db.close()
+
+    def test_create_tables_upgrades_legacy_database(self):
+        db = Database(":memory:")
+        db.execute_script(LEGACY_SCHEMA_SQL)
+        with redirect_stdout(io.StringIO()):
+            create_tables(db)
+            create_tables(db)
+        self.assertEqual(get_schema_version(db), LATEST_VERSION)
+        self.assertIn("idx_papers_sha256", names(db, "index"))
+        self.assertEqual(db.select_one("SELECT rowid FROM FlashcardsSearch WHERE FlashcardsSearch MATCH 'atp'")[0], 1)
+        db.close()
+
+    def test_fresh_schema_is_rerunnable(self):
+        db = Database(":memory:")
+        for _ in range(2):
+            db.execute_script(SCHEMA_SQL)
+            migrate(db)
+        self.assertEqual(get_schema_version(db), LATEST_VERSION)
+        self.assertIn("idx_papers_listing", names(db, "index"))
+        db.close()
+
+    def test_search_index_gains_user_id(self):
+        db = Database(":memory:")
+        db.execute_script(LEGACY_SCHEMA_SQL)
+        migrate(db)
+        # The index as migration 1 created it before it was scoped per user
+        db.execute_script(
+            """
+            DROP TRIGGER flashcards_search_insert;
+            DROP TRIGGER flashcards_search_delete;
+            DROP TRIGGER flashcards_search_update;
+            DROP TABLE FlashcardsSearch;
+            CREATE VIRTUAL TABLE FlashcardsSearch USING fts5(question, answer, content = 'Flashcards', content_rowid = 'id');
+            INSERT INTO FlashcardsSearch (FlashcardsSearch) VALUES ('rebuild');
+            PRAGMA user_version = 4;
+            """
+        )
+        self.assertEqual(migrate(db), [5])
+        self.assertEqual(search_flashcards(db, 1, "atp")[0]["id"], 1)
+        # The triggers came back with the new column
+        db.execute("INSERT INTO Flashcards (user_id, subject_id, question, answer) VALUES (1, 1, 'Define ADP', 'x')")
+        self.assertEqual(len(search_flashcards(db, 1, "adp")), 1)
+        db.close()
+
+    def test_failed_migration_rolls_back(self):
+        db = Database(":memory:")
+        db.execute_script(SCHEMA_SQL)
+        migrate(db)
+        db.execute("DROP INDEX idx_papers_listing")
+        db.execute("PRAGMA user_version = 1")
+        db.execute("DROP TABLE Favorites")  # Migration 2 now fails half-way
+
+        with self.assertRaises(sqlite3.OperationalError):
+            migrate(db)
+        self.assertEqual(get_schema_version(db), 1)
+        self.assertNotIn("idx_papers_listing", names(db, "index"))
+        db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
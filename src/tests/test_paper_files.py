@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from biobuddy import paper_files
+from biobuddy.db import Database
+from biobuddy.paper_files import (
+    PaperFilenameError, find_duplicate_papers, parse_paper_filename, sync_paper_files, watch_paper_files
+)
+from create_db import SCHEMA_SQL
+
+
+class TestParsePaperFilename(unittest.TestCase):
+    def test_valid(self):
+        self.assertEqual(
+            parse_paper_filename("Biology_2022_HL_MS_1_TZ2.pdf"),
+            {"subject": "Biology", "year": 2022, "level": "HL", "type": "MS", "paper_number": 1,
+             "timezone": "TZ2"},
+        )
+        self.assertEqual(parse_paper_filename("Chemistry_2021_HL_QP_2_TZ2 (1).pdf")["timezone"], "TZ2")
+        self.assertIsNone(parse_paper_filename("Biology_2018_SL_QP_2.pdf")["timezone"])
+
+    def test_invalid(self):
+        for filename in ("Biology_2022_HL_MS.pdf", "Biology_2022_XL_MS_1.pdf",
+                         "Biology_2022_HL_XX_1.pdf", "Biology_2025_HL_MS_1A_TZ1.pdf", "notes.txt"):
+            with self.assertRaises(PaperFilenameError):
+                parse_paper_filename(filename)
+
+
+class TestSyncPaperFiles(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.papers_dir = self.tmp.name
+        self.db = Database(":memory:")
+        self.db.execute_script(SCHEMA_SQL)
+        self.db.execute("INSERT INTO Subjects (name) VALUES ('Biology')")
+        self.write("Biology_2018_SL_QP_2.pdf", b"paper one")
+        self.write("Biology_2022_HL_MS_1.pdf", b"paper two")
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def write(self, filename, content):
+        with open(os.path.join(self.papers_dir, filename), "wb") as f:
+            f.write(content)
+
+    def sync(self):
+        return sync_paper_files(self.db, self.papers_dir, log=lambda message: None)
+
+    def test_incremental_sync(self):
+        self.assertEqual(self.sync()["added"], 2)
+        self.assertEqual(self.sync()["unchanged"], 2)
+
+        paper_id = self.db.select_one("SELECT id FROM Papers WHERE filename = 'Biology_2018_SL_QP_2.pdf'")["id"]
+        os.rename(
+            os.path.join(self.papers_dir, "Biology_2018_SL_QP_2.pdf"),
+            os.path.join(self.papers_dir, "Biology_2019_SL_QP_2.pdf"),
+        )
+        os.remove(os.path.join(self.papers_dir, "Biology_2022_HL_MS_1.pdf"))
+        self.write("Biology_2021_HL_QP_1.pdf", b"paper three")
+
+        summary = self.sync()
+        self.assertEqual((summary["renamed"], summary["removed"], summary["added"]), (1, 1, 1))
+        renamed = self.db.select_one("SELECT id, year FROM Papers WHERE filename = 'Biology_2019_SL_QP_2.pdf'")
+        self.assertEqual((renamed["id"], renamed["year"]), (paper_id, 2019))
+        self.assertEqual(self.db.select_one("SELECT COUNT(*) AS n FROM Papers")["n"], 2)
+
+    def test_duplicates(self):
+        self.write("Biology_2019_SL_QP_2.pdf", b"paper one")
+        self.sync()
+        self.assertEqual(find_duplicate_papers(self.db), [["Biology_2018_SL_QP_2.pdf", "Biology_2019_SL_QP_2.pdf"]])
+
+    def test_watch_survives_vanished_file(self):
+        # A PDF deleted between the scan and hashing it fails one poll, not the watcher
+        real_sync = paper_files.sync_paper_files
+        calls = []
+
+        def flaky_sync(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                raise FileNotFoundError("Biology_2018_SL_QP_2.pdf")
+            return real_sync(*args, **kwargs)
+
+        messages = []
+        with mock.patch.object(paper_files, "sync_paper_files", flaky_sync), \
+                mock.patch.object(paper_files.time, "sleep", side_effect=[None, KeyboardInterrupt]):
+            with self.assertRaises(KeyboardInterrupt):
+                watch_paper_files(self.db, self.papers_dir, log=messages.append)
+
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(messages[0].startswith("Sync failed, retrying"))
+        self.assertEqual(self.db.select_one("SELECT COUNT(*) AS n FROM Papers")["n"], 2)
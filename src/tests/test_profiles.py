@@ -0,0 +1,70 @@
+import unittest
+from unittest import mock
+
+from bench.datagen import generate
+from biobuddy import profiles
+from biobuddy.db import Database
+from biobuddy.favorites import get_user_favorites, toggle_favorite
+from biobuddy.profiles import get_profile, invalidate_profile
+
+
+class TestProfileCache(unittest.TestCase):
+    def setUp(self):
+        invalidate_profile()
+        self.db = Database(":memory:")
+        generate(self.db, users=2, cards_per_user=0, papers=20, favorites_per_user=3)
+        self.statements = []
+        self.db.connection.set_trace_callback(self.statements.append)
+
+    def tearDown(self):
+        invalidate_profile()
+        self.db.close()
+
+    def assertMatchesDatabase(self, profile, user_id):
+        def fields(papers):
+            # Star counts change with other users' clicks and are not kept current in the cache
+            return [{key: row[key] for key in row.keys() if key != "favorite_count"} for row in papers]
+
+        rows = get_user_favorites(self.db, user_id)
+        self.assertEqual(fields(profile.favorites), fields(rows))
+        self.assertEqual(profile.favorite_ids, {row["id"] for row in rows})
+
+    def test_cached_until_invalidated(self):
+        profile = get_profile(self.db, 1)
+        self.assertEqual(profile.username, "user0001")
+        self.assertEqual(len(profile.favorites), 3)
+
+        self.statements.clear()
+        self.assertIs(get_profile(self.db, 1), profile)
+        self.assertEqual(self.statements, [])
+
+        invalidate_profile(1)
+        self.assertIsNot(get_profile(self.db, 1), profile)
+        self.assertIsNone(get_profile(self.db, 99))
+
+    def test_toggle_updates_entry_in_place(self):
+        profile = get_profile(self.db, 1)
+        added = next(paper_id for paper_id in range(1, 21) if paper_id not in profile.favorite_ids)
+        removed = min(profile.favorite_ids)
+
+        toggle_favorite(self.db, 1, added)
+        toggle_favorite(self.db, 1, removed)
+        self.statements.clear()
+        updated = get_profile(self.db, 1)
+        self.assertEqual(self.statements, [])
+        self.assertIn(added, updated.favorite_ids)
+        self.assertNotIn(removed, updated.favorite_ids)
+        self.assertMatchesDatabase(updated, 1)
+        # Other users' entries are untouched
+        self.assertMatchesDatabase(get_profile(self.db, 2), 2)
+
+    def test_expires_after_ttl(self):
+        with mock.patch.object(profiles, "PROFILE_TTL", 0):
+            get_profile(self.db, 1)
+            self.statements.clear()
+            get_profile(self.db, 1)
+        self.assertTrue(self.statements)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+"""
+Query plans of the hot read/write paths on a seeded database.
+
+Every statement that papers, favorites, flashcards and study run is captured
+(with its parameters inlined by the trace callback) and explained; a plan
+fails when it scans a large table or sorts in a temp B-tree. A statement
+without a WHERE clause (e.g. the catalog load) reads the whole table on
+purpose and may scan it, but must not sort.
+"""
+import unittest
+
+from bench.datagen import generate
+from biobuddy import favorites, flashcards, papers, study
+from biobuddy.catalog import CatalogIndex
+from biobuddy.db import Database
+
+
+# Tables a full scan is fine for (by name or by the alias the queries use)
+SMALL_TABLES = {"Subjects", "s", "Meta"}
+# Relevance ranking sorts the (already filtered) full-text matches; no index can help
+SORT_ALLOWED = ("bm25(",)
+
+
+def captured_statements(db, calls):
+    """Runs calls [(function, args)] against db and returns the SQL they ran, parameters inlined."""
+    statements = []
+    db.connection.set_trace_callback(statements.append)
+    try:
+        for function, args in calls:
+            function(db, *args)
+    finally:
+        db.connection.set_trace_callback(None)
+    # Skip BEGIN/COMMIT/SAVEPOINT, DDL and statements SQLite runs internally ("-- ...")
+    return list(dict.fromkeys(
+        sql for sql in statements
+        if sql.split(None, 1)[0].upper() in ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+    ))
+
+
+def plan_problems(db, sql):
+    """Plan lines of sql that scan a large table or build a temp B-tree for sorting."""
+    problems = []
+    for line in db.explain(sql):
+        detail = line.strip()
+        if detail.startswith("USE TEMP B-TREE") and not any(marker in sql for marker in SORT_ALLOWED):
+            problems.append(detail)
+        elif detail.startswith("SCAN "):
+            table = detail.split()[1]
+            if (table not in SMALL_TABLES and not table.startswith("(") and "VIRTUAL TABLE" not in detail
+                    and " WHERE " in " ".join(sql.upper().split())):
+                problems.append(detail)
+    return problems
+
+
+class TestQueryPlans(unittest.TestCase):
+    maxDiff = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls.db = Database(":memory:")
+        generate(cls.db, users=5, cards_per_user=300, papers=500, favorites_per_user=20)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db.close()
+
+    def assertPlansUseIndexes(self, calls):
+        statements = captured_statements(self.db, calls)
+        self.assertTrue(statements)
+        failures = {
+            " ".join(sql.split()): problems
+            for sql in statements
+            if (problems := plan_problems(self.db, sql))
+        }
+        self.assertEqual(failures, {})
+
+    def test_papers(self):
+        self.assertPlansUseIndexes([
+            # get_papers is served from the in-memory catalog; only loading it runs SQL
+            (lambda db: CatalogIndex().refresh(db), ()),
+            (papers.get_papers, ("biology", {"year": "2010"})),
+            (papers.get_paper, (1,)),
+            (papers.get_facets, ("chemistry", {"level": "HL"})),
+        ])
+
+    def test_favorites(self):
+        self.assertPlansUseIndexes([
+            (favorites.get_user_favorites, (1,)),
+            (favorites.get_favorite_ids, (1,)),
+            (favorites.toggle_favorite, (1, 3)),
+            (favorites.toggle_favorite, (1, 3)),
+        ])
+
+    def test_flashcards(self):
+        self.assertPlansUseIndexes([
+            (flashcards.get_user_flashcards, (1, None, flashcards.DECK_PAGE_SIZE)),
+            (flashcards.get_user_flashcards, (1, 900, flashcards.DECK_PAGE_SIZE, 1)),
+            (flashcards.count_user_flashcards, (1, 2)),
+            (flashcards.get_card_by_id, (3, 1)),
+            (flashcards.search_flashcards, (1, "cell memb")),
+            (flashcards.update_flashcard, (1, 3, 1, "Question?", "Answer.")),
+        ])
+
+    def test_search_is_scoped_in_the_index(self):
+        # The user filter is part of the MATCH, so FTS5 only visits and ranks this user's cards
+        [sql] = [
+            sql for sql in captured_statements(self.db, [(flashcards.search_flashcards, (1, "cell"))])
+            if "MATCH" in sql
+        ]
+        self.assertIn("user_id : \"1\" AND", sql)
+        plan = self.db.explain(sql)
+        self.assertTrue(plan[0].strip().startswith("SCAN FlashcardsSearch VIRTUAL TABLE"), plan)
+
+        matched = self.db.select_one(
+            "SELECT COUNT(*) FROM FlashcardsSearch WHERE FlashcardsSearch MATCH ?",
+            (flashcards._match_expression("cell", 1),),
+        )[0]
+        own = self.db.select_one(
+            "SELECT COUNT(*) FROM Flashcards WHERE user_id = 1 AND (question LIKE '%cell%' OR answer LIKE '%cell%')"
+        )[0]
+        self.assertEqual(matched, own)
+
+    def test_study(self):
+        self.assertPlansUseIndexes([
+            (study.get_due_cards, (1,)),
+            (study.get_next_due_card, (1,)),
+            (study.get_next_due_cards, (1, 10)),
+            (study.count_due_cards, (1, 100)),
+            (study.get_study_queue, (1,)),
+            (study.process_review, (1, 3, study.RATINGS[0])),
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import threading
+import unittest
+from datetime import datetime, timedelta
+
+from biobuddy.db import Database
+from biobuddy.review_log import ReviewLogBuffer, get_card_reviews, replay_reviews, write_reviews
+from biobuddy.study import process_review, process_reviews
+from create_db import SCHEMA_SQL
+
+
+def entry(card_id, rating="easy"):
+    return (1, card_id, rating, 1, 2, 3, datetime(2024, 1, 1), None)
+
+
+class TestReviewLogBuffer(unittest.TestCase):
+    def setUp(self):
+        self.written = []
+        self.wrote = threading.Event()
+
+    def writer(self, entries):
+        self.written.extend(entries)
+        self.wrote.set()
+
+    def test_flushes_when_full(self):
+        buffer = ReviewLogBuffer(self.writer, flush_size=3, flush_interval=60)
+        buffer.append(entry(1))
+        buffer.append(entry(2))
+        self.assertFalse(self.wrote.wait(0.1))
+        buffer.append(entry(3))
+        self.assertTrue(self.wrote.wait(2))
+        self.assertEqual([e[1] for e in self.written], [1, 2, 3])
+        buffer.close()
+
+    def test_flushes_on_interval_and_close(self):
+        buffer = ReviewLogBuffer(self.writer, flush_size=100, flush_interval=0.05)
+        buffer.append(entry(1))
+        self.assertTrue(self.wrote.wait(2))
+
+        buffer.append(entry(2))
+        buffer.close()
+        self.assertEqual([e[1] for e in self.written], [1, 2])
+        self.assertEqual((buffer.pending(), buffer.flushed), (0, 2))
+
+    def test_failed_write_is_retried_in_order(self):
+        attempts = []
+
+        def flaky(entries):
+            attempts.append(len(entries))
+            if len(attempts) == 1:
+                raise RuntimeError("database is locked")
+            self.writer(entries)
+
+        buffer = ReviewLogBuffer(flaky, flush_size=100, flush_interval=60)
+        buffer.append(entry(1))
+        with self.assertRaises(RuntimeError):
+            buffer.flush()
+        buffer.append(entry(2))
+        buffer.close()
+
+        self.assertEqual(attempts, [1, 2])
+        self.assertEqual([e[1] for e in self.written], [1, 2])
+        self.assertEqual(buffer.failed_flushes, 1)
+
+
+class TestReviewLog(unittest.TestCase):
+    def setUp(self):
+        self.db = Database(":memory:")
+        self.db.execute_script(SCHEMA_SQL)
+        self.db.execute("INSERT INTO Users (username, password_hash) VALUES ('u', 'x')")
+        self.db.execute("INSERT INTO Subjects (name) VALUES ('Biology')")
+        self.db.executemany(
+            "INSERT INTO Flashcards (user_id, subject_id, question, answer) VALUES (1, 1, ?, 'a')",
+            [(f"q{i}",) for i in range(3)],
+        )
+
+    def tearDown(self):
+        self.db.close()
+
+    def state(self, card_id):
+        return tuple(self.db.select_one(
+            """
+            SELECT leitner_box, interval_days, repetitions, lapses, next_review_date, last_reviewed
+            FROM Flashcards WHERE id = ?
+            """,
+            (card_id,),
+        ))
+
+    def test_review_without_buffer_is_logged(self):
+        process_review(self.db, 1, 1, "easy")
+        process_review(self.db, 1, 1, "hard")
+        process_review(self.db, 1, 99, "easy")  # Not a card: nothing to log
+
+        reviews = get_card_reviews(self.db, 1, 1)
+        self.assertEqual(
+            [(r["rating"], r["box_before"], r["box_after"], r["interval_days"]) for r in reviews],
+            [("easy", 1, 2, 3), ("hard", 2, 1, 0)],
+        )
+        self.assertEqual(self.db.select_one("SELECT COUNT(*) AS n FROM Reviews")["n"], 2)
+
+    def test_buffered_reviews_and_response_time(self):
+        buffer = ReviewLogBuffer(lambda entries: write_reviews(self.db, entries), flush_size=100, flush_interval=60)
+        start = datetime.now() - timedelta(days=10)
+        applied = process_reviews(
+            self.db, 1,
+            [(2, "easy", start, 4200), (2, "medium", start + timedelta(days=3)), (3, "bogus", start)],
+            review_log=buffer,
+        )
+        self.assertEqual(applied, 2)
+        self.assertEqual(get_card_reviews(self.db, 1, 2), [])
+
+        buffer.flush()
+        reviews = get_card_reviews(self.db, 1, 2)
+        self.assertEqual([r["response_ms"] for r in reviews], [4200, None])
+        self.assertEqual([r["rating"] for r in reviews], ["easy", "medium"])
+
+    def test_replay_rebuilds_card_state(self):
+        start = datetime.now() - timedelta(days=30)
+        process_reviews(self.db, 1, [
+            (1, "easy", start),
+            (1, "easy", start + timedelta(days=3)),
+            (1, "hard", start + timedelta(days=10)),
+            (2, "medium", start),
+        ])
+        expected = [self.state(1), self.state(2), self.state(3)]
+
+        self.db.execute(
+            "UPDATE Flashcards SET leitner_box = 5, interval_days = 30, repetitions = 9, lapses = 0 WHERE id IN (1, 2)"
+        )
+        self.assertEqual(replay_reviews(self.db, 1), 2)
+        self.assertEqual([self.state(1), self.state(2), self.state(3)], expected)
+
+    def test_replay_skips_unreadable_timestamps(self):
+        start = datetime.now() - timedelta(days=30)
+        process_reviews(self.db, 1, [(1, "easy", start), (1, "easy", start + timedelta(days=3))])
+        expected = self.state(1)
+        write_reviews(self.db, [
+            (1, 1, "hard", 1, 1, None, "not a date", None),
+            (1, 3, "hard", 1, 1, None, "yesterday", None),
+        ])
+
+        messages = []
+        self.assertEqual(replay_reviews(self.db, 1, log=messages.append), 1)
+        self.assertEqual(self.state(1), expected)
+        self.assertEqual(messages, ["Skipped 2 reviews with an unreadable reviewed_at."])
+
+
+if __name__ == "__main__":
+    unittest.main()
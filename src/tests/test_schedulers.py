@@ -0,0 +1,130 @@
+import unittest
+from datetime import datetime, timedelta
+
+from biobuddy.db import Database
+from biobuddy.reschedule import reschedule_cards, set_user_scheduler
+from biobuddy.schedulers import STATE_FIELDS, FSRSScheduler, LeitnerScheduler, SM2Scheduler, fsrs_interval
+from biobuddy.study import _apply_review, ensure_scheduler_columns, process_review
+from create_db import SCHEMA_SQL
+
+
+NEW_CARD = dict.fromkeys(STATE_FIELDS, None)
+NEW_CARD.update(leitner_box=1, repetitions=0, lapses=0)
+
+
+def run(scheduler, ratings, elapsed=None):
+    card = NEW_CARD
+    intervals = []
+    for rating in ratings:
+        card = scheduler.review(card, rating, elapsed if elapsed is not None else card["interval_days"])
+        intervals.append(card["interval_days"])
+    return card, intervals
+
+
+class TestSchedulers(unittest.TestCase):
+    def test_leitner_matches_boxes(self):
+        card, intervals = run(LeitnerScheduler(), ["easy", "easy", "medium", "easy", "hard", "easy"])
+        self.assertEqual(intervals, [3, 7, 7, 14, 0, 3])
+        self.assertEqual((card["leitner_box"], card["lapses"], card["repetitions"]), (2, 1, 1))
+
+    def test_sm2(self):
+        card, intervals = run(SM2Scheduler(), ["medium", "medium", "medium", "easy"])
+        self.assertEqual(intervals, [1, 6, 15, 39])
+        self.assertAlmostEqual(card["ease"], 2.6)
+
+        card, intervals = run(SM2Scheduler(), ["medium", "medium", "hard", "medium"])
+        self.assertEqual(intervals, [1, 6, 0, 1])
+        self.assertLess(card["ease"], 2.5)
+
+    def test_fsrs(self):
+        card, intervals = run(FSRSScheduler(), ["medium", "medium", "medium"])
+        self.assertEqual(intervals[0], round(FSRSScheduler.DEFAULTS["weights"][2]))
+        self.assertTrue(intervals[0] < intervals[1] < intervals[2])
+
+        # Lower target recall -> longer intervals
+        _, relaxed = run(FSRSScheduler({"desired_retention": 0.8}), ["medium", "medium", "medium"])
+        self.assertGreater(relaxed[2], intervals[2])
+
+        forgotten = FSRSScheduler().review(card, "hard", card["interval_days"])
+        self.assertEqual(forgotten["interval_days"], 0)
+        self.assertLess(forgotten["stability"], card["stability"])
+        self.assertEqual(forgotten["lapses"], 1)
+
+    def test_unknown_parameter(self):
+        with self.assertRaises(ValueError):
+            FSRSScheduler({"retention": 0.9})
+
+
+class TestRescheduling(unittest.TestCase):
+    def setUp(self):
+        self.db = Database(":memory:")
+        self.db.execute_script(SCHEMA_SQL)
+        self.db.execute("INSERT INTO Users (username, password_hash) VALUES ('u', 'x')")
+        self.db.execute("INSERT INTO Subjects (name) VALUES ('Biology')")
+        self.db.executemany(
+            "INSERT INTO Flashcards (user_id, subject_id, question, answer) VALUES (1, 1, ?, 'a')",
+            [(f"q{i}",) for i in range(4)],
+        )
+        self.reviewed_at = datetime(2024, 1, 10, 12, 0)
+
+    def tearDown(self):
+        self.db.close()
+
+    def due(self, card_id):
+        row = self.db.select_one("SELECT next_review_date FROM Flashcards WHERE id = ?", (card_id,))
+        return datetime.fromisoformat(row["next_review_date"])
+
+    def review(self, card_id, rating):
+        with self.db.transaction():
+            _apply_review(self.db, 1, card_id, rating, self.reviewed_at)
+
+    def test_review_uses_user_scheduler(self):
+        process_review(self.db, 1, 1, "easy")
+        self.assertEqual(self.db.select_one("SELECT interval_days FROM Flashcards WHERE id = 1")["interval_days"], 3)
+
+        set_user_scheduler(self.db, 1, "sm2")
+        self.review(2, "medium")
+        self.assertEqual(self.due(2), self.reviewed_at + timedelta(days=1))
+
+    def test_switch_reschedules_reviewed_cards(self):
+        self.review(1, "easy")    # box 2: 3 days
+        self.review(2, "easy")
+        self.review(2, "easy")    # box 3: 7 days
+        self.review(3, "hard")    # due again now
+        untouched = self.db.select_one("SELECT next_review_date FROM Flashcards WHERE id = 4")["next_review_date"]
+
+        self.assertEqual(set_user_scheduler(self.db, 1, "fsrs", {"desired_retention": 0.8}), 2)
+        for card_id, days in ((1, 3), (2, 7)):
+            expected = round(fsrs_interval(days, 0.8))
+            self.assertEqual(self.due(card_id), self.reviewed_at + timedelta(days=expected))
+        self.assertEqual(self.due(3), self.reviewed_at)
+        self.assertEqual(
+            self.db.select_one("SELECT next_review_date FROM Flashcards WHERE id = 4")["next_review_date"],
+            untouched,
+        )
+
+        # Back to Leitner: intervals come from the boxes again
+        set_user_scheduler(self.db, 1, "leitner", {"intervals": [1, 2, 4, 8, 16]})
+        self.assertEqual(self.due(2), self.reviewed_at + timedelta(days=4))
+        self.assertEqual(reschedule_cards(self.db), 2)
+
+    def test_legacy_cards_backfilled(self):
+        legacy = Database(":memory:")
+        legacy.execute_script(
+            """
+            CREATE TABLE Users (id INTEGER PRIMARY KEY, username TEXT, password_hash TEXT);
+            CREATE TABLE Flashcards (
+                id INTEGER PRIMARY KEY, user_id INTEGER, subject_id INTEGER, question TEXT, answer TEXT,
+                leitner_box INTEGER DEFAULT 1, next_review_date TIMESTAMP, last_reviewed TIMESTAMP
+            );
+            INSERT INTO Users VALUES (1, 'u', 'x');
+            INSERT INTO Flashcards VALUES (1, 1, 1, 'q', 'a', 3, '2024-01-17 12:00:00', NULL);
+            INSERT INTO Flashcards VALUES (2, 1, 1, 'q', 'a', 1, '2024-01-01 12:00:00', NULL);
+            """
+        )
+        ensure_scheduler_columns(legacy)
+        rows = legacy.query("SELECT interval_days, last_reviewed, repetitions FROM Flashcards ORDER BY id")
+        self.assertEqual(tuple(rows[0]), (7, "2024-01-10 12:00:00", 0))
+        self.assertEqual(tuple(rows[1]), (None, None, 0))
+        self.assertEqual(legacy.select_one("SELECT scheduler FROM Users")["scheduler"], "leitner")
+        legacy.close()
@@ -0,0 +1,85 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+import app as app_module
+from bench.datagen import generate
+from biobuddy.db import Database
+from biobuddy.lazy import lazy_import
+
+
+class TestWarmUp(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "warm.db")
+        db = Database(self.db_path)
+        generate(db, users=1, cards_per_user=0, papers=20, favorites_per_user=0)
+        db.close()
+
+        app_module.DB_PATH = self.db_path
+        app_module.TEMPLATE_CACHE_DIR = os.path.join(self.tmp.name, "templates")
+        app_module._catalog_fragments.clear()
+        self.jinja_env = app_module.app.jinja_env
+        self.jinja_env.bytecode_cache = None
+        self.jinja_env.cache.clear()
+
+    def tearDown(self):
+        self.jinja_env.bytecode_cache = None
+        self.jinja_env.cache.clear()
+        app_module.get_pool(self.db_path).discard()
+        self.tmp.cleanup()
+
+    def test_create_app_with_warmup(self):
+        flask_app = app_module.create_app(warmup=True)
+        self.assertIs(flask_app, app_module.app)
+
+        # Every template was compiled into the on-disk cache
+        templates = [name for name in os.listdir(flask_app.template_folder) if name.endswith(".html")]
+        self.assertEqual(len(os.listdir(app_module.TEMPLATE_CACHE_DIR)), len(templates))
+        # Both subjects' grids (logged in and out) are ready
+        self.assertEqual(len(app_module._catalog_fragments), 4)
+        self.assertEqual(os.stat(app_module.TEMPLATE_CACHE_DIR).st_mode & 0o777, 0o700)
+
+        misses = app_module._catalog_fragments.misses
+        self.assertEqual(flask_app.test_client().get("/papers/chemistry").status_code, 200)
+        self.assertEqual(app_module._catalog_fragments.misses, misses)
+
+
+    def test_rejects_shared_template_cache(self):
+        # A directory others can write to could hold planted bytecode
+        shared = os.path.join(self.tmp.name, "shared")
+        os.mkdir(shared)
+        os.chmod(shared, 0o777)
+        with self.assertLogs(app_module.app.logger, "WARNING"):
+            cache = app_module._template_bytecode_cache(shared)
+        self.assertNotEqual(cache.directory, shared)
+
+
+
+class TestLazyImport(unittest.TestCase):
+    def test_concurrent_first_access(self):
+        # Every thread sees the finished module, even while the first one is still importing it
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, "slow_module_for_test.py"), "w") as f:
+                f.write("import time\ntime.sleep(0.2)\nVALUE = 42\n")
+            sys.path.insert(0, tmp)
+            try:
+                module = lazy_import("slow_module_for_test")
+                self.assertNotIn("slow_module_for_test", sys.modules)
+
+                results = []
+                threads = [threading.Thread(target=lambda: results.append(module.VALUE)) for _ in range(8)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                self.assertEqual(results, [42] * 8)
+            finally:
+                sys.path.remove(tmp)
+                sys.modules.pop("slow_module_for_test", None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from datetime import datetime, timedelta
+
+from biobuddy import stats as stats_module
+from biobuddy.db import Database
+from biobuddy.flashcards import create_flashcard, delete_flashcard
+from biobuddy.stats import FORECAST_DAYS, compute_stats, get_user_stats
+from biobuddy.study import process_reviews
+from create_db import SCHEMA_SQL
+
+
+class TestStats(unittest.TestCase):
+    def setUp(self):
+        stats_module._cache.clear()
+        self.db = Database(":memory:")
+        self.db.execute_script(SCHEMA_SQL)
+        self.db.execute("INSERT INTO Users (username, password_hash) VALUES ('u', 'x'), ('v', 'x')")
+        self.db.execute("INSERT INTO Subjects (name) VALUES ('Biology'), ('Chemistry')")
+        now = datetime.now()
+        cards = [
+            # subject, box, due
+            (1, 1, now - timedelta(days=3)),
+            (1, 2, now + timedelta(days=2)),
+            (1, 2, now + timedelta(days=2)),
+            (2, 5, now + timedelta(days=45)),
+        ]
+        self.db.executemany(
+            """
+            INSERT INTO Flashcards (user_id, subject_id, question, answer, leitner_box, next_review_date)
+            VALUES (1, ?, 'q', 'a', ?, ?)
+            """,
+            cards,
+        )
+        # Another user's cards never show up
+        self.db.execute(
+            "INSERT INTO Flashcards (user_id, subject_id, question, answer, leitner_box) VALUES (2, 1, 'q', 'a', 3)"
+        )
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_box_distribution_and_forecast(self):
+        stats = compute_stats(self.db, 1)
+        self.assertEqual(stats["total_cards"], 4)
+        self.assertEqual(
+            [(row["subject"], row["counts"]) for row in stats["box_distribution"]],
+            [("Biology", [1, 2, 0, 0, 0]), ("Chemistry", [0, 0, 0, 0, 1])],
+        )
+        self.assertEqual(stats["box_totals"], [1, 2, 0, 0, 1])
+
+        self.assertEqual(len(stats["forecast"]), FORECAST_DAYS)
+        due = [day["due"] for day in stats["forecast"]]
+        self.assertEqual((due[0], due[2], sum(due)), (1, 2, 3))
+        self.assertEqual(stats["due_later"], 1)
+
+    def test_retention_by_box_and_subject(self):
+        start = datetime.now() - timedelta(days=5)
+        process_reviews(self.db, 1, [
+            (1, "easy", start),                           # Biology, box 1: recalled
+            (1, "hard", start + timedelta(days=1)),       # Biology, box 2: forgotten
+            (2, "medium", start),                         # Biology, box 2: recalled
+            (4, "hard", start),                           # Chemistry, box 5: forgotten
+        ])
+        retention = compute_stats(self.db, 1)["retention"]
+        self.assertEqual((retention["reviews"], retention["rate"]), (4, 0.5))
+        self.assertEqual(
+            [(row["box"], row["reviews"], row["rate"]) for row in retention["by_box"]],
+            [(1, 1, 1.0), (2, 2, 0.5), (3, 0, None), (4, 0, None), (5, 1, 0.0)],
+        )
+        self.assertEqual(
+            [(row["subject"], row["reviews"], row["rate"]) for row in retention["by_subject"]],
+            [("Biology", 3, 0.6667), ("Chemistry", 1, 0.0)],
+        )
+
+    def test_cache_invalidated_by_changes(self):
+        stats = get_user_stats(self.db, 1)
+        self.assertIs(get_user_stats(self.db, 1), stats)
+
+        card_id = create_flashcard(self.db, 1, 2, "q", "a")
+        stats = get_user_stats(self.db, 1)
+        self.assertEqual(stats["total_cards"], 5)
+
+        process_reviews(self.db, 1, [(card_id, "easy", None)])
+        stats = get_user_stats(self.db, 1)
+        self.assertEqual(stats["retention"]["reviews"], 1)
+
+        # Another user's changes keep this user's cached copy
+        create_flashcard(self.db, 2, 1, "q", "a")
+        self.assertIs(get_user_stats(self.db, 1), stats)
+
+        delete_flashcard(self.db, 1, card_id)
+        self.assertEqual(get_user_stats(self.db, 1)["total_cards"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+from biobuddy.db import Database
+from biobuddy.study import count_due_cards, get_study_queue, process_review, process_reviews
+from create_db import SCHEMA_SQL
+
+
+class TestStudyQueue(unittest.TestCase):
+    def setUp(self):
+        self.db = Database(":memory:")
+        self.db.execute_script(SCHEMA_SQL)
+        self.db.execute("INSERT INTO Users (username, password_hash) VALUES ('u', 'x')")
+        self.db.execute("INSERT INTO Subjects (name) VALUES ('Biology')")
+        self.db.executemany(
+            """
+            INSERT INTO Flashcards (user_id, subject_id, question, answer, next_review_date)
+            VALUES (1, 1, ?, 'a', datetime('now', 'localtime', ?))
+            """,
+            [(f"q{i}", f"-{10 - i} days") for i in range(5)],
+        )
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_next_card_is_most_overdue(self):
+        card, count = get_study_queue(self.db, 1)
+        self.assertEqual(card["question"], "q0")
+        self.assertEqual(card["subject_name"], "Biology")
+        self.assertEqual(count, 5)
+
+    def test_count_limit(self):
+        self.assertEqual(count_due_cards(self.db, 1, limit=2), 3)
+        self.assertEqual(count_due_cards(self.db, 1), 5)
+
+    def test_review_advances_queue(self):
+        card, _ = get_study_queue(self.db, 1)
+        process_review(self.db, 1, card["id"], "easy")
+        next_card, count = get_study_queue(self.db, 1)
+        self.assertEqual(next_card["question"], "q1")
+        self.assertEqual(count, 4)
+
+    def test_batch_reviews(self):
+        applied = process_reviews(
+            self.db, 1, [(1, "easy", None), (2, "medium", None), (3, "bogus", None), (99, "easy", None)]
+        )
+        self.assertEqual(applied, 2)
+        self.assertEqual(count_due_cards(self.db, 1), 3)
+
+    def test_empty_queue(self):
+        self.assertEqual(get_study_queue(self.db, 2), (None, 0))
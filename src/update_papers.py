@@ -1,99 +1,57 @@
+import argparse
 import os
 import sys
 
 sys.path.append(os.getcwd())
-from biobuddy.db import get_db
+from biobuddy.db import Database
+from biobuddy.migrations import migrate
+from biobuddy.paper_files import sync_paper_files, watch_paper_files
 
 PAPERS_PATH = os.path.join("static", "papers")
+DB_PATH = os.environ.get("BIOBUDDY_DB_PATH", "biobuddy.db")
 
 
-def sync_papers():
-    print(f"Starting database sync with folder: {PAPERS_PATH}")
-    db = get_db()
+def sync_papers(db_path=DB_PATH, papers_path=PAPERS_PATH):
+    print(f"Starting database sync with folder: {papers_path}")
 
-    # 1. Get list of files in the database
-    cursor = db.execute("SELECT filename FROM Papers")
-    db_files = {row["filename"] for row in cursor.fetchall()}
-
-    # 3. Get list of files on disk, only PDFs
-    if not os.path.exists(PAPERS_PATH):
-        print(f"Error: Directory {PAPERS_PATH} does not exist.")
+    if not os.path.exists(papers_path):
+        print(f"Error: Directory {papers_path} does not exist.")
         return
 
-    disk_files = {f for f in os.listdir(PAPERS_PATH) if f.endswith(".pdf")}
-
-    # 3. Determine files to add and remove
-    files_to_add = disk_files - db_files
-    files_to_remove = db_files - disk_files
-
-    print(f"Analysis: {len(db_files)} in DB, {len(disk_files)} on disk.")
-    print(f" -> To add: {len(files_to_add)}")
-    print(f" -> To remove: {len(files_to_remove)}")
-
-    # --- Stage 1: REMOVAL ---
-    if files_to_remove:
-        print("\nPruning removed files from Database...")
-        for filename in files_to_remove:
-            db.execute("DELETE FROM Papers WHERE filename = ?", (filename,))
-            print(f" - Deleted: {filename}")
-
-    # --- Stage 2: ADDITION ---
-    if files_to_add:
-        print("\nAdding new files to Database...")
-
-        subjects_map = {}
-        cursor = db.execute("SELECT name, id FROM Subjects")
-        for row in cursor.fetchall():
-            subjects_map[row["name"].lower()] = row["id"]
-
-        added_count = 0
-        for filename in files_to_add:
-            try:
-                name_parts = filename.replace(".pdf", "").split("_")
-
-                if len(name_parts) < 5:
-                    print(f" - Skipping invalid format: {filename}")
-                    continue
-
-                subj_str, year, level, type_str, num = name_parts[:5]
-
-                subject_id = subjects_map.get(subj_str.lower())
-                if not subject_id:
-                    print(f" - Unknown subject: {subj_str} in {filename}")
-                    continue
+    db = Database(db_path, tuned=True)
+    migrate(db, log=print)
+    summary = sync_paper_files(db, papers_path)
+    db.close()
 
-                if level not in ["HL", "SL"]:
-                    print(f" - Invalid level: {level} in {filename}")
-                    continue
+    print(
+        f"\nAdded {summary['added']}, renamed {summary['renamed']}, updated {summary['updated']}, "
+        f"removed {summary['removed']}, skipped {summary['skipped']}, unchanged {summary['unchanged']}."
+    )
+    print("\nSync complete.")
 
-                if type_str not in ["QP", "MS"]:
-                    print(f" - Invalid type: {type_str} in {filename}")
-                    continue
 
-                if not num.isdigit():
-                    print(f" - Invalid number: {num} in {filename}")
-                    continue
+def watch_papers(db_path=DB_PATH, papers_path=PAPERS_PATH, interval=2.0):
+    print(f"Watching {papers_path} every {interval}s (Ctrl+C to stop)")
 
-                db.execute(
-                    """
-                    INSERT INTO Papers (subject_id, year, level, type, paper_number, filename)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                    """,
-                    (subject_id, int(year), level, type_str, int(num), filename),
-                )
-                print(f" + Added: {filename}")
-                added_count += 1
-
-            except Exception as e:
-                print(f"Error processing {filename}: {e}")
-
-        print(f"\nSuccessfully added {added_count} new papers.")
-    else:
-        print("\nNo new files to add.")
-
-    db.close()
-    print("\nSync complete.")
+    db = Database(db_path, tuned=True)
+    migrate(db, log=print)  # Once here, not on every poll
+    try:
+        watch_paper_files(db, papers_path, interval=interval)
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+    finally:
+        db.close()
 
 
 if __name__ == "__main__":
-    sync_papers()
+    parser = argparse.ArgumentParser(description="Synchronize the papers folder with the database.")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database file")
+    parser.add_argument("--papers", default=PAPERS_PATH, help="Folder with the paper PDFs")
+    parser.add_argument("--watch", action="store_true", help="Keep running and sync on every change")
+    parser.add_argument("--interval", type=float, default=2.0, help="Polling interval in seconds for --watch")
+    args = parser.parse_args()
+
+    if args.watch:
+        watch_papers(args.db, args.papers, args.interval)
+    else:
+        sync_papers(args.db, args.papers)